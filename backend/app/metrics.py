@@ -0,0 +1,117 @@
+from time import perf_counter
+from typing import Any, Self
+
+from anyio import to_thread
+from jinja2 import Template
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.tracing import route_name
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds',
+    'Duration of HTTP requests until the response is sent.',
+    ['method', 'route', 'status'],
+    buckets=(
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+    )
+)
+
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress',
+    'Number of HTTP requests being handled, including event streams.'
+)
+
+DB_CALL_DURATION = Histogram(
+    'db_call_duration_seconds',
+    'Duration of persistence functions, connecting included.',
+    ['function'],
+    buckets=(
+        0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5
+    )
+)
+
+DB_CALL_ERRORS = Counter(
+    'db_call_errors_total',
+    'Database errors in persistence functions, raised or handled.',
+    ['function', 'error']
+)
+
+DB_CONNECTIONS_OPEN = Gauge(
+    'db_connections_open', 'Number of open database connections.'
+)
+
+EVENT_STREAMS_OPEN = Gauge(
+    'event_streams_open', 'Number of open recording status event streams.'
+)
+
+THREADPOOL_BUSY_THREADS = Gauge(
+    'threadpool_busy_threads',
+    'Worker threads running sync endpoints and dependencies.'
+)
+
+THREADPOOL_MAX_THREADS = Gauge(
+    'threadpool_max_threads',
+    'Worker threads available to sync endpoints and dependencies.'
+)
+
+TEMPLATE_RENDER_DURATION = Histogram(
+    'template_render_duration_seconds',
+    'Duration of rendering Jinja templates.',
+    ['template'],
+    buckets=(
+        0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25
+    )
+)
+
+
+class TimedTemplate(Template):
+    """Template recording its render time, set as `template_class`."""
+
+    def render(self: Self, *args: Any, **kwargs: Any) -> str:
+        start = perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            TEMPLATE_RENDER_DURATION.labels(self.name).observe(
+                perf_counter() - start
+            )
+
+
+class MetricsMiddleware:
+    """Records duration of HTTP requests by route template."""
+
+    def __init__(self: Self, app: ASGIApp) -> None:
+        self._app = app
+
+    async def __call__(
+        self: Self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http':
+            await self._app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_measured(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        start = perf_counter()
+        try:
+            with HTTP_REQUESTS_IN_PROGRESS.track_inprogress():
+                await self._app(scope, receive, send_measured)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                scope['method'], route_name(scope), status
+            ).observe(perf_counter() - start)
+
+
+def collect_runtime_metrics(event_streams: int) -> None:
+    """Update gauges which are only known inside the event loop."""
+    limiter = to_thread.current_default_thread_limiter()
+    THREADPOOL_BUSY_THREADS.set(limiter.borrowed_tokens)
+    THREADPOOL_MAX_THREADS.set(limiter.total_tokens)
+    EVENT_STREAMS_OPEN.set(event_streams)
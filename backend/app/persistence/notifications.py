@@ -0,0 +1,184 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from contextlib import suppress
+from enum import StrEnum
+from typing import Self
+
+from psycopg2 import connect
+from psycopg2.extensions import connection
+from psycopg2.errors import Error
+
+from app.persistence.postgres import POSTGRES_DB_CONFIG
+from app.schemas.conference import RecordingStatusEvent
+
+CHANNEL = 'recording_status'
+
+SUBSCRIPTION_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 32))
+RECONNECT_DELAY_SECONDS = float(os.getenv('EVENTS_RECONNECT_DELAY_SECONDS', 5))
+HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+
+log = logging.getLogger(__name__)
+
+
+class Signal(StrEnum):
+    HEARTBEAT = 'heartbeat'
+    RESYNC = 'resync'
+
+
+Message = RecordingStatusEvent | Signal
+
+
+class Subscription:
+    """Bounded queue of messages for a single client.
+
+    A client which does not keep up loses its queued events and gets
+    `Signal.RESYNC` instead, telling it to reload the whole state.
+    """
+
+    def __init__(self: Self, user_id: int) -> None:
+        self.user_id = user_id
+        self._queue: asyncio.Queue[Message] = asyncio.Queue(
+            SUBSCRIPTION_QUEUE_SIZE
+        )
+
+    def put(self: Self, message: Message) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(Signal.RESYNC)
+
+    def ping(self: Self) -> None:
+        if self._queue.empty():
+            self._queue.put_nowait(Signal.HEARTBEAT)
+
+    async def get(self: Self) -> Message:
+        return await self._queue.get()
+
+
+class RecordingStatusListener:
+    """Single LISTEN connection fanning recording status changes out.
+
+    The connection is polled by the event loop whenever its socket becomes
+    readable, and a single timer sends heartbeats to all subscribers, so
+    an idle subscriber costs only its queue.
+    """
+
+    def __init__(self: Self) -> None:
+        self._subscriptions: defaultdict[int, set[Subscription]] = (
+            defaultdict(set)
+        )
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self: Self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._run()),
+            asyncio.create_task(self._heartbeat())
+        ]
+
+    async def stop(self: Self) -> None:
+        for task in self._tasks:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    @property
+    def subscription_count(self: Self) -> int:
+        return sum(map(len, self._subscriptions.values()))
+
+    def subscribe(self: Self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self: Self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions[subscription.user_id]
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.user_id]
+
+    def publish(self: Self, user_id: int, message: Message) -> None:
+        for subscription in self._subscriptions.get(user_id, ()):
+            subscription.put(message)
+
+    async def _heartbeat(self: Self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            for subscriptions in self._subscriptions.values():
+                for subscription in subscriptions:
+                    subscription.ping()
+
+    async def _run(self: Self) -> None:
+        reconnected = False
+        while True:
+            try:
+                conn = await asyncio.to_thread(_listen)
+            except Error as e:
+                log.exception(e)
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+                continue
+
+            # Changes made while disconnected are lost
+            if reconnected:
+                for user_id in list(self._subscriptions):
+                    self.publish(user_id, Signal.RESYNC)
+            reconnected = True
+
+            try:
+                await self._receive(conn)
+            finally:
+                conn.close()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def _receive(self: Self, conn: connection) -> None:
+        loop = asyncio.get_running_loop()
+        lost = asyncio.Event()
+
+        def on_readable() -> None:
+            try:
+                conn.poll()
+            except Error as e:
+                log.exception(e)
+                lost.set()
+                return
+
+            while conn.notifies:
+                self._dispatch(conn.notifies.pop(0).payload)
+
+        loop.add_reader(conn.fileno(), on_readable)
+        try:
+            await lost.wait()
+        finally:
+            loop.remove_reader(conn.fileno())
+
+    def _dispatch(self: Self, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            user_id = data['user_id']
+            event = RecordingStatusEvent(**data)
+        except (ValueError, KeyError, TypeError) as e:
+            log.exception(e)
+            return
+
+        self.publish(user_id, event)
+
+
+def _listen() -> connection:
+    conn = connect(
+        **POSTGRES_DB_CONFIG,
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f'LISTEN {CHANNEL}')
+    return conn
+
+
+status_listener = RecordingStatusListener()
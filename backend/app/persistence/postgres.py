@@ -1,23 +1,62 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import logging
 import os
 from functools import reduce, wraps
+from time import perf_counter
 from typing import Callable, Iterable, TypeVar, ParamSpec
 
 from psycopg2 import connect
 from psycopg2.extensions import connection
 from psycopg2.extras import RealDictCursor
-from psycopg2.errors import Error
-from pypika import Table, PostgreSQLQuery as Query, Criterion, Field, Order
+from psycopg2.errors import Error, QueryCanceled
+from psycopg2.extensions import cursor
+from pypika import (
+    Table,
+    PostgreSQLQuery as Query,
+    Criterion,
+    CustomFunction,
+    Field,
+    Interval,
+    Order
+)
+from pypika import functions as fn
+from pypika.enums import Comparator
+from pypika.terms import BasicCriterion, ExistsCriterion, ValueWrapper
+
+from common.capacity import BOT_CAPACITY, peaks
+from common.query_stats import (
+    InstrumentedConnection, connect_options
+)
+from common.quotas import MAX_CONCURRENT_RECORDINGS, MONTHLY_RECORDING_HOURS
+from common.scheduling import (
+    check_capacity,
+    check_quotas,
+    find_shared_recording_filename,
+    get_recording_periods
+)
 
 from app.schemas.user import (
-    UserCreate, UserRead, UserBase, SessionBase, UserInDb
+    UserCreate, UserRead, UserBase, SessionBase, UserInDb, DataVersion
 )
 from app.schemas.conference import (
-    ConferenceCreate, ConferenceRead, Recording, RecordingStatus, SettingsBase
+    ConferenceCreate,
+    ConferenceCreated,
+    ConferenceRead,
+    Recording,
+    RecordingStatus,
+    SettingsBase
 )
+from app.schemas.capacity import CapacityBucket, CapacityForecast
+from app.schemas.search import ConferencePage, ConferenceSearch
+from app.schemas.series import SeriesCreate, SeriesRead, SeriesUpdate
+from app.schemas.usage import Usage, UsageLimits, UsageTotals
+from app.metrics import (
+    DB_CALL_DURATION, DB_CALL_ERRORS, DB_CONNECTIONS_OPEN
+)
+from app.tracing import TRACEPARENT_HEADER, inject_headers, tracer
 from app.utils.auth import hash_password
 from app.utils.recording import generate_recording_filename
+from app.utils.recurrence import first_occurrence
 
 POSTGRES_DB_CONFIG = {
     'host': os.getenv('POSTGRES_HOST'),
@@ -39,33 +78,101 @@ sessions = Table('sessions')
 conferences = Table('conferences')
 conference_settings = Table('conference_settings')
 recordings = Table('recordings')
+user_usage = Table('user_usage')
+conference_series = Table('conference_series')
+
+_websearch_to_tsquery = CustomFunction(
+    'websearch_to_tsquery', ['config', 'query']
+)
+
+# Configuration of conference_search_vector of the database
+SEARCH_CONFIG = 'english'
+SEARCH_TIMEOUT_MS = int(os.getenv('SEARCH_TIMEOUT_MS', 2000))
+
+
+class SearchFailedError(Exception):
+    """The database failed to search conferences."""
+
+
+class SearchTimeoutError(SearchFailedError):
+    """Searching conferences took longer than SEARCH_TIMEOUT_MS."""
+
+
+class _TextComparator(Comparator):
+    matches = '@@'
+    word_similar = '<%'
+
+
+# Columns of conferences as read by users, with settings and recording
+_CONFERENCE_COLUMNS = [
+    conferences.id, conferences.user_id, conferences.title,
+    conferences.invite_link, conferences.start_time,
+    conferences.end_time, conferences.platform,
+    conference_settings.participant_name,
+    conference_settings.disclaimer_message,
+    conference_settings.capture_profile,
+    recordings.filename, recordings.status,
+    recordings.rejection_reason, conferences.series_id
+]
 
 
 def pg_connection(
-    autocommit: bool = False
+    autocommit: bool = False, statement_timeout_ms: int | None = None
 ) -> Callable[[FuncToDecorate], Callable[P, T]]:
+    """Run function with a connection of its own.
+
+    Statements are recorded in `query_stats`. The statement timeout
+    defaults to STATEMENT_TIMEOUT_MS.
+    """
     def fn_wrapper(fn: FuncToDecorate) -> Callable[P, T]:
         @wraps(fn)
         def args_wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-            conn = connect(**POSTGRES_DB_CONFIG)
-            conn.autocommit = autocommit
-            try:
-                res = fn(conn, *args, **kwargs)
-            except Error as e:
-                log.exception(e)
-                if not autocommit:
-                    conn.rollback()
-                raise e
-            else:
-                if not autocommit:
-                    conn.commit()
-            finally:
-                conn.close()
-            return res
+            start = perf_counter()
+            with (
+                tracer.start_as_current_span(
+                    f'db {fn.__name__}',
+                    attributes={'db.system': 'postgresql'}
+                ),
+                DB_CONNECTIONS_OPEN.track_inprogress()
+            ):
+                try:
+                    conn = connect(
+                        **POSTGRES_DB_CONFIG,
+                        **connect_options(statement_timeout_ms),
+                        connection_factory=InstrumentedConnection
+                    )
+                except Error as e:
+                    DB_CALL_ERRORS.labels(fn.__name__, type(e).__name__).inc()
+                    raise e
+                conn.function = fn.__name__
+                conn.autocommit = autocommit
+                try:
+                    res = fn(conn, *args, **kwargs)
+                except Error as e:
+                    log.exception(e)
+                    DB_CALL_ERRORS.labels(fn.__name__, type(e).__name__).inc()
+                    if not autocommit:
+                        conn.rollback()
+                    raise e
+                else:
+                    if not autocommit:
+                        conn.commit()
+                finally:
+                    conn.close()
+                    DB_CALL_DURATION.labels(fn.__name__).observe(
+                        perf_counter() - start
+                    )
+                return res
         return args_wrapper
     return fn_wrapper
 
 
+def _handle_error(conn: connection, e: Error) -> None:
+    """Log and count an error a persistence function does not raise."""
+    log.exception(e)
+    DB_CALL_ERRORS.labels(conn.function, type(e).__name__).inc()
+
+
 @pg_connection()
 def create_user(conn: connection, user: UserCreate) -> UserRead:
     user_ = user.copy(update={'password': hash_password(user.password)})
@@ -80,7 +187,7 @@ def create_user(conn: connection, user: UserCreate) -> UserRead:
 
             return UserRead(**user_.dict())
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -98,7 +205,7 @@ def get_user(conn: connection, user: UserBase) -> UserInDb | None:
                 return None
             return UserInDb(**user_data)
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -111,11 +218,15 @@ def create_session(conn: connection, user: UserInDb) -> SessionBase:
                 .columns(
                     sessions.user_id, sessions.token, sessions.expires_at
                 )
-                .insert(user.id, session.token, session.expires_at).get_sql()
+                .insert(user.id, session.token, session.expires_at)
+                # Replaces an expired session not swept yet
+                .on_conflict(sessions.user_id)
+                .do_update(sessions.token)
+                .do_update(sessions.expires_at).get_sql()
             )
             return session
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -124,7 +235,8 @@ def get_session(conn: connection, user: UserInDb) -> SessionBase | None:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(sessions
                 .select(sessions.token, sessions.expires_at)
-                .where(sessions.user_id == user.id).get_sql()
+                .where(sessions.user_id == user.id)
+                .where(sessions.expires_at > fn.Now()).get_sql()
             )
 
             item = cur.fetchone()
@@ -132,7 +244,7 @@ def get_session(conn: connection, user: UserInDb) -> SessionBase | None:
                 return None
             return SessionBase(**item)
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -142,10 +254,33 @@ def delete_session(conn: connection, token: str) -> None:
             cur.execute(Query
                 .from_(sessions)
                 .delete()
-                .where(sessions.token == token).get_sql()
+                .where(_active_session(token)).get_sql()
+            )
+    except Error as e:
+        _handle_error(conn, e)
+
+
+@pg_connection()
+def get_data_version(conn: connection, token: str) -> DataVersion | None:
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(Query
+                .from_(sessions)
+                .inner_join(users)
+                .on(sessions.user_id == users.id)
+                .select(
+                    users.id.as_('user_id'),
+                    users.data_version.as_('version')
+                )
+                .where(_active_session(token)).get_sql()
             )
+
+            item = cur.fetchone()
+            if not item:
+                return None
+            return DataVersion(**item)
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -153,7 +288,7 @@ def create_conference(
     conn: connection,
     token: str,
     conference: ConferenceCreate
-) -> ConferenceRead:
+) -> ConferenceCreated:
     conf_without_settings = conference.dict(exclude={'settings'})
     settings = conference.settings.dict()
     try:
@@ -161,15 +296,45 @@ def create_conference(
             cur.execute(Query
                 .from_(sessions)
                 .select(sessions.user_id)
-                .where(sessions.token == token).get_sql()
+                .where(_active_session(token)).get_sql()
             )
 
             user_id = cur.fetchone()[0]
 
+            shared_filename = find_shared_recording_filename(
+                conn,
+                conference.invite_link,
+                conference.settings.capture_profile,
+                conference.start_time,
+                conference.end_time
+            )
+            check_quotas(
+                conn,
+                user_id,
+                conference.start_time,
+                conference.end_time,
+                shared_filename
+            )
+            capacity_warning = check_capacity(
+                conn,
+                conference.start_time,
+                conference.end_time,
+                shared_filename
+            )
+
+            # Lets the scheduler continue the trace when recording starts
+            trace_context = inject_headers().get(TRACEPARENT_HEADER)
+
             cur.execute(Query
                 .into(conferences)
-                .columns(conferences.user_id, *conf_without_settings.keys())
-                .insert(user_id, *conf_without_settings.values())
+                .columns(
+                    conferences.user_id,
+                    conferences.trace_context,
+                    *conf_without_settings.keys()
+                )
+                .insert(
+                    user_id, trace_context, *conf_without_settings.values()
+                )
                 .returning(conferences.id).get_sql()
             )
 
@@ -177,30 +342,77 @@ def create_conference(
 
             cur.execute(Query
                 .into(conference_settings)
-                .columns(conference_settings.conference_id, *settings.keys())
-                .insert(conference_id, *settings.values()).get_sql()
+                .columns(
+                    conference_settings.conference_id,
+                    conference_settings.conference_start_time,
+                    *settings.keys()
+                )
+                .insert(
+                    conference_id, conference.start_time, *settings.values()
+                ).get_sql()
             )
 
             recording = Recording(
-                filename=generate_recording_filename(
-                    user_id, conference, conference_id
+                filename=shared_filename or generate_recording_filename(
+                    conference, conference_id
                 )
             )
 
             cur.execute(Query
                 .into(recordings)
-                .columns(recordings.conference_id, *recording.dict().keys())
-                .insert(conference_id, *recording.dict().values()).get_sql()
+                .columns(
+                    recordings.conference_id,
+                    recordings.conference_start_time,
+                    *recording.dict().keys()
+                )
+                .insert(
+                    conference_id,
+                    conference.start_time,
+                    *recording.dict().values()
+                ).get_sql()
             )
 
-            return ConferenceRead(
+            return ConferenceCreated(
                 id=conference_id,
                 user_id=user_id,
                 recording=recording,
+                capacity_warning=capacity_warning,
                 **conference.dict()
             )
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
+
+
+def _active_session(token: str) -> Criterion:
+    # Expired sessions stay in the table until the scheduler sweeps them
+    return (sessions.token == token) & (sessions.expires_at > fn.Now())
+
+
+def _conference_of(table: Table) -> Criterion:
+    # Includes the partition key, so only the matching partition is joined
+    return (
+        (table.conference_id == conferences.id)
+        & (table.conference_start_time == conferences.start_time)
+    )
+
+
+@pg_connection()
+def get_conferences(conn: connection, token: str) -> list[ConferenceRead]:
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(_prepare_get_conferences_query(
+                token, orders=[(conferences.start_time, Order.asc)]
+            ))
+            return [
+                ConferenceRead(
+                    settings=SettingsBase(**item),
+                    recording=Recording(**item),
+                    **item
+                )
+                for item in cur
+            ]
+    except Error as e:
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -223,7 +435,7 @@ def get_upcoming_conferences(
                 for item in cur
             ]
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -246,7 +458,7 @@ def get_in_progress_conferences(
                 for item in cur
             ]
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -257,7 +469,10 @@ def get_finished_conferences(
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(_prepare_get_conferences_query(
                 token,
-                criterions=[recordings.status == RecordingStatus.FINISHED],
+                # Rejected recordings are over as well
+                criterions=[recordings.status.isin(
+                    [RecordingStatus.FINISHED, RecordingStatus.REJECTED]
+                )],
                 orders=[(conferences.start_time, Order.asc)]
             ))
             return [
@@ -269,13 +484,13 @@ def get_finished_conferences(
                 for item in cur
             ]
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
 def get_conference(
     conn: connection, token: str, conference_id: int
-) -> ConferenceRead:
+) -> ConferenceRead | None:
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(_prepare_get_conferences_query(
@@ -283,6 +498,8 @@ def get_conference(
             ))
 
             item = cur.fetchone()
+            if not item:
+                return None
 
             return ConferenceRead(
                 settings=SettingsBase(**item),
@@ -290,7 +507,137 @@ def get_conference(
                 **item
             )
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
+
+
+@pg_connection(statement_timeout_ms=SEARCH_TIMEOUT_MS)
+def search_conferences(
+    conn: connection,
+    token: str,
+    search: ConferenceSearch,
+    offset: int,
+    limit: int
+) -> ConferencePage | None:
+    """Find conferences of the user, the latest first.
+
+    Words of the query are looked up in titles and disclaimer messages
+    with stemming, and titles similar to the query match too, so typos
+    are forgiven. Matches are not ranked by relevance: common words match
+    most conferences of a user, and ranking all of them takes far longer
+    than finding the latest ones. Returns None if the session is not
+    valid, and raises SearchTimeoutError or SearchFailedError if the
+    search does not finish.
+    """
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(Query
+                .from_(sessions)
+                .select(sessions.user_id)
+                .where(_active_session(token)).get_sql()
+            )
+            item = cur.fetchone()
+            if not item:
+                return None
+
+            # The user is a constant, so the indexes leading with it are
+            # used instead of a join with sessions
+            matching = (Query
+                .from_(conferences)
+                .select(conferences.id, conferences.start_time)
+                .where(conferences.user_id == item['user_id'])
+            )
+
+            if search.q:
+                matching = matching.where(
+                    BasicCriterion(
+                        _TextComparator.matches,
+                        conferences.search_vector,
+                        _websearch_to_tsquery(SEARCH_CONFIG, search.q)
+                    )
+                    | BasicCriterion(
+                        _TextComparator.word_similar,
+                        # Estimating a constant runs the comparison over
+                        # title statistics of every partition, which takes
+                        # longer than the search itself
+                        Query.select(ValueWrapper(search.q)),
+                        conferences.title
+                    )
+                )
+            if search.platforms:
+                matching = matching.where(
+                    conferences.platform.isin(search.platforms)
+                )
+            if search.statuses:
+                matching = matching.where(ExistsCriterion(Query
+                    .from_(recordings)
+                    .select(recordings.id)
+                    .where(_conference_of(recordings))
+                    .where(recordings.status.isin(search.statuses))
+                ))
+            if search.since:
+                matching = matching.where(
+                    conferences.start_time >= search.since
+                )
+            if search.until:
+                matching = matching.where(
+                    conferences.start_time < search.until
+                )
+
+            cur.execute(matching
+                .orderby(conferences.start_time, order=Order.desc)
+                .orderby(conferences.id, order=Order.desc)
+                # One more tells whether there is a next page
+                .limit(limit + 1)
+                .offset(offset).get_sql()
+            )
+            page = cur.fetchall()
+            if not page:
+                return ConferencePage(conferences=[])
+
+            # Settings and recordings are joined for the page alone, with
+            # start times as constants so only partitions of the page are
+            # planned. Joined before the page is taken, they were joined
+            # for all conferences of the user.
+            start_times = [item['start_time'] for item in page[:limit]]
+            cur.execute(Query
+                .from_(conferences)
+                .inner_join(conference_settings)
+                .on(_conference_of(conference_settings))
+                .inner_join(recordings)
+                .on(_conference_of(recordings))
+                .select(*_CONFERENCE_COLUMNS)
+                .where(conferences.id.isin(
+                    [item['id'] for item in page[:limit]]
+                ))
+                .where(conferences.start_time.isin(start_times))
+                .where(
+                    conference_settings.conference_start_time.isin(start_times)
+                )
+                .where(recordings.conference_start_time.isin(start_times))
+                .orderby(conferences.start_time, order=Order.desc)
+                .orderby(conferences.id, order=Order.desc).get_sql()
+            )
+            items = cur.fetchall()
+
+            return ConferencePage(
+                conferences=[
+                    ConferenceRead(
+                        settings=SettingsBase(**item),
+                        recording=Recording(**item),
+                        **item
+                    )
+                    for item in items
+                ],
+                next_offset=offset + limit if len(page) > limit else None
+            )
+    except QueryCanceled as e:
+        _handle_error(conn, e)
+        raise SearchTimeoutError(
+            f'The search took longer than {SEARCH_TIMEOUT_MS} ms'
+        ) from e
+    except Error as e:
+        _handle_error(conn, e)
+        raise SearchFailedError('The search failed') from e
 
 
 def _prepare_get_conferences_query(
@@ -302,20 +649,13 @@ def _prepare_get_conferences_query(
     query = (Query
         .from_(conferences)
         .inner_join(conference_settings)
-        .on(conferences.id == conference_settings.conference_id)
+        .on(_conference_of(conference_settings))
         .inner_join(recordings)
-        .on(conferences.id == recordings.conference_id)
+        .on(_conference_of(recordings))
         .inner_join(sessions)
         .on(conferences.user_id == sessions.user_id)
-        .select(
-            conferences.id, conferences.user_id, conferences.title,
-            conferences.invite_link, conferences.start_time,
-            conferences.end_time, conferences.platform,
-            conference_settings.participant_name,
-            conference_settings.disclaimer_message,
-            recordings.filename, recordings.status
-        )
-        .where(sessions.token == token)
+        .select(*_CONFERENCE_COLUMNS)
+        .where(_active_session(token))
     )
 
     if criterions:
@@ -344,12 +684,12 @@ def delete_conference(
                 .delete()
                 .where(
                     conferences.user_id == sessions.select(sessions.user_id)
-                    .where(sessions.token == token)
+                    .where(_active_session(token))
                 )
                 .where(conferences.id == conference_id).get_sql()
             )
     except Error as e:
-        log.exception(e)
+        _handle_error(conn, e)
 
 
 @pg_connection()
@@ -360,12 +700,294 @@ def stop_recording(
         with conn.cursor() as cur:
             cur.execute(Query
                 .update(conferences)
-                .set(conferences.end_time, datetime.now())
+                .set(conferences.end_time, datetime.now(timezone.utc))
                 .where(
                     conferences.user_id == sessions.select(sessions.user_id)
-                    .where(sessions.token == token)
+                    .where(_active_session(token))
                 )
                 .where(conferences.id == conference_id).get_sql()
             )
     except Error as e:
-        log.exception(e)
\ No newline at end of file
+        _handle_error(conn, e)
+
+
+@pg_connection()
+def create_series(
+    conn: connection, token: str, series: SeriesCreate
+) -> SeriesRead:
+    """Store a recurring conference, the scheduler creates its occurrences.
+
+    Quotas are checked for the first occurrence here, the scheduler
+    checks them and the capacity again for every occurrence it creates
+    and rejects those exceeding them.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Query
+                .from_(sessions)
+                .select(sessions.user_id)
+                .where(_active_session(token)).get_sql()
+            )
+
+            user_id = cur.fetchone()[0]
+
+            first_start = first_occurrence(
+                series.rrule, series.start_time, series.time_zone
+            )
+            first = ConferenceCreate(
+                start_time=first_start,
+                end_time=first_start + series.duration
+                if series.duration else None,
+                **series.dict(exclude={'start_time'})
+            )
+            shared_filename = find_shared_recording_filename(
+                conn,
+                first.invite_link,
+                first.settings.capture_profile,
+                first.start_time,
+                first.end_time
+            )
+            check_quotas(
+                conn,
+                user_id,
+                first.start_time,
+                first.end_time,
+                shared_filename
+            )
+
+            values = _series_values(series)
+            cur.execute(Query
+                .into(conference_series)
+                .columns(
+                    conference_series.user_id,
+                    conference_series.materialized_until,
+                    *values.keys()
+                )
+                .insert(user_id, series.start_time, *values.values())
+                .returning(conference_series.id).get_sql()
+            )
+
+            return SeriesRead(
+                id=cur.fetchone()[0],
+                materialized_until=series.start_time,
+                **series.dict()
+            )
+    except Error as e:
+        _handle_error(conn, e)
+
+
+@pg_connection()
+def get_series(conn: connection, token: str) -> list[SeriesRead]:
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(Query
+                .from_(conference_series)
+                .inner_join(sessions)
+                .on(conference_series.user_id == sessions.user_id)
+                .select(conference_series.star)
+                .where(_active_session(token))
+                .orderby(conference_series.id).get_sql()
+            )
+            return [
+                SeriesRead(settings=SettingsBase(**item), **item)
+                for item in cur
+            ]
+    except Error as e:
+        _handle_error(conn, e)
+
+
+@pg_connection()
+def update_series(
+    conn: connection, token: str, series_id: int, update: SeriesUpdate
+) -> SeriesRead | None:
+    """Change a series and the occurrences which have not started yet.
+
+    Only occurrences the scheduler has materialized are deleted, it
+    creates them again from the changed series. Raises ValueError if the
+    changed rule is not valid.
+    """
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(Query
+                .from_(conference_series)
+                .select(conference_series.star)
+                .where(conference_series.id == series_id)
+                .where(_owned_by_session(conference_series, token))
+                # Keeps the scheduler from materializing it meanwhile
+                .for_update().get_sql()
+            )
+
+            item = cur.fetchone()
+            if not item:
+                return None
+
+            current = SeriesRead(settings=SettingsBase(**item), **item)
+            changes = update.dict(exclude_unset=True)
+            settings = current.settings.copy(
+                update=changes.pop('settings', None) or {}
+            )
+            series = SeriesCreate(
+                **{**current.dict(), **changes, 'settings': settings.dict()}
+            )
+
+            _delete_upcoming_occurrences(cur, series_id)
+
+            materialized_until = max(
+                series.start_time, datetime.now(timezone.utc)
+            )
+            query = (Query
+                .update(conference_series)
+                .set(conference_series.materialized_until, materialized_until)
+                .where(conference_series.id == series_id)
+            )
+            for column, value in _series_values(series).items():
+                query = query.set(conference_series[column], value)
+            cur.execute(query.get_sql())
+
+            return SeriesRead(
+                id=series_id,
+                materialized_until=materialized_until,
+                **series.dict()
+            )
+    except Error as e:
+        _handle_error(conn, e)
+
+
+@pg_connection()
+def delete_series(conn: connection, token: str, series_id: int) -> None:
+    """Delete a series and its occurrences which have not started yet."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Query
+                .from_(conference_series)
+                .select(conference_series.id)
+                .where(conference_series.id == series_id)
+                .where(_owned_by_session(conference_series, token))
+                .for_update().get_sql()
+            )
+            if not cur.fetchone():
+                return
+
+            _delete_upcoming_occurrences(cur, series_id)
+            # Past occurrences are kept, their series_id is cleared
+            cur.execute(Query
+                .from_(conference_series)
+                .delete()
+                .where(conference_series.id == series_id).get_sql()
+            )
+    except Error as e:
+        _handle_error(conn, e)
+
+
+def _series_values(series: SeriesCreate) -> dict:
+    """Return columns of series, which stores its settings inline."""
+    return {
+        **series.dict(exclude={'settings'}),
+        **series.settings.dict(),
+        'duration': Interval(seconds=int(series.duration.total_seconds()))
+        if series.duration else None
+    }
+
+
+def _delete_upcoming_occurrences(cur: cursor, series_id: int) -> None:
+    # Cascades to their settings and recordings
+    cur.execute(Query
+        .from_(conferences)
+        .delete()
+        .where(conferences.series_id == series_id)
+        .where(conferences.start_time > fn.Now())
+        .where(conferences.id.isin(Query
+            .from_(recordings)
+            .select(recordings.conference_id)
+            .where(recordings.status == RecordingStatus.SCHEDULED)
+            .where(recordings.conference_start_time > fn.Now())
+        )).get_sql()
+    )
+
+
+def _owned_by_session(table: Table, token: str) -> Criterion:
+    return table.user_id == (
+        sessions.select(sessions.user_id).where(_active_session(token))
+    )
+
+
+@pg_connection()
+def get_usage(conn: connection, token: str) -> Usage | None:
+    """Sum the user's usage kept up to date by triggers."""
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(Query
+                .from_(sessions)
+                .inner_join(users)
+                .on(sessions.user_id == users.id)
+                .left_join(user_usage)
+                .on(sessions.user_id == user_usage.user_id)
+                .select(
+                    users.max_concurrent_recordings,
+                    users.monthly_recording_hours,
+                    user_usage.month, user_usage.platform, user_usage.status,
+                    user_usage.recordings, user_usage.recorded_seconds,
+                    user_usage.storage_bytes
+                )
+                .where(_active_session(token)).get_sql()
+            )
+
+            rows = cur.fetchall()
+            if not rows:
+                return None
+
+            usage = Usage(limits=UsageLimits(
+                max_concurrent_recordings=rows[0]['max_concurrent_recordings']
+                or MAX_CONCURRENT_RECORDINGS,
+                monthly_recording_hours=rows[0]['monthly_recording_hours']
+                or MONTHLY_RECORDING_HOURS
+            ))
+            this_month = datetime.now(timezone.utc).date().replace(day=1)
+            for row in rows:
+                if row['month'] is None:
+                    # The user has no usage yet
+                    continue
+                platform = usage.by_platform.setdefault(
+                    row['platform'], UsageTotals()
+                )
+                totals = [usage.total, platform]
+                if row['month'] == this_month:
+                    totals.append(usage.this_month)
+                for total in totals:
+                    total.recordings += row['recordings']
+                    total.recorded_hours += row['recorded_seconds'] / 3600
+                    total.storage_bytes += row['storage_bytes']
+                usage.recordings_by_status[row['status']] = (
+                    usage.recordings_by_status.get(row['status'], 0)
+                    + row['recordings']
+                )
+            return usage
+    except Error as e:
+        _handle_error(conn, e)
+
+
+@pg_connection()
+def get_capacity_forecast(
+    conn: connection, start: datetime, end: datetime, step: timedelta
+) -> CapacityForecast:
+    """Return peak recordings planned at once in every step from start."""
+    try:
+        periods = [
+            (period_start, period_end)
+            for _, period_start, period_end
+            in get_recording_periods(conn, start, end)
+        ]
+        return CapacityForecast(
+            capacity=BOT_CAPACITY,
+            buckets=[
+                CapacityBucket(
+                    start=bucket_start,
+                    end=bucket_end,
+                    peak_recordings=peak
+                )
+                for bucket_start, bucket_end, peak
+                in peaks(periods, start, end, step)
+            ]
+        )
+    except Error as e:
+        _handle_error(conn, e)
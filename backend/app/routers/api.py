@@ -1,31 +1,53 @@
 import logging
-from typing import Annotated, Any
+from datetime import datetime, timedelta
+from typing import Annotated, Any, AsyncIterator
 
 from fastapi import (
-    APIRouter,status, Response, Request, Cookie, HTTPException, Header
+    APIRouter,status, Response, Request, Cookie, HTTPException, Header, Query
 )
-from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
+
+from common.capacity import CapacityExceededError
+from common.quotas import QuotaExceededError
 
 from app.persistence import postgres as db
+from app.persistence.notifications import Signal, status_listener
+from app.schemas.capacity import CapacityForecast
 from app.schemas.conference import (
     ConferenceCreate,
     ConferenceRead,
-    ConferenceUpdate
+    ConferenceUpdate,
+    ConferencingPlatform,
+    RecordingStatus
 )
+from app.schemas.search import ConferencePage, ConferenceSearch
+from app.schemas.series import SeriesCreate, SeriesRead, SeriesUpdate
+from app.schemas.usage import Usage
 from app.schemas.user import UserCreate, UserBase
 from app.utils.auth import check_password
+from app.utils.etag import etag_matches, make_etag
+from app.utils.rendering import render_cache
+
+EVENTS_RETRY_MILLISECONDS = 5000
+
+MAX_SEARCH_LIMIT = 100
+
+MAX_FORECAST_BUCKETS = 1000
 
 log = logging.getLogger(__name__)
 
 router = APIRouter(prefix='/api', tags=['API'])
 
-templates = Jinja2Templates(directory='templates')
-
 Token = Annotated[str | None, Cookie()]
 
 Accept = Annotated[str | None, Header()]
 
+IfNoneMatch = Annotated[str | None, Header()]
+
+# Clients may keep the response, but must revalidate it on every use
+CONFERENCES_CACHE_CONTROL = 'private, no-cache'
+
 
 @router.post('/users/sign-up')
 def sign_up(
@@ -92,8 +114,25 @@ def sign_out(token: Token = None) -> RedirectResponse:
     return response
 
 
-@router.get('/conferences')
-def get_conferences(token: Token = None) -> list[ConferenceRead]:
+@router.get('/conferences', response_model=list[ConferenceRead])
+def get_conferences(
+    response: Response,
+    token: Token = None,
+    if_none_match: IfNoneMatch = None
+) -> Any:
+    # Only the version is checked for unchanged conferences
+    data_version = db.get_data_version(token)
+    if data_version is None:
+        return []
+
+    etag = make_etag(data_version)
+    headers = {'ETag': etag, 'Cache-Control': CONFERENCES_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+
+    response.headers.update(headers)
     return db.get_conferences(token)
 
 
@@ -104,18 +143,72 @@ def create_conference(
     accept: Accept = 'application/json',
     token: Token = None
 ) -> Any:
-    log.info(f'{conference = }')
-    created_conference = db.create_conference(token, conference)
-    log.info(f'{accept = }')
+    log.debug('Creating conference %s', conference)
+    try:
+        created_conference = db.create_conference(token, conference)
+    except QuotaExceededError as e:
+        log.info('Rejected conference %s: %s', conference.title, e)
+        raise HTTPException(status.HTTP_403_FORBIDDEN, str(e))
+    except CapacityExceededError as e:
+        log.info('Rejected conference %s: %s', conference.title, e)
+        raise HTTPException(status.HTTP_409_CONFLICT, str(e))
     if accept == 'text/html':
-        return templates.TemplateResponse(
-            'conference.html',
-            context={'request': request, 'conference': created_conference},
-            status_code=status.HTTP_201_CREATED
+        headers = {}
+        if created_conference.capacity_warning:
+            headers['X-Capacity-Warning'] = created_conference.capacity_warning
+        return HTMLResponse(
+            render_cache.render_card(request, created_conference),
+            status_code=status.HTTP_201_CREATED,
+            headers=headers
         )
     return created_conference
 
 
+@router.get('/conferences/search', response_model=ConferencePage)
+def search_conferences(
+    q: str | None = None,
+    platform: Annotated[list[ConferencingPlatform], Query()] = [],
+    status_: Annotated[list[RecordingStatus], Query(alias='status')] = [],
+    since: datetime | None = None,
+    until: datetime | None = None,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=MAX_SEARCH_LIMIT)] = 20,
+    token: Token = None
+) -> Any:
+    """Search the user's conferences, filters may be repeated."""
+    search = ConferenceSearch(
+        q=q, platforms=platform, statuses=status_, since=since, until=until
+    )
+    try:
+        page = db.search_conferences(token, search, offset, limit)
+    except db.SearchTimeoutError as e:
+        raise HTTPException(status.HTTP_504_GATEWAY_TIMEOUT, str(e))
+    except db.SearchFailedError as e:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, str(e))
+    if page is None:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, 'Not signed in')
+    return page
+
+
+@router.get('/conferences/{conference_id}', response_model=ConferenceRead)
+def get_conference(
+    conference_id: int,
+    request: Request,
+    accept: Accept = 'application/json',
+    token: Token = None
+) -> Any:
+    conference = db.get_conference(token, conference_id)
+    if conference is None:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            f'There is no conference with id {conference_id}'
+        )
+
+    if accept == 'text/html':
+        return HTMLResponse(render_cache.render_card(request, conference))
+    return conference
+
+
 # @router.patch('/conferences/{conference_id}')
 # def update_conference(conference: ConferenceUpdate) -> ConferenceRead:
 #     ...
@@ -135,3 +228,113 @@ def delete_conference(conference_id: int, token: Token = None) -> None:
 )
 def stop_recording(conference_id: int, token: Token = None) -> None:
     db.stop_recording(token, conference_id)
+
+
+@router.get('/series', response_model=list[SeriesRead])
+def get_series(token: Token = None) -> Any:
+    if db.get_data_version(token) is None:
+        return []
+    return db.get_series(token)
+
+
+@router.post(
+    '/series', status_code=status.HTTP_201_CREATED, response_model=SeriesRead
+)
+def create_series(series: SeriesCreate, token: Token = None) -> Any:
+    """Schedule a recurring conference, occurrences are created lazily."""
+    if db.get_data_version(token) is None:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, 'Not signed in')
+
+    log.debug('Creating series %s', series)
+    try:
+        return db.create_series(token, series)
+    except QuotaExceededError as e:
+        log.info('Rejected series %s: %s', series.title, e)
+        raise HTTPException(status.HTTP_403_FORBIDDEN, str(e))
+
+
+@router.patch('/series/{series_id}', response_model=SeriesRead)
+def update_series(
+    series_id: int, update: SeriesUpdate, token: Token = None
+) -> Any:
+    try:
+        series = db.update_series(token, series_id, update)
+    except ValueError as e:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
+    if series is None:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            f'There is no series with id {series_id}'
+        )
+    return series
+
+
+@router.delete(
+    '/series/{series_id}', status_code=status.HTTP_204_NO_CONTENT
+)
+def delete_series(series_id: int, token: Token = None) -> None:
+    db.delete_series(token, series_id)
+
+
+@router.get('/capacity', response_model=CapacityForecast)
+def get_capacity_forecast(
+    start: datetime,
+    end: datetime,
+    step_minutes: int = 60,
+    token: Token = None
+) -> Any:
+    """Peak recordings planned at once per step, against the fleet size."""
+    if db.get_data_version(token) is None:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, 'Not signed in')
+
+    step = timedelta(minutes=step_minutes)
+    if step_minutes <= 0 or end <= start:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            'The window must end after it starts and steps must be positive'
+        )
+    if (end - start) / step > MAX_FORECAST_BUCKETS:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            f'The window may have at most {MAX_FORECAST_BUCKETS} steps'
+        )
+    return db.get_capacity_forecast(start, end, step)
+
+
+@router.get('/usage', response_model=Usage)
+def get_usage(token: Token = None) -> Any:
+    usage = db.get_usage(token)
+    if usage is None:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, 'Not signed in')
+    return usage
+
+
+@router.get('/events')
+async def events(token: Token = None) -> StreamingResponse:
+    """Stream recording status changes of the user's conferences."""
+    data_version = await run_in_threadpool(db.get_data_version, token)
+    if data_version is None:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED, 'Not signed in')
+
+    return StreamingResponse(
+        _stream_events(data_version.user_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def _stream_events(user_id: int) -> AsyncIterator[str]:
+    subscription = status_listener.subscribe(user_id)
+    try:
+        yield f'retry: {EVENTS_RETRY_MILLISECONDS}\n\n'
+        while True:
+            match await subscription.get():
+                case Signal.HEARTBEAT:
+                    # Keeps proxies from closing idle connections
+                    yield ': heartbeat\n\n'
+                case Signal.RESYNC:
+                    yield 'event: resync\ndata: {}\n\n'
+                case event:
+                    yield f'event: status\ndata: {event.json()}\n\n'
+    finally:
+        status_listener.unsubscribe(subscription)
@@ -1,21 +1,27 @@
 import logging
 import os
-from typing import Annotated
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Annotated, Callable
 
-from fastapi import APIRouter, Cookie, status, Request
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Cookie, HTTPException, Query, status, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
+from markupsafe import Markup
 
 from app.persistence import postgres as db
+from app.schemas.conference import (
+    ConferenceRead, ConferencingPlatform, RecordingStatus
+)
+from app.schemas.search import ConferenceSearch
+from app.utils.rendering import render_cache, templates
 
 VIDEO_HOST = os.getenv('VIDEO_HOST')
 
+SEARCH_PAGE_SIZE = 20
+
 log = logging.getLogger(__name__)
 
 router = APIRouter(tags=['Pages'])
 
-templates = Jinja2Templates(directory='templates')
-
 Token = Annotated[str | None, Cookie()]
 
 
@@ -41,12 +47,12 @@ def sign_up(request: Request, token: Token = None):
 def home(request: Request, token: Token = None):
     if not token:
         return RedirectResponse('/sign-in', status.HTTP_302_FOUND)
-    
-    conferences = db.get_upcoming_conferences(token)
+
+    cards = _get_cards(request, token, 'home', db.get_upcoming_conferences)
 
     return templates.TemplateResponse(
         'index.html',
-        {'request': request, 'page_name': 'Home', 'conferences': conferences}
+        {'request': request, 'page_name': 'Home', 'cards': cards}
     )
 
 
@@ -55,41 +61,81 @@ def in_progress(request: Request, token: Token = None):
     if not token:
         return RedirectResponse('/sign-in', status.HTTP_302_FOUND)
 
-    conferences = db.get_in_progress_conferences(token)
+    cards = _get_cards(
+        request, token, 'in-progress', db.get_in_progress_conferences
+    )
 
     return templates.TemplateResponse(
         'in-progress.html',
-        {
-            'request': request,
-            'page_name': 'History',
-            'conferences': conferences
-        }
+        {'request': request, 'page_name': 'History', 'cards': cards}
     )
 
 
 @router.get('/history', response_class=HTMLResponse)
-def history(request: Request, token: Token = None):
+def history(
+    request: Request,
+    token: Token = None,
+    q: str = '',
+    platform: str = '',
+    status_: Annotated[str, Query(alias='status')] = '',
+    since: str = '',
+    until: str = '',
+    offset: Annotated[int, Query(ge=0)] = 0
+):
     if not token:
         return RedirectResponse('/sign-in', status.HTTP_302_FOUND)
 
-    conferences = db.get_finished_conferences(token)
+    context = {
+        'request': request,
+        'page_name': 'History',
+        'form': request.query_params
+    }
+    if not any((q, platform, status_, since, until)):
+        cards = _get_cards(
+            request, token, 'history', db.get_finished_conferences
+        )
+        return templates.TemplateResponse(
+            'history.html', {**context, 'cards': cards}
+        )
+
+    try:
+        search = _parse_search(q, platform, status_, since, until)
+    except ValueError as e:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
+
+    try:
+        page = db.search_conferences(token, search, offset, SEARCH_PAGE_SIZE)
+    except db.SearchTimeoutError as e:
+        raise HTTPException(status.HTTP_504_GATEWAY_TIMEOUT, str(e))
+    except db.SearchFailedError as e:
+        raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, str(e))
+    if page is None:
+        return RedirectResponse('/sign-in', status.HTTP_302_FOUND)
 
-    return templates.TemplateResponse(
-        'history.html',
-        {
-            'request': request,
-            'page_name': 'History',
-            'conferences': conferences
-        }
-    )
+    return templates.TemplateResponse('history.html', {
+        **context,
+        'searching': True,
+        'cards': [
+            render_cache.render_card(request, c) for c in page.conferences
+        ],
+        'next_url': request.url.include_query_params(
+            offset=page.next_offset
+        ) if page.next_offset is not None else None
+    })
 
 
 @router.get('/settings', response_class=HTMLResponse)
 def settings(request: Request, token: Token = None):
     if not token:
         return RedirectResponse('/sign-in', status.HTTP_302_FOUND)
+
+    usage = db.get_usage(token)
+    if usage is None:
+        return RedirectResponse('/sign-in', status.HTTP_302_FOUND)
+
     return templates.TemplateResponse(
-        'settings.html', {'request': request, 'page_name': 'Settings'}
+        'settings.html',
+        {'request': request, 'page_name': 'Settings', 'usage': usage}
     )
 
 
@@ -111,4 +157,40 @@ def recordings(conference_id: int, request: Request, token: Token = None):
             'video_host': VIDEO_HOST,
             'conference': conference
         }
-    )
\ No newline at end of file
+    )
+
+
+def _parse_search(
+    q: str, platform: str, status_: str, since: str, until: str
+) -> ConferenceSearch:
+    """Read the search form, whose empty fields filter nothing.
+
+    Dates are whole UTC days, `until` included.
+    """
+    return ConferenceSearch(
+        q=q or None,
+        platforms=[ConferencingPlatform(platform)] if platform else [],
+        statuses=[RecordingStatus(status_)] if status_ else [],
+        since=datetime.combine(
+            date.fromisoformat(since), time(), timezone.utc
+        ) if since else None,
+        until=datetime.combine(
+            date.fromisoformat(until) + timedelta(days=1),
+            time(),
+            timezone.utc
+        ) if until else None
+    )
+
+
+def _get_cards(
+    request: Request,
+    token: str,
+    page: str,
+    get_conferences: Callable[[str], list[ConferenceRead]]
+) -> list[Markup]:
+    data_version = db.get_data_version(token)
+    if data_version is None:
+        return []
+    return render_cache.get_cards(
+        request, data_version, page, lambda: get_conferences(token)
+    )
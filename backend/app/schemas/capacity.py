@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class CapacityBucket(BaseModel):
+    start: datetime
+    end: datetime
+    # Most recordings planned to go on at once within the bucket
+    peak_recordings: int
+
+
+class CapacityForecast(BaseModel):
+    capacity: int
+    buckets: list[CapacityBucket]
@@ -10,10 +10,18 @@ class ConferencingPlatform(StrEnum):
     MEET = 'google_meet'
 
 
+class CaptureProfile(StrEnum):
+    FULL_HD = 'full_hd'
+    HD = 'hd'
+    SD = 'sd'
+    AUDIO_ONLY = 'audio_only'
+
+
 class RecordingStatus(StrEnum):
     SCHEDULED = 'scheduled'
     IN_PROGRESS = 'in_progress'
     FINISHED = 'finished'
+    REJECTED = 'rejected'
 
 
 class Model(BaseModel):
@@ -39,11 +47,13 @@ class Model(BaseModel):
 class Recording(Model):
     filename: str
     status: RecordingStatus = RecordingStatus.SCHEDULED
+    rejection_reason: str | None = None
 
 
 class SettingsBase(Model):
     participant_name: str
     disclaimer_message: str
+    capture_profile: CaptureProfile = CaptureProfile.FULL_HD
 
 
 class SettingsCreate(SettingsBase):
@@ -58,6 +68,7 @@ class SettingsRead(SettingsBase):
 class SettingsUpdate(SettingsBase):
     participant_name: str | None = None
     disclaimer_message: str | None = None
+    capture_profile: CaptureProfile | None = None
 
 
 class ConferenceBase(Model):
@@ -76,6 +87,13 @@ class ConferenceCreate(ConferenceBase):
 class ConferenceRead(ConferenceBase):
     id: int
     recording: Recording
+    # Set for occurrences of a recurring series
+    series_id: int | None = None
+
+
+class ConferenceCreated(ConferenceRead):
+    # Set when more bots than the fleet has are planned during it
+    capacity_warning: str | None = None
 
 
 class ConferenceUpdate(ConferenceBase):
@@ -84,3 +102,8 @@ class ConferenceUpdate(ConferenceBase):
     start_time: datetime | None = None
     platform: ConferencingPlatform | None = None
     settings: SettingsUpdate | None = None
+
+
+class RecordingStatusEvent(Model):
+    conference_id: int
+    status: RecordingStatus
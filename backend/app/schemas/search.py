@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from app.schemas.conference import (
+    ConferenceRead, ConferencingPlatform, Model, RecordingStatus
+)
+
+
+class ConferenceSearch(Model):
+    # Words of the title or disclaimer message, titles also match with typos
+    q: str | None = None
+    platforms: list[ConferencingPlatform] = []
+    statuses: list[RecordingStatus] = []
+    # Range of start times, the end excluded
+    since: datetime | None = None
+    until: datetime | None = None
+
+
+class ConferencePage(Model):
+    conferences: list[ConferenceRead]
+    # Offset of the next page, None on the last one
+    next_offset: int | None = None
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from pydantic import root_validator
+
+from app.schemas.conference import (
+    ConferencingPlatform, Model, SettingsBase, SettingsUpdate
+)
+from app.utils.recurrence import first_occurrence
+
+
+class SeriesBase(Model):
+    title: str
+    invite_link: str
+    platform: ConferencingPlatform
+    settings: SettingsBase
+    # Start of the first occurrence, the rule repeats its local time
+    start_time: datetime
+    # Occurrences without one are recorded until stopped
+    duration: timedelta | None = None
+    time_zone: str = 'UTC'
+    # RFC 5545 recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO,WE,FR
+    rrule: str
+
+
+class SeriesCreate(SeriesBase):
+    @root_validator(skip_on_failure=True)
+    def check_rule(cls, values: dict[str, Any]) -> dict[str, Any]:
+        duration = values['duration']
+        if duration is not None and duration <= timedelta():
+            raise ValueError('duration must be positive')
+        first = first_occurrence(
+            values['rrule'], values['start_time'], values['time_zone']
+        )
+        if first is None:
+            raise ValueError('The rule has no occurrences')
+        return values
+
+
+class SeriesRead(SeriesBase):
+    id: int
+    # Occurrences starting before it are scheduled as conferences
+    materialized_until: datetime | None = None
+
+
+class SeriesUpdate(Model):
+    title: str | None = None
+    invite_link: str | None = None
+    platform: ConferencingPlatform | None = None
+    settings: SettingsUpdate | None = None
+    start_time: datetime | None = None
+    duration: timedelta | None = None
+    time_zone: str | None = None
+    rrule: str | None = None
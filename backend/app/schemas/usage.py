@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+
+from app.schemas.conference import ConferencingPlatform, RecordingStatus
+
+
+class UsageTotals(BaseModel):
+    recordings: int = 0
+    recorded_hours: float = 0
+    storage_bytes: int = 0
+
+
+class UsageLimits(BaseModel):
+    max_concurrent_recordings: int
+    monthly_recording_hours: int
+
+
+class Usage(BaseModel):
+    limits: UsageLimits
+    total: UsageTotals = Field(default_factory=UsageTotals)
+    # Calendar month in UTC, as monthly quotas count it
+    this_month: UsageTotals = Field(default_factory=UsageTotals)
+    recordings_by_status: dict[RecordingStatus, int] = {}
+    by_platform: dict[ConferencingPlatform, UsageTotals] = {}
@@ -27,3 +27,8 @@ class UserRead(UserBase):
 
 class UserInDb(UserBase):
     id: int
+
+
+class DataVersion(BaseModel):
+    user_id: int
+    version: int
@@ -0,0 +1,180 @@
+"""Fingerprinted and precompressed static assets.
+
+Assets from the static directory are copied to the build directory under
+names containing a hash of their content, so they can be cached by browsers
+forever, next to gzip and brotli variants of the compressible ones. Run at
+startup, or ahead of time with `python -m app.utils.assets`.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import tempfile
+from typing import Self
+
+import brotli
+from jinja2 import pass_context
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.utils.encoding import choose_encoding
+
+STATIC_DIR = os.getenv('STATIC_DIR', 'static')
+STATIC_BUILD_DIR = os.getenv(
+    'STATIC_BUILD_DIR', os.path.join(tempfile.gettempdir(), 'backend-static')
+)
+
+MANIFEST_FILENAME = 'manifest.json'
+
+HASH_LENGTH = 12
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+# Variants in order of preference
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+log = logging.getLogger(__name__)
+
+_manifest: dict[str, str] = {}
+_fingerprinted: set[str] = set()
+
+
+def build_assets(
+    source: str = STATIC_DIR, target: str = STATIC_BUILD_DIR
+) -> dict[str, str]:
+    """Build assets and return manifest of original to fingerprinted paths.
+
+    Files are content addressed, so existing ones are kept and several
+    workers may build into the same directory at once.
+    """
+    manifest = {}
+    for root, _, files in os.walk(source):
+        for name in files:
+            source_path = os.path.join(root, name)
+            path = os.path.relpath(source_path, source).replace(os.sep, '/')
+
+            with open(source_path, 'rb') as f:
+                content = f.read()
+
+            digest = hashlib.md5(content).hexdigest()[:HASH_LENGTH]
+            stem, extension = os.path.splitext(path)
+            fingerprinted = f'{stem}.{digest}{extension}'
+            manifest[path] = fingerprinted
+
+            # Unversioned copies keep serving hardcoded paths
+            for built in (path, fingerprinted):
+                _write(os.path.join(target, built), content)
+
+                if extension in COMPRESSIBLE_EXTENSIONS:
+                    _write(
+                        os.path.join(target, built) + ENCODINGS['gzip'],
+                        gzip.compress(content, compresslevel=9, mtime=0)
+                    )
+                    _write(
+                        os.path.join(target, built) + ENCODINGS['br'],
+                        brotli.compress(content)
+                    )
+
+    _write(
+        os.path.join(target, MANIFEST_FILENAME),
+        json.dumps(manifest, indent=2, sort_keys=True).encode()
+    )
+
+    _manifest.clear()
+    _manifest.update(manifest)
+    _fingerprinted.clear()
+    _fingerprinted.update(manifest.values())
+    log.info('Built %s static assets into %s', len(manifest), target)
+    return manifest
+
+
+def _write(path: str, content: bytes) -> None:
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+@pass_context
+def asset_url(context: dict, path: str) -> str:
+    """Jinja helper returning URL of the fingerprinted asset."""
+    path = path.lstrip('/')
+    return str(context['request'].url_for(
+        'static', path=_manifest.get(path, path)
+    ))
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Serves precompressed variants of assets built by `build_assets`.
+
+    Fingerprinted assets are cached as immutable, everything else is
+    revalidated on every use.
+    """
+
+    def file_response(
+        self: Self,
+        full_path: str,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        media_type = mimetypes.guess_type(full_path)[0] or 'text/plain'
+
+        headers = {
+            'cache-control': (
+                IMMUTABLE_CACHE_CONTROL
+                if self._is_fingerprinted(full_path)
+                else REVALIDATE_CACHE_CONTROL
+            )
+        }
+
+        variants = {
+            encoding: full_path + suffix
+            for encoding, suffix in ENCODINGS.items()
+            if os.path.isfile(full_path + suffix)
+        }
+        if variants:
+            headers['vary'] = 'Accept-Encoding'
+
+        encoding = choose_encoding(
+            request_headers.get('accept-encoding', ''), variants
+        )
+        if encoding is not None:
+            full_path = variants[encoding]
+            stat_result = os.stat(full_path)
+            headers['content-encoding'] = encoding
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            method=scope['method'],
+            stat_result=stat_result
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _is_fingerprinted(self: Self, full_path: str) -> bool:
+        path = os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+        return path in _fingerprinted
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    build_assets()
@@ -0,0 +1,93 @@
+import gzip
+import os
+from typing import Self
+
+import anyio
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.encoding import choose_encoding
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv('COMPRESSION_MINIMUM_SIZE', 1024))
+# Dynamic responses favour compression speed over ratio
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+
+COMPRESSIBLE_TYPES = ('text/html', 'application/json', 'text/plain')
+# In order of preference
+ENCODINGS = ('br', 'gzip')
+
+
+def _compress(encoding: str, body: bytes) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Compresses HTML and JSON responses with brotli or gzip.
+
+    Only responses sent in a single body message are compressed, streamed
+    ones like server-sent events pass through untouched, as do responses
+    already encoded, e.g. precompressed static files.
+    """
+
+    def __init__(
+        self: Self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE
+    ) -> None:
+        self._app = app
+        self._minimum_size = minimum_size
+
+    async def __call__(
+        self: Self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http':
+            await self._app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(
+            Headers(scope=scope).get('accept-encoding', ''), ENCODINGS
+        )
+        if encoding is None:
+            await self._app(scope, receive, send)
+            return
+
+        start_message: Message | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+
+            if start_message is None:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            headers = MutableHeaders(raw=start_message['headers'])
+            content_type = headers.get('content-type', '')
+            if (
+                message.get('more_body', False)
+                or len(body) < self._minimum_size
+                or 'content-encoding' in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start_message)
+                start_message = None
+                await send(message)
+                return
+
+            body = await anyio.to_thread.run_sync(_compress, encoding, body)
+            headers['content-encoding'] = encoding
+            headers['content-length'] = str(len(body))
+            headers.add_vary_header('Accept-Encoding')
+
+            await send(start_message)
+            start_message = None
+            await send({'type': 'http.response.body', 'body': body})
+
+        await self._app(scope, receive, send_compressed)
@@ -0,0 +1,41 @@
+from typing import Iterable
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """Return q-values of the codings listed in an Accept-Encoding header.
+
+    Codings are lowercased, those with a malformed q-value are left out.
+    """
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = -1
+        if 0 <= q <= 1:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str, encodings: Iterable[str]) -> str | None:
+    """Return the encoding the client prefers, None to send it as is.
+
+    Encodings are given in the server's order of preference, which decides
+    between equal q-values. `*` stands for codings the header does not
+    name, and q=0 refuses a coding.
+    """
+    accepted = parse_accept_encoding(header)
+    default = accepted.get('*', 0)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, default)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -0,0 +1,13 @@
+from app.schemas.user import DataVersion
+
+
+def make_etag(data_version: DataVersion) -> str:
+    # Weak, as the same version is sent with different content encodings
+    return f'W/"{data_version.user_id}-{data_version.version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags
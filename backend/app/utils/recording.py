@@ -1,21 +1,52 @@
 from hashlib import md5
+from pathlib import PurePosixPath
 from typing import TypeVar
 
-from app.schemas.conference import ConferenceBase
+from app.schemas.conference import CaptureProfile, ConferenceBase
 
 ENCODING = 'utf-8'
 
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+# Audio is recorded by the browser, which only encodes WebM
+EXTENSIONS = {
+    CaptureProfile.FULL_HD: 'mp4',
+    CaptureProfile.HD: 'mp4',
+    CaptureProfile.SD: 'mp4',
+    CaptureProfile.AUDIO_ONLY: 'webm'
+}
+
 Conference = TypeVar('Conference', bound=ConferenceBase)
 
 
 def generate_recording_filename(
-    user_id: int,
     conference: Conference,
     conference_id: int
 ) -> str:
+    """Name the recording after the meeting it captures.
+
+    The name is derived from the meeting identity (invite link and start
+    time) of the conference that first requested it, so every user that
+    later schedules the same meeting shares the file by reference.
+    """
     filename = (
-        f'{user_id}-{conference_id}-'
-        f'{conference.invite_link}-{conference.start_time}'
+        f'{conference.invite_link.strip()}-'
+        f'{conference.start_time.isoformat()}-{conference_id}'
     ).encode(ENCODING)
 
-    return f'{md5(filename).hexdigest()}.mp4'
+    extension = EXTENSIONS[conference.settings.capture_profile]
+    return shard_filename(f'{md5(filename).hexdigest()}.{extension}')
+
+
+def shard_filename(filename: str) -> str:
+    """Prefix `filename` with hash-derived directories, e.g. `ab/cd/abcd.mp4`.
+
+    Keeps the number of entries per directory bounded when storing
+    millions of recordings.
+    """
+    shards = [
+        filename[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_LEVELS)
+    ]
+    return str(PurePosixPath(*shards, filename))
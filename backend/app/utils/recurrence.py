@@ -0,0 +1,43 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil.rrule import rrule, rrulestr
+
+# Finer rules would materialize a conference per hour or minute
+FREQUENCIES = {'DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY'}
+# The time of day is that of the start of the series
+_TIME_OF_DAY_PARTS = {'BYHOUR', 'BYMINUTE', 'BYSECOND'}
+
+
+def parse_rule(rule: str, start_time: datetime, time_zone: str) -> rrule:
+    """Parse RRULE of a series, raising ValueError if it is not allowed.
+
+    Occurrences keep the local time of `start_time` in `time_zone`, which
+    naive start times are taken to be in.
+    """
+    try:
+        zone = ZoneInfo(time_zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'Unknown time zone {time_zone}')
+
+    parts = dict(
+        part.partition('=')[::2]
+        for part in rule.upper().removeprefix('RRULE:').split(';')
+    )
+    if parts.get('FREQ') not in FREQUENCIES:
+        raise ValueError(
+            f'FREQ must be one of {", ".join(sorted(FREQUENCIES))}'
+        )
+    if _TIME_OF_DAY_PARTS & parts.keys():
+        raise ValueError('Occurrences start at the time of the first one')
+
+    if start_time.tzinfo is None:
+        start_time = start_time.replace(tzinfo=zone)
+    return rrulestr(rule, dtstart=start_time.astimezone(zone))
+
+
+def first_occurrence(
+    rule: str, start_time: datetime, time_zone: str
+) -> datetime | None:
+    """Return start of the first occurrence, None if there is none."""
+    return next(iter(parse_rule(rule, start_time, time_zone)), None)
@@ -0,0 +1,136 @@
+import os
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Generic, Hashable, Self, TypeVar
+
+from fastapi import Request
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from pydantic import BaseModel
+
+from app.metrics import TimedTemplate
+from app.schemas.conference import ConferenceRead
+from app.schemas.user import DataVersion
+from app.utils.assets import asset_url
+
+JINJA_BYTECODE_CACHE_DIR = os.getenv(
+    'JINJA_BYTECODE_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'backend-jinja')
+)
+RENDER_CACHE_MAX_PAGES = int(os.getenv('RENDER_CACHE_MAX_PAGES', 3000))
+RENDER_CACHE_MAX_CARDS = int(os.getenv('RENDER_CACHE_MAX_CARDS', 100_000))
+
+CONFERENCE_TEMPLATE = 'conference.html'
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+
+# Compiled templates are shared by workers and survive restarts
+templates = Jinja2Templates(directory='templates')
+templates.env.bytecode_cache = FileSystemBytecodeCache(
+    JINJA_BYTECODE_CACHE_DIR
+)
+templates.env.globals['asset_url'] = asset_url
+templates.env.template_class = TimedTemplate
+
+
+class LRUCache(Generic[K, V]):
+    def __init__(self: Self, max_size: int) -> None:
+        self._max_size = max_size
+        self._items: OrderedDict[K, V] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self: Self, key: K) -> V | None:
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self: Self, key: K, value: V) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self._max_size:
+                self._items.popitem(last=False)
+
+
+@dataclass(frozen=True)
+class _Page:
+    version: int
+    base_url: str
+    cards: list[Markup]
+
+
+class RenderCache:
+    """Rendered conference cards of the users' pages.
+
+    Card lists of a page are valid while the user's data version, which the
+    database bumps on every change of their conferences, stays the same.
+    Cards themselves are keyed by their content, so after a change only the
+    changed conferences are rendered again.
+    """
+
+    def __init__(
+        self: Self,
+        max_pages: int = RENDER_CACHE_MAX_PAGES,
+        max_cards: int = RENDER_CACHE_MAX_CARDS
+    ) -> None:
+        self._pages: LRUCache[tuple[int, str], _Page] = LRUCache(max_pages)
+        self._cards: LRUCache[tuple, Markup] = LRUCache(max_cards)
+
+    def get_cards(
+        self: Self,
+        request: Request,
+        data_version: DataVersion,
+        page: str,
+        fetch: Callable[[], list[ConferenceRead]]
+    ) -> list[Markup]:
+        """Return cards of the page, fetching conferences on a miss.
+
+        The data version must be read before fetching, so a change racing
+        with the fetch at worst causes one more miss.
+        """
+        key = (data_version.user_id, page)
+        base_url = str(request.base_url)
+
+        cached = self._pages.get(key)
+        if (
+            cached is not None
+            and cached.version == data_version.version
+            and cached.base_url == base_url
+        ):
+            return cached.cards
+
+        cards = [self.render_card(request, c) for c in fetch()]
+        self._pages.set(key, _Page(data_version.version, base_url, cards))
+        return cards
+
+    def render_card(
+        self: Self, request: Request, conference: ConferenceRead
+    ) -> Markup:
+        key = (str(request.base_url), _fingerprint(conference))
+
+        card = self._cards.get(key)
+        if card is None:
+            card = Markup(templates.get_template(CONFERENCE_TEMPLATE).render(
+                request=request, conference=conference
+            ))
+            self._cards.set(key, card)
+        return card
+
+
+def _fingerprint(model: BaseModel) -> tuple[Any, ...]:
+    # Much cheaper than serializing the model
+    return tuple(
+        _fingerprint(v) if isinstance(v, BaseModel) else v
+        for v in model.__dict__.values()
+    )
+
+
+render_cache = RenderCache()
@@ -0,0 +1,113 @@
+"""Memory of idle event stream connections and fan-out latency.
+
+Connections are opened by calling the ASGI application directly, so the
+whole request handling is measured without sockets. Run from the backend
+directory:
+
+    python -m benchmarks.events --connections 10000
+"""
+import argparse
+import asyncio
+import logging
+from time import perf_counter
+
+from app.persistence import postgres as db
+from app.persistence.notifications import status_listener
+from app.schemas.conference import RecordingStatus, RecordingStatusEvent
+from app.schemas.user import DataVersion
+from main import app
+
+USERS = 1000
+
+
+def rss_mib() -> float:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def make_scope(user_id: int) -> dict:
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': '/api/events',
+        'raw_path': b'/api/events',
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'cookie', f'token={user_id}'.encode())],
+        'client': ('127.0.0.1', 1),
+        'server': ('testserver', 80)
+    }
+
+
+async def open_connection(
+    user_id: int, disconnected: asyncio.Event, received: list[float]
+) -> None:
+    async def receive() -> dict:
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: dict) -> None:
+        if b'event: status' in message.get('body', b''):
+            received.append(perf_counter())
+
+    await app(make_scope(user_id), receive, send)
+
+
+async def run(connections: int) -> None:
+    db.get_data_version = lambda token: DataVersion(
+        user_id=int(token), version=0
+    )
+
+    disconnected = asyncio.Event()
+    received: list[float] = []
+
+    rss_before = rss_mib()
+    tasks = [
+        asyncio.create_task(
+            open_connection(i % USERS, disconnected, received)
+        )
+        for i in range(connections)
+    ]
+    while status_listener.subscription_count < connections:
+        await asyncio.sleep(0.1)
+    rss_after = rss_mib()
+
+    print(
+        f'{connections} idle connections: '
+        f'RSS +{rss_after - rss_before:.1f} MiB, '
+        f'{(rss_after - rss_before) * 1024 / connections:.1f} KiB each'
+    )
+
+    start = perf_counter()
+    for user_id in range(USERS):
+        status_listener.publish(user_id, RecordingStatusEvent(
+            conference_id=user_id, status=RecordingStatus.IN_PROGRESS
+        ))
+    while len(received) < connections:
+        await asyncio.sleep(0.01)
+    print(
+        f'Fan-out of {USERS} events to {connections} connections: '
+        f'{(max(received) - start) * 1000:.1f} ms'
+    )
+
+    disconnected.set()
+    await asyncio.gather(*tasks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=10000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(run(args.connections))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Request throughput of conference creation with logging at INFO vs DEBUG.
+
+The database is replaced by an in-memory stub and logs go to a temporary
+file. The synchronous handler writing plain text on the request thread,
+as the backend used to, is measured for comparison. Run from the backend
+directory:
+
+    python -m benchmarks.log_throughput --requests 2000
+"""
+import argparse
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from fastapi.testclient import TestClient
+
+from app.log_config import setup_logging
+from app.persistence import postgres as db
+from app.schemas.conference import ConferenceCreate, ConferenceRead, Recording
+from main import app
+
+CONFERENCE = {
+    'title': 'Benchmark',
+    'invite_link': 'https://us04web.zoom.us/j/1?pwd=benchmark',
+    'start_time': (datetime.now() + timedelta(days=1)).isoformat(),
+    'platform': 'zoom',
+    'settings': {
+        'participant_name': 'Recorder',
+        'disclaimer_message': 'This meeting is being recorded.'
+    }
+}
+
+
+def fake_create_conference(
+    token: str, conference: ConferenceCreate
+) -> ConferenceRead:
+    return ConferenceRead(
+        id=1, recording=Recording(filename='benchmark.mp4'), **conference.dict()
+    )
+
+
+def measure(name: str, client: TestClient, requests: int) -> None:
+    start = perf_counter()
+    for _ in range(requests):
+        client.post('/api/conferences', json=CONFERENCE).raise_for_status()
+    elapsed = perf_counter() - start
+    print(f'{name:<28} {requests / elapsed:8.1f} requests/s')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    db.create_conference = fake_create_conference
+    client = TestClient(app, cookies={'token': 'benchmark'})
+    root = logging.getLogger()
+
+    with tempfile.TemporaryFile('w') as log_file:
+        root.handlers = [logging.StreamHandler(log_file)]
+        root.handlers[0].setFormatter(logging.Formatter(
+            '[%(asctime)s]:%(levelname)s:%(name)s:%(module)s:%(message)s'
+        ))
+        root.setLevel(logging.DEBUG)
+        measure('synchronous text, DEBUG', client, args.requests)
+
+        for level in ('DEBUG', 'INFO'):
+            setup_logging(log_file)
+            root.setLevel(level)
+            measure(f'queued JSON, {level}', client, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Render time of the history page of a user with many conferences.
+
+The database is replaced by in-memory conferences, so only the request
+handling and rendering are measured. Run from the backend directory:
+
+    python -m benchmarks.render --conferences 1000
+"""
+import argparse
+import logging
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from fastapi.testclient import TestClient
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.persistence import postgres as db
+from app.routers import pages
+from app.schemas.conference import (
+    ConferenceRead,
+    ConferencingPlatform,
+    Recording,
+    RecordingStatus,
+    SettingsBase
+)
+from app.schemas.user import DataVersion
+from app.utils.rendering import RenderCache
+from main import app
+
+USER_ID = 1
+
+_version = 0
+_conferences: list[ConferenceRead] = []
+
+
+def make_conference(id_: int) -> ConferenceRead:
+    start_time = datetime(2023, 6, 1) + timedelta(hours=id_)
+    return ConferenceRead(
+        id=id_,
+        title=f'Conference #{id_}',
+        invite_link=f'https://us04web.zoom.us/j/{id_}?pwd=benchmark',
+        start_time=start_time,
+        end_time=start_time + timedelta(hours=1),
+        platform=ConferencingPlatform.ZOOM,
+        settings=SettingsBase(
+            participant_name='Recorder', disclaimer_message='Hi'
+        ),
+        recording=Recording(
+            filename=f'{id_}.mp4', status=RecordingStatus.FINISHED
+        )
+    )
+
+
+def fake_get_data_version(token: str) -> DataVersion:
+    return DataVersion(user_id=USER_ID, version=_version)
+
+
+def fake_get_finished_conferences(token: str) -> list[ConferenceRead]:
+    return _conferences
+
+
+def measure(
+    client: TestClient, runs: int, before_each=lambda: None
+) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        before_each()
+        start = perf_counter()
+        client.get('/history').raise_for_status()
+        timings.append((perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    print(
+        f'{name:<22} median {statistics.median(timings):7.1f} ms, '
+        f'max {max(timings):7.1f} ms'
+    )
+
+
+def change_one_conference() -> None:
+    global _version
+    _version += 1
+    _conferences[0] = _conferences[0].copy(update={'title': str(_version)})
+
+
+def measure_template_loading() -> None:
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for name in ('no bytecode cache', 'bytecode cache cold',
+                     'bytecode cache warm'):
+            env = Environment(loader=FileSystemLoader('templates'))
+            if name != 'no bytecode cache':
+                env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+            start = perf_counter()
+            for template in env.list_templates(extensions=['html']):
+                env.get_template(template)
+            print(f'{name:<22} {(perf_counter() - start) * 1000:7.1f} ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conferences', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    _conferences.extend(make_conference(i) for i in range(args.conferences))
+    db.get_data_version = fake_get_data_version
+    db.get_finished_conferences = fake_get_finished_conferences
+
+    client = TestClient(app, cookies={'token': 'benchmark'})
+    print(f'GET /history with {args.conferences} conferences:')
+
+    pages.render_cache = RenderCache(max_pages=0, max_cards=0)
+    report('uncached', measure(client, args.runs))
+
+    pages.render_cache = RenderCache()
+    report('cold cache', measure(client, 1))
+    report('cached page', measure(client, args.runs))
+    report('one conference changed', measure(
+        client, args.runs, change_one_conference
+    ))
+
+    print('Loading all templates:')
+    measure_template_loading()
+
+
+if __name__ == '__main__':
+    main()
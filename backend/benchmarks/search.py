@@ -0,0 +1,168 @@
+"""Latency of conference search for a user with many conferences.
+
+Fills the database given by the POSTGRES_* variables, which must be a
+scratch database with create_tables.sql applied, with `--conferences`
+conferences of one user and `--others` of other users, spread over
+`--months` months. Run from the backend directory:
+
+    python -m benchmarks.search --conferences 100000
+
+Loading runs with triggers disabled, so search vectors are computed by the
+load itself. It can be skipped with `--no-load` on later runs.
+"""
+import argparse
+import logging
+import statistics
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from psycopg2 import connect
+
+from app.persistence import postgres as db
+from app.schemas.conference import ConferencingPlatform, RecordingStatus
+from app.schemas.search import ConferenceSearch
+
+USERS = 1000
+BATCH_SIZE = 100_000
+TOKEN = 'benchmark'
+PAGE_SIZE = 20
+
+LOAD_BATCH = """
+INSERT INTO conferences
+  (id, user_id, title, invite_link, start_time, end_time, platform,
+   search_vector)
+SELECT i, user_id, title, 'https://us04web.zoom.us/j/' || i, start_time,
+  start_time + interval '1 hour',
+  (ARRAY['zoom', 'google_meet'])[1 + i %% 2]::conferencing_platform,
+  conference_search_vector(title, disclaimer_message)
+FROM (
+  SELECT i,
+    CASE WHEN i <= %(conferences)s THEN 1 ELSE 2 + i %% %(users)s END
+      AS user_id,
+    (ARRAY['Weekly', 'Daily', 'Quarterly', 'Monthly', 'Ad hoc'])[1 + i %% 5]
+      || ' '
+      || (ARRAY['planning', 'standup', 'review', 'retro', 'sync',
+        'interview', 'demo', 'kickoff', 'design', 'budget', 'hiring',
+        'roadmap', 'onboarding', 'incident', 'strategy'])[1 + i / 5 %% 15]
+      || ' '
+      || (ARRAY['meeting', 'call', 'session'])[1 + i / 75 %% 3]
+      || ' project ' || i %% 997 AS title,
+    (ARRAY['This meeting is being recorded.',
+      'Recorded for the minutes of the board.',
+      'Recorded for teammates in other time zones.'])[1 + i %% 3]
+      AS disclaimer_message,
+    NOW() - %(months)s * interval '1 month'
+      * ((i %% %(conferences)s)::float / %(conferences)s) AS start_time
+  FROM generate_series(%(first)s, %(last)s) i
+) AS c;
+
+INSERT INTO conference_settings
+  (id, conference_id, conference_start_time, participant_name,
+   disclaimer_message)
+SELECT id, id, start_time, 'Recorder',
+  (ARRAY['This meeting is being recorded.',
+    'Recorded for the minutes of the board.',
+    'Recorded for teammates in other time zones.'])[1 + id %% 3]
+FROM conferences
+WHERE id BETWEEN %(first)s AND %(last)s;
+
+INSERT INTO recordings
+  (id, conference_id, conference_start_time, filename, status)
+SELECT id, id, start_time, id || '.mp4',
+  (ARRAY['finished', 'finished', 'finished', 'rejected'])[1 + id %% 4]
+    ::recording_status
+FROM conferences
+WHERE id BETWEEN %(first)s AND %(last)s;
+"""
+
+
+def load(conferences: int, others: int, months: int) -> None:
+    conn = connect(**db.POSTGRES_DB_CONFIG)
+    conn.autocommit = True
+    total = conferences + others
+    with conn.cursor() as cur:
+        cur.execute('SET session_replication_role = replica')
+        cur.execute(
+            'SELECT create_conference_partitions('
+            "(NOW() - %s * interval '1 month')::date, %s)",
+            (months, months + 2)
+        )
+        cur.execute(
+            "INSERT INTO users (id, login, password) "
+            "SELECT i, 'user' || i, '' FROM generate_series(1, %s) i",
+            (USERS + 1,)
+        )
+        cur.execute(
+            'INSERT INTO sessions (user_id, token, expires_at) '
+            "VALUES (1, %s, NOW() + interval '1 day')",
+            (TOKEN,)
+        )
+        for first in range(1, total + 1, BATCH_SIZE):
+            last = min(first + BATCH_SIZE - 1, total)
+            cur.execute(LOAD_BATCH, {
+                'users': USERS,
+                'months': months,
+                'conferences': conferences,
+                'first': first,
+                'last': last
+            })
+            print(f'Loaded {last} conferences')
+        cur.execute('VACUUM ANALYZE')
+    conn.close()
+
+
+def measure(
+    name: str, search: ConferenceSearch, runs: int, offset: int = 0
+) -> None:
+    page = db.search_conferences(TOKEN, search, offset, PAGE_SIZE)
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        db.search_conferences(TOKEN, search, offset, PAGE_SIZE)
+        timings.append((perf_counter() - start) * 1000)
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(
+        f'{name:<34} {len(page.conferences):>2} results, '
+        f'median {statistics.median(timings):6.1f} ms, p95 {p95:6.1f} ms'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conferences', type=int, default=100_000)
+    parser.add_argument('--others', type=int, default=900_000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--no-load', dest='load', action='store_false')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.load:
+        load(args.conferences, args.others, args.months)
+
+    now = datetime.now(timezone.utc)
+    march = ConferenceSearch(
+        q='planning meeting', since=now - timedelta(days=60), until=now
+    )
+    for name, search, offset in [
+        ('common word', ConferenceSearch(q='meeting'), 0),
+        ('two words', ConferenceSearch(q='planning meeting'), 0),
+        ('typo', ConferenceSearch(q='planing'), 0),
+        ('rare words', ConferenceSearch(q='project 42'), 0),
+        ('disclaimer words', ConferenceSearch(q='board minutes'), 0),
+        ('words in two months', march, 0),
+        ('words and filters', ConferenceSearch(
+            q='review',
+            platforms=[ConferencingPlatform.ZOOM],
+            statuses=[RecordingStatus.FINISHED]
+        ), 0),
+        ('no words, two months', ConferenceSearch(
+            since=now - timedelta(days=60), until=now
+        ), 0),
+        ('common word, page 50', ConferenceSearch(q='meeting'), 49 * PAGE_SIZE)
+    ]:
+        measure(name, search, args.runs, offset)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Requests and bytes of static assets per page load.
+
+Compares the plain static mount serving original files with fingerprinted,
+precompressed assets, for a first and a repeated load of the home page.
+A browser revalidates assets on a repeated load unless they are immutable.
+Run from the backend directory:
+
+    python -m benchmarks.static_assets
+"""
+import logging
+import re
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.staticfiles import StaticFiles
+
+from app.persistence import postgres as db
+from app.schemas.conference import ConferencingPlatform
+from app.schemas.user import DataVersion
+from app.utils.assets import STATIC_DIR, build_assets
+from benchmarks.render import make_conference
+from main import app
+
+ASSET_PATTERN = re.compile(r'(?:src|href)="http://testserver/static/([^"]+)"')
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+
+def page_assets(client: TestClient) -> list[str]:
+    response = client.get('/')
+    response.raise_for_status()
+    return sorted(set(ASSET_PATTERN.findall(response.text)))
+
+
+def load(
+    client: TestClient, paths: list[str], cached: dict[str, str] | None
+) -> tuple[int, int]:
+    """Fetch assets like a browser, return count of requests and bytes.
+
+    With cached ETags assets are revalidated, immutable ones are skipped.
+    """
+    requests, transferred = 0, 0
+    for path in paths:
+        headers = {'accept-encoding': ACCEPT_ENCODING}
+        if cached is not None:
+            if 'immutable' in cached[path].get('cache-control', ''):
+                continue
+            headers['if-none-match'] = cached[path]['etag']
+
+        response = client.get(f'/static/{path}', headers=headers)
+        requests += 1
+        transferred += response.num_bytes_downloaded
+    return requests, transferred
+
+
+def measure(name: str, client: TestClient, paths: list[str]) -> None:
+    first = load(client, paths, None)
+    cached = {
+        path: client.get(
+            f'/static/{path}', headers={'accept-encoding': ACCEPT_ENCODING}
+        ).headers
+        for path in paths
+    }
+    repeated = load(client, paths, cached)
+    print(
+        f'{name:<13} first load {first[0]} requests, {first[1]:>7} bytes; '
+        f'repeated load {repeated[0]} requests, {repeated[1]:>7} bytes'
+    )
+
+
+def main() -> None:
+    logging.disable(logging.INFO)
+    manifest = build_assets()
+    original = {v: k for k, v in manifest.items()}
+
+    conferences = [make_conference(1), make_conference(2).copy(
+        update={'platform': ConferencingPlatform.MEET}
+    )]
+    db.get_data_version = lambda token: DataVersion(user_id=1, version=0)
+    db.get_upcoming_conferences = lambda token: conferences
+
+    client = TestClient(app, cookies={'token': 'benchmark'})
+    paths = page_assets(client)
+
+    before = FastAPI()
+    before.mount('/static', StaticFiles(directory=STATIC_DIR))
+    measure(
+        'before:', TestClient(before), [original.get(p, p) for p in paths]
+    )
+    measure('after:', client, paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,60 @@
-import logging
-
 from fastapi import FastAPI
-from starlette.staticfiles import StaticFiles
 
+from common.internal import InternalServer
+
+from app.log_config import setup_logging
+from app.metrics import MetricsMiddleware, collect_runtime_metrics
+from app.persistence.notifications import status_listener
 from app.routers import api, pages
+from app.tracing import TracingMiddleware, setup_tracing
+from app.utils.assets import (
+    STATIC_BUILD_DIR, PrecompressedStaticFiles, build_assets
+)
+from app.utils.compression import CompressionMiddleware
 
 app = FastAPI(title='Backend')
 
-logging.basicConfig(
-    format='[%(asctime)s]:%(levelname)s:%(name)s:%(module)s:%(message)s',
-    level=logging.DEBUG
-)
+setup_logging()
+setup_tracing('backend')
+
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 app.include_router(api.router)
 app.include_router(pages.router)
 
-app.mount('/static', StaticFiles(directory='static'), name='static')
+
+# Metrics and query statistics, on a port of their own
+internal_server = InternalServer(
+    lambda: collect_runtime_metrics(status_listener.subscription_count)
+)
+
+
+@app.on_event('startup')
+async def start_status_listener() -> None:
+    status_listener.start()
+
+
+@app.on_event('startup')
+async def start_internal_server() -> None:
+    internal_server.start()
+
+
+@app.on_event('shutdown')
+async def stop_status_listener() -> None:
+    await status_listener.stop()
+
+
+@app.on_event('shutdown')
+async def stop_internal_server() -> None:
+    await internal_server.stop()
+
+
+build_assets()
+
+app.mount(
+    '/static',
+    PrecompressedStaticFiles(directory=STATIC_BUILD_DIR),
+    name='static'
+)
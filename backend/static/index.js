@@ -4,6 +4,8 @@ const SIGN_OUT_URI = '/api/users/sign-out'
 const SCHEDULE_MEETING_URI = '/api/conferences'
 const DELETE_MEETING_URI = '/api/conferences/'
 const STOP_RECORDING_URI = '/api/conferences/{}/recording/stop'
+const CONFERENCE_URI = '/api/conferences/'
+const EVENTS_URI = '/api/events'
 
 const ZOOM_LOGO_URI = '/static/img/zoom.svg'
 const MEET_LOGO_URI = '/static/img/meet.png'
@@ -25,6 +27,10 @@ const RECORDING_STATUS_TO_HTML = {
     'finished': {
         icon: '<i class="fa-solid fa-circle-check"></i>',
         text: 'Finished'
+    },
+    'rejected': {
+        icon: '<i class="fa-solid fa-ban"></i>',
+        text: 'Rejected'
     }
 }
 
@@ -87,6 +93,34 @@ window.addEventListener('DOMContentLoaded', event => {
         conferenceContainer.innerHTML += data
     }
 
+    // Live recording status updates, cards move between the pages
+    const updateConferenceStatus = async ({conference_id, status}) => {
+        removeConferenceFromPage(conference_id)
+        // The history page lists both finished and rejected recordings
+        if (!conferenceContainer.dataset.status.split(' ').includes(status)) return
+
+        let response
+        try {
+            response = await fetch(
+                `${location.origin}${CONFERENCE_URI}${conference_id}`,
+                {headers: {'Accept': 'text/html'}}
+            )
+        } catch (error) {
+            console.error(error)
+            return
+        }
+
+        if (response.status === 200) renderConference(await response.text())
+    }
+
+    if (conferenceContainer) {
+        const events = new EventSource(`${location.origin}${EVENTS_URI}`)
+        events.addEventListener('status', event => {
+            updateConferenceStatus(JSON.parse(event.data))
+        })
+        events.addEventListener('resync', () => document.location.reload())
+    }
+
     function mapConferenceToHTML(data) {
         const imgHref = `${location.origin}${LOGO_URI[data['platform']]}`
 
@@ -118,6 +152,7 @@ window.addEventListener('DOMContentLoaded', event => {
     const inviteLinkInput = document.getElementById('inviteLink')
     const participantNameInput = document.getElementById('participantName')
     const diclaimerMessageInput = document.getElementById('disclaimerMessage')
+    const captureProfileSelect = document.getElementById('captureProfile')
     const scheduleButton = document.getElementById('scheduleBtn')
 
     function formatDatetimeToISO(datetimeValue) {
@@ -174,7 +209,8 @@ window.addEventListener('DOMContentLoaded', event => {
             'platform': platformSelect.value,
             'settings': {
                 'participant_name': participantNameInput.value,
-                'disclaimer_message': diclaimerMessageInput.value
+                'disclaimer_message': diclaimerMessageInput.value,
+                'capture_profile': captureProfileSelect.value
             }
         }
     }
@@ -185,6 +221,7 @@ window.addEventListener('DOMContentLoaded', event => {
         inviteLinkInput.value = ''
         participantNameInput.value = ''
         diclaimerMessageInput.value = ''
+        captureProfileSelect.value = 'full_hd'
 
         startTimeInput.value = ''
         endTimeInput.value = ''
@@ -197,6 +234,15 @@ window.addEventListener('DOMContentLoaded', event => {
 
     }
 
+    const scheduleAlert = document.getElementById('scheduleAlert')
+
+    const showScheduleAlert = (message, level) => {
+        scheduleAlert.textContent = message || ''
+        scheduleAlert.classList.toggle('d-none', !message)
+        scheduleAlert.classList.toggle('alert-danger', level === 'danger')
+        scheduleAlert.classList.toggle('alert-warning', level === 'warning')
+    }
+
     const sendScheduleForm = async () => {
         let response
 
@@ -215,8 +261,15 @@ window.addEventListener('DOMContentLoaded', event => {
             return
         }
 
+        if (response.status === 403 || response.status === 409) {
+            // Quota of the user or capacity of the bots exceeded
+            showScheduleAlert((await response.json())['detail'], 'danger')
+            return
+        }
         if (response.status !== 201) return
 
+        // Scheduled, but it may wait for a free bot
+        showScheduleAlert(response.headers.get('X-Capacity-Warning'), 'warning')
         const htmlResponse = await response.text()
 
         renderConference(htmlResponse)
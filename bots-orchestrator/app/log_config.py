@@ -0,0 +1,156 @@
+"""Logging setup shared by the services.
+
+Records are written as JSON lines by a background thread, so logging call
+sites only pay for filtering and %-style message formatting, which is
+skipped for disabled levels. Configured with environment variables:
+
+    LOG_LEVEL=INFO
+    LOG_LEVELS=app.persistence=DEBUG,uvicorn.access=WARNING
+"""
+import atexit
+import json
+import logging
+import os
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from threading import Lock
+from time import monotonic
+from typing import Any, Self, TextIO
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+# Records per second of each message on sampled loggers
+LOG_SAMPLE_RATE = int(os.getenv('LOG_SAMPLE_RATE', 10))
+
+# Bounds memory when messages are not constant, e.g. f-strings
+MAX_SAMPLED_MESSAGES = 1000
+
+# Attributes of every record, anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message'}
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self: Self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RECORD_ATTRIBUTES
+        )
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records, leaving JSON serialization to the listener thread.
+
+    The message and traceback are still rendered here, as their arguments
+    may change once the call returns.
+    """
+
+    def prepare(self: Self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most `rate` records of a message per `per_seconds`.
+
+    Records are told apart by their unformatted message. Warnings and
+    errors are never dropped. The next record let through carries the
+    number of records dropped since the previous one.
+    """
+
+    def __init__(self: Self, rate: int, per_seconds: float = 1) -> None:
+        super().__init__()
+        self._rate = rate
+        self._per_seconds = per_seconds
+        self._windows: dict[Any, tuple[float, int, int]] = {}
+        self._lock = Lock()
+
+    def filter(self: Self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        now = monotonic()
+        with self._lock:
+            started_at, count, dropped = self._windows.get(
+                record.msg, (now, 0, 0)
+            )
+            if now - started_at >= self._per_seconds:
+                started_at, count = now, 0
+
+            if len(self._windows) > MAX_SAMPLED_MESSAGES:
+                self._windows.clear()
+
+            if count >= self._rate:
+                self._windows[record.msg] = (started_at, count, dropped + 1)
+                return False
+
+            self._windows[record.msg] = (started_at, count + 1, 0)
+
+        if dropped:
+            record.dropped = dropped
+        return True
+
+
+def get_sampled_logger(
+    name: str, rate: int = LOG_SAMPLE_RATE, per_seconds: float = 1
+) -> logging.Logger:
+    """Return logger for hot paths dropping records above the rate."""
+    logger = logging.getLogger(name)
+    if not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter(rate, per_seconds))
+    return logger
+
+
+def setup_logging(stream: TextIO = sys.stderr) -> None:
+    global _listener
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _listener.stop()
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+
+    queue: SimpleQueue[logging.LogRecord] = SimpleQueue()
+    _listener = QueueListener(queue, handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [DeferredQueueHandler(queue)]
+    root.setLevel(LOG_LEVEL.upper())
+
+    # Route server logs through the queue as well
+    for name in ('uvicorn', 'uvicorn.error', 'uvicorn.access'):
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+
+    for item in filter(None, LOG_LEVELS.split(',')):
+        name, _, level = item.partition('=')
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def _stop_listener() -> None:
+    # Flushes records still in the queue
+    if _listener is not None:
+        _listener.stop()
@@ -0,0 +1,102 @@
+import os
+from dataclasses import dataclass
+
+from app.schema import CaptureProfile
+
+# Bitrate of audio recorded by the browser, speech needs little
+AUDIO_BITS_PER_SECOND = int(os.getenv('AUDIO_BITS_PER_SECOND', 32000))
+AUDIO_CHUNK_SECONDS = float(os.getenv('AUDIO_CHUNK_SECONDS', 10))
+
+# Records everything the page plays, from media elements and through Web
+# Audio, into WebM chunks collected by AUDIO_COLLECT_SCRIPT. Installing it
+# again in the same document does nothing.
+AUDIO_RECORDER_SCRIPT = '''
+const [timesliceMs, bitsPerSecond] = arguments;
+if (window.__recorderAudio) return;
+
+const mix = new AudioContext();
+const output = mix.createMediaStreamDestination();
+const audio = window.__recorderAudio = {
+    chunks: [], written: Promise.resolve(), streams: new WeakSet()
+};
+
+const tap = stream => {
+    if (audio.streams.has(stream) || !stream.getAudioTracks().length) return;
+    audio.streams.add(stream);
+    mix.createMediaStreamSource(stream).connect(output);
+};
+
+const taps = new WeakMap();
+const connect = AudioNode.prototype.connect;
+AudioNode.prototype.connect = function (target, ...rest) {
+    if (target instanceof AudioDestinationNode) {
+        const context = target.context;
+        if (!taps.has(context)) {
+            const tapped = context.createMediaStreamDestination();
+            taps.set(context, tapped);
+            tap(tapped.stream);
+        }
+        connect.call(this, taps.get(context), ...rest);
+    }
+    return connect.call(this, target, ...rest);
+};
+
+setInterval(() => {
+    if (mix.state === 'suspended') mix.resume();
+    for (const media of document.querySelectorAll('audio, video')) {
+        if (media.srcObject instanceof MediaStream) tap(media.srcObject);
+    }
+}, 1000);
+
+const recorder = new MediaRecorder(output.stream, {
+    mimeType: 'audio/webm;codecs=opus', audioBitsPerSecond: bitsPerSecond
+});
+recorder.ondataavailable = event => {
+    audio.written = audio.written.then(async () => {
+        const bytes = new Uint8Array(await event.data.arrayBuffer());
+        let binary = '';
+        for (let i = 0; i < bytes.length; i += 0x8000) {
+            binary += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+        }
+        audio.chunks.push(binary);
+    });
+};
+recorder.start(timesliceMs);
+audio.recorder = recorder;
+'''
+
+# Returns chunks recorded since the last call, as base64 of WebM, flushing
+# the chunk being recorded first if `flush` is set
+AUDIO_COLLECT_SCRIPT = '''
+const [flush, done] = arguments;
+const audio = window.__recorderAudio;
+if (!audio) return done([]);
+if (flush && audio.recorder.state === 'recording') {
+    audio.recorder.requestData();
+}
+setTimeout(() => audio.written.then(
+    () => done(audio.chunks.splice(0).map(chunk => btoa(chunk)))
+), flush ? 500 : 0);
+'''
+
+
+@dataclass(frozen=True)
+class Capture:
+    """How a conference is captured, bigger screens and more frames cost
+    more CPU to encode per bot."""
+    # Screen of the Selenoid session, WIDTHxHEIGHTxDEPTH
+    screen_resolution: str
+    frame_rate: int | None
+    # Selenoid records no video, the bot records the audio of the page
+    audio_only: bool = False
+
+
+CAPTURES = {
+    CaptureProfile.FULL_HD: Capture(
+        '1920x1080x24', int(os.getenv('VIDEO_FRAME_RATE', 30))
+    ),
+    CaptureProfile.HD: Capture('1280x720x24', 24),
+    CaptureProfile.SD: Capture('854x480x24', 15),
+    # Meeting pages need some room to lay out their controls
+    CaptureProfile.AUDIO_ONLY: Capture('1280x720x24', None, audio_only=True)
+}
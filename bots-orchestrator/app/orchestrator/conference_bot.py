@@ -1,29 +1,167 @@
+import asyncio
 import logging
 import os
 import re
 from abc import ABC, abstractmethod
-from time import sleep
-from typing import Self, TypeVar, Type
+from base64 import b64decode
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Iterator, Self, TypeVar, Type
 
+import httpx
 from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, InvalidSessionIdException
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    WebDriverException
+)
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 
+from app.orchestrator import expected_conditions as EC
+from app.orchestrator.capture import (
+    AUDIO_BITS_PER_SECOND,
+    AUDIO_CHUNK_SECONDS,
+    AUDIO_COLLECT_SCRIPT,
+    AUDIO_RECORDER_SCRIPT,
+    CAPTURES,
+    Capture
+)
 from app.orchestrator.exceptions import UnsupportedConferencingPlatformError
+from app.orchestrator.metrics import BotStep, timed_step
+from app.orchestrator.webdriver import (
+    AsyncWebDriver, AsyncWebDriverWait, AsyncWebElement
+)
 from app.schema import Conference, ConferencingPlatform
+from app.tracing import tracer
 
 BOT_NAME = 'Meeting Recorder'
 
 REMOTE_ADDRESS = os.getenv('REMOTE_ADDRESS')
+# Probes failing in a row before the session counts as lost, single ones
+# are mostly network blips
+LIVENESS_MAX_FAILURES = int(os.getenv('LIVENESS_MAX_FAILURES', 3))
 
 WAIT_DURATION_SECONDS = 5
 WAIT_LONG_DURATION_SECONDS = 20 * 60
 
-ZOOM_URL_TEMPLATE = 'https://us04web.zoom.us/wc/{}/join?pwd={}'
+MUTED_ATTRIBUTE = 'data-is-muted'
+
+# Checks which screen the bot sees with a single WebDriver command. On the
+# first call it also installs a monitor remembering when any audio got
+# louder than silence or any video frame changed. Idle time is unknown
+# until the page has shown audio or video to monitor.
+LIVENESS_SCRIPT = '''
+const [
+    inMeetingSelector, participantsSelector, removedTexts, endedTexts
+] = arguments;
+
+if (!window.__recorderActivity) {
+    const activity = {
+        lastActiveAt: null, analysers: new Map(), frames: new Map()
+    };
+    window.__recorderActivity = activity;
+    const canvas = document.createElement('canvas');
+    canvas.width = canvas.height = 16;
+    const context = canvas.getContext('2d', {willReadFrequently: true});
+
+    setInterval(() => {
+        for (const media of document.querySelectorAll('audio, video')) {
+            const stream = media.srcObject;
+            if (media.paused || !(stream instanceof MediaStream)) continue;
+            // Idle from the moment there is something to watch
+            activity.lastActiveAt ??= Date.now();
+
+            if (stream.getAudioTracks().length) {
+                if (!activity.analysers.has(media)) {
+                    const audio = activity.audio ??= new AudioContext();
+                    const analyser = audio.createAnalyser();
+                    audio.createMediaStreamSource(stream).connect(analyser);
+                    activity.analysers.set(media, analyser);
+                }
+                const analyser = activity.analysers.get(media);
+                const samples = new Uint8Array(analyser.fftSize);
+                analyser.getByteTimeDomainData(samples);
+                if (samples.some(sample => Math.abs(sample - 128) > 4)) {
+                    activity.lastActiveAt = Date.now();
+                }
+            }
+
+            if (media instanceof HTMLVideoElement && media.videoWidth) {
+                context.drawImage(media, 0, 0, 16, 16);
+                const frame = context.getImageData(0, 0, 16, 16).data.join();
+                if (activity.frames.get(media) !== frame) {
+                    activity.frames.set(media, frame);
+                    activity.lastActiveAt = Date.now();
+                }
+            }
+        }
+    }, 1000);
+}
+
+const text = document.body ? document.body.innerText : '';
+const counter = document.querySelector(participantsSelector);
+const participants = counter
+    ? parseInt(counter.textContent.replace(/\\D/g, ''), 10)
+    : NaN;
+
+let state = 'unknown';
+if (removedTexts.some(t => text.includes(t))) state = 'removed';
+else if (endedTexts.some(t => text.includes(t))) state = 'ended';
+else if (document.querySelector(inMeetingSelector)) state = 'in_meeting';
+
+const {lastActiveAt} = window.__recorderActivity;
+return {
+    state,
+    participants: Number.isNaN(participants) ? null : participants,
+    idle_seconds:
+        lastActiveAt === null ? null : (Date.now() - lastActiveAt) / 1000
+};
+'''
+
+
+class MeetingState(StrEnum):
+    IN_MEETING = 'in_meeting'
+    UNKNOWN = 'unknown'
+    REMOVED = 'removed'
+    ENDED = 'ended'
+    SESSION_LOST = 'session_lost'
+    ALONE = 'alone'
+    INACTIVE = 'inactive'
+    MAX_DURATION = 'max_duration'
+
+    @property
+    def is_over(self: Self) -> bool:
+        return self not in (MeetingState.IN_MEETING, MeetingState.UNKNOWN)
+
+
+@dataclass(frozen=True)
+class Liveness:
+    state: MeetingState
+    participants: int | None = None
+    idle_seconds: float | None = None
+
+
+@dataclass(frozen=True)
+class HumanizationProfile:
+    """Artificial delays making bot input look like a human one."""
+    action_delay_seconds: float = 0
+    typing_delay_seconds: float = 0
+
+
+HUMANIZATION_PROFILES = {
+    'off': HumanizationProfile(),
+    'light': HumanizationProfile(0.3, 0.05),
+    'human': HumanizationProfile(1, 0.2)
+}
+
+MEET_HUMANIZATION = HUMANIZATION_PROFILES[
+    os.getenv('MEET_HUMANIZATION', 'off')
+]
+
+ZOOM_URL_TEMPLATE = os.getenv(
+    'ZOOM_URL_TEMPLATE', 'https://us04web.zoom.us/wc/{}/join?pwd={}'
+)
 URL_PATTERN = r'/j/(\d+)\?pwd=([^&]+)'
 
 Bot = TypeVar('Bot', bound='ConferenceBot')
@@ -46,11 +184,22 @@ def from_conference(conference: Conference) -> Bot:
 
 
 def _configure_options(
-    video_name: str, browser_version: str
+    video_name: str, browser_version: str | None, capture: Capture
 ) -> webdriver.ChromeOptions:
     options = webdriver.ChromeOptions()
 
     options.add_argument('--start-maximized')
+    # Video encoding limits bots per host, the browser is kept from
+    # competing with it for CPU
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-background-networking')
+    options.add_argument('--disable-component-update')
+    options.add_argument('--disable-default-apps')
+    options.add_argument('--disable-sync')
+    options.add_argument('--no-first-run')
+    if capture.audio_only:
+        # The recorder's AudioContext starts without a user gesture
+        options.add_argument('--autoplay-policy=no-user-gesture-required')
     options.add_argument('--use-fake-ui-for-media-stream')
     options.add_argument('--use-fake-device-for-media-stream')
     options.add_argument('--disable-extensions')
@@ -69,13 +218,18 @@ def _configure_options(
 
     options.set_capability('browserName', os.getenv('BROWSER_NAME'))
     options.set_capability('browserVersion', browser_version)
-    options.set_capability('selenoid:options', {
-        'enableVideo': eval(os.getenv('ENABLE_VIDEO')),
+    selenoid_options = {
+        'enableVideo': eval(os.getenv('ENABLE_VIDEO')) and (
+            not capture.audio_only
+        ),
         'enableVNC': eval(os.getenv('ENABLE_VNC')),
         'sessionTimeout': os.getenv('SESSION_TIMEOUT'),
-        'videoFrameRate': int(os.getenv('VIDEO_FRAME_RATE')),
+        'screenResolution': capture.screen_resolution,
         'videoName': video_name
-    })
+    }
+    if capture.frame_rate is not None:
+        selenoid_options['videoFrameRate'] = capture.frame_rate
+    options.set_capability('selenoid:options', selenoid_options)
     return options
 
 
@@ -84,26 +238,167 @@ def _prepare_participant_name(conference: Conference) -> str:
 
 
 class ConferenceBot(ABC):
+
+    _SELECTORS: dict[str, tuple[str, str]]
+    _REMOVED_TEXTS: tuple[str, ...]
+    _ENDED_TEXTS: tuple[str, ...]
+
     @abstractmethod
     def __init__(
-        self: Self, conference: Conference, browser_version: str
+        self: Self, conference: Conference, browser_version: str | None
     ) -> None:
         self._conference = conference
         self._participant_name = _prepare_participant_name(conference)
         self._browser_version = browser_version
+        self._capture = CAPTURES[conference.settings.capture_profile]
+        self._driver: AsyncWebDriver | None = None
+        self._staged = False
+        self._probe_failures = 0
+
+    @property
+    def capture(self: Self) -> Capture:
+        return self._capture
+
+    @property
+    def driver(self: Self) -> AsyncWebDriver:
+        """Session of the browser, opened when the bot stages."""
+        if self._driver is None:
+            raise WebDriverException('The bot has no browser session open.')
+        return self._driver
 
     @abstractmethod
-    def join_conference(self: Self) -> None:
-        ...
+    async def stage(self: Self) -> None:
+        """Open the join page and fill it in, all but the final join."""
 
     @abstractmethod
-    def send_message(self: Self) -> None:
+    async def join_conference(self: Self) -> None:
+        """Join the meeting, staging first unless the bot already is."""
+
+    async def room_opened(self: Self) -> bool:
+        """Whether the host has opened the meeting a staged bot waits for.
+
+        Only platforms telling it on the join page know, others wait for
+        the start time.
+        """
+        return False
+
+    @abstractmethod
+    async def send_message(self: Self) -> None:
         ...
 
     @abstractmethod
-    def leave_conference(self: Self) -> None:
+    async def leave_conference(self: Self) -> None:
         ...
 
+    async def check_liveness(self: Self) -> Liveness:
+        """Probe the browser for the meeting state.
+
+        The probe is a WebDriver command, so it also keeps the session from
+        hitting the Selenoid idle timeout.
+        """
+        if self._driver is None:
+            return Liveness(MeetingState.SESSION_LOST)
+
+        try:
+            probe = await self._driver.execute_script(
+                LIVENESS_SCRIPT,
+                self._SELECTORS['leave_btn'][1],
+                self._SELECTORS['participants_count'][1],
+                self._REMOVED_TEXTS,
+                self._ENDED_TEXTS
+            )
+        except InvalidSessionIdException as e:
+            log.warning('Session of the bot is gone: %s', e)
+            return Liveness(MeetingState.SESSION_LOST)
+        except (WebDriverException, httpx.HTTPError) as e:
+            self._probe_failures += 1
+            log.warning(
+                'Liveness probe failed %s times in a row: %s',
+                self._probe_failures, e
+            )
+            if self._probe_failures >= LIVENESS_MAX_FAILURES:
+                return Liveness(MeetingState.SESSION_LOST)
+            return Liveness(MeetingState.UNKNOWN)
+
+        self._probe_failures = 0
+        if not isinstance(probe, dict) or probe.get('state') not in list(
+            MeetingState
+        ):
+            return Liveness(MeetingState.UNKNOWN)
+        return Liveness(
+            MeetingState(probe['state']),
+            probe.get('participants'),
+            probe.get('idle_seconds')
+        )
+
+    async def start_audio_capture(self: Self) -> None:
+        """Start recording audio of the page if only audio is captured.
+
+        Called again once joined, in case joining loaded another page.
+        """
+        if not self._capture.audio_only or self._driver is None:
+            return
+
+        await self._driver.execute_script(
+            AUDIO_RECORDER_SCRIPT,
+            int(AUDIO_CHUNK_SECONDS * 1000),
+            AUDIO_BITS_PER_SECOND
+        )
+
+    async def collect_audio(self: Self, flush: bool = False) -> bytes:
+        """Return WebM audio recorded since the previous call.
+
+        Flushing also returns audio of the chunk being recorded, once the
+        bot has left.
+        """
+        if not self._capture.audio_only or self._driver is None:
+            return b''
+
+        chunks = await self._driver.execute_async_script(
+            AUDIO_COLLECT_SCRIPT, flush
+        )
+        return b''.join(b64decode(chunk) for chunk in chunks)
+
+    async def quit(self: Self) -> None:
+        if self._driver is None:
+            return
+
+        driver, self._driver = self._driver, None
+        try:
+            await driver.quit()
+        except WebDriverException:
+            pass
+
+    async def _open(self: Self, url: str) -> None:
+        with self._step(BotStep.SESSION_CREATE):
+            self._driver = await AsyncWebDriver.create(
+                REMOTE_ADDRESS,
+                _configure_options(
+                    self._conference.recording.filename,
+                    self._browser_version,
+                    self._capture
+                )
+            )
+
+        self._wait = AsyncWebDriverWait(self._driver, WAIT_DURATION_SECONDS)
+        self._long_wait = AsyncWebDriverWait(
+            self._driver, WAIT_LONG_DURATION_SECONDS
+        )
+
+        with self._step(BotStep.PAGE_LOAD):
+            await self._driver.get(url)
+        await self.start_audio_capture()
+
+    @contextmanager
+    def _step(self: Self, step: BotStep) -> Iterator[None]:
+        with (
+            timed_step(
+                self._conference.platform, self._browser_version, step
+            ),
+            tracer.start_as_current_span(f'bot.{step}')
+        ):
+            yield
+
 
 class ZoomBot(ConferenceBot):
 
@@ -115,106 +410,112 @@ class ZoomBot(ConferenceBot):
         'confirm_leave_btn': 
             (By.CSS_SELECTOR, '.leave-meeting-options__inner > button'),
         'chat_btn': (By.CSS_SELECTOR, '.footer-chat-button > button'),
-        'textarea': (By.CSS_SELECTOR, '#wc-container-right textarea')
+        'textarea': (By.CSS_SELECTOR, '#wc-container-right textarea'),
+        'participants_count': (
+            By.CSS_SELECTOR,
+            '.footer-button__participants-icon .footer-button__number-counter'
+        )
     }
 
+    _REMOVED_TEXTS = ('You have been removed',)
+    _ENDED_TEXTS = (
+        'This meeting has been ended by host',
+        'The meeting has been ended'
+    )
+
     def __init__(
-        self: Self, conference: Conference, browser_version: str
+        self: Self, conference: Conference, browser_version: str | None
     ) -> None:
         super().__init__(conference, browser_version)
 
-        self._driver = webdriver.Remote(
-            REMOTE_ADDRESS,
-            options=_configure_options(
-                self._conference.recording.filename, self._browser_version
-            )
+    async def stage(self: Self) -> None:
+        await self._open(
+            self._transform_invite_link(self._conference.invite_link)
         )
 
-        self._wait = WebDriverWait(self._driver, WAIT_DURATION_SECONDS)
-        self._long_wait = WebDriverWait(
-            self._driver, WAIT_LONG_DURATION_SECONDS
-        )
+        # The web client joins with camera off and without audio, which is
+        # connected once admitted
+        await self._input_info()
+        self._staged = True
 
-        self._driver.get(
-            self._transform_invite_link(self._conference.invite_link)
-        )
+    async def join_conference(self: Self) -> None:
+        if not self._staged:
+            await self.stage()
+
+        await self._join()
 
-    def join_conference(self: Self) -> None:
-        # Input participant name and join
-        self._input_info_and_join()
-        
         # Waiting in the guest room for joining audio
-        self._connect_audio()
+        await self._connect_audio()
 
-    def send_message(self: Self) -> None:
-        chat_btn = self._driver.find_element(*self._SELECTORS['chat_btn'])
-        chat_btn.click()
+    async def send_message(self: Self) -> None:
+        with self._step(BotStep.CHAT_MESSAGE):
+            chat_btn = await self.driver.find_element(
+                *self._SELECTORS['chat_btn']
+            )
+            await chat_btn.click()
 
-        try:
-            textarea = self._wait.until(
+            textarea = await self._wait.until(
                 EC.presence_of_element_located(self._SELECTORS['textarea'])
             )
-        except TimeoutException as e:
-            log.exception(e)
-        else:
-            textarea.send_keys(self._conference.settings.disclaimer_message)
-            textarea.send_keys(Keys.RETURN)
-            chat_btn.click()
-
-    def leave_conference(self: Self) -> None:
-        # Click Leave
-        leave_btn = self._driver.find_element(*self._SELECTORS['leave_btn'])
-        leave_btn.click()
+            await textarea.send_keys(
+                self._conference.settings.disclaimer_message
+            )
+            await textarea.send_keys(Keys.RETURN)
+            await chat_btn.click()
+
+    async def leave_conference(self: Self) -> None:
+        with self._step(BotStep.LEAVE):
+            # Click Leave
+            leave_btn = await self.driver.find_element(
+                *self._SELECTORS['leave_btn']
+            )
+            await leave_btn.click()
 
-        # Confirm leave
-        self._confirm_leave()
+            # Confirm leave
+            await self._confirm_leave()
 
-        self._driver.quit()
+        await self.quit()
 
     @staticmethod
     def _transform_invite_link(invite_link: str) -> str:
         match_ = re.search(URL_PATTERN, invite_link)
         return ZOOM_URL_TEMPLATE.format(match_.group(1), match_.group(2))
 
-    def _input_info_and_join(self: Self) -> None:
-        try:
-            input_ = self._wait.until(
+    async def _input_info(self: Self) -> None:
+        with self._step(BotStep.NAME_INPUT):
+            input_ = await self._wait.until(
                 EC.presence_of_element_located(self._SELECTORS['name_input'])
             )
-        except TimeoutException as e:
-            log.exception(e)
-        else:
-            input_.send_keys(self._participant_name)
-            input_.send_keys(Keys.RETURN)
+            await input_.send_keys(self._participant_name)
 
-    def _connect_audio(self: Self) -> None:
-        try:
-            join_audio_btn = self._long_wait.until(
+    async def _join(self: Self) -> None:
+        with self._step(BotStep.JOIN):
+            input_ = await self.driver.find_element(
+                *self._SELECTORS['name_input']
+            )
+            await input_.send_keys(Keys.RETURN)
+
+    async def _connect_audio(self: Self) -> None:
+        # Timeout means host doesn't admit bot or already removed bot
+        join_audio_btn = None
+        with self._step(BotStep.ADMIT_WAIT):
+            join_audio_btn = await self._long_wait.until(
                 EC.element_to_be_clickable(self._SELECTORS['join_audio_btn'])
             )
-        except TimeoutException as e:
-            # Host doesn't admit bot or already removed bot
-            log.exception(e)
-        else:
-            self._driver.execute_script('arguments[0].click()', join_audio_btn)
 
-    def _confirm_leave(self: Self) -> None:
-        try:
-            confirm_leave_btn = self._wait.until(
-                EC.element_to_be_clickable(
-                    self._SELECTORS['confirm_leave_btn']
-                )
+        if join_audio_btn is None:
+            return
+
+        with self._step(BotStep.AUDIO_JOIN):
+            await self.driver.execute_script(
+                'arguments[0].click()', join_audio_btn
             )
-        except TimeoutException as e:
-            log.exception(e)
-        else:
-            confirm_leave_btn.click()
-    
-    def __del__(self) -> None:
-        try:
-            self._driver.quit()
-        except InvalidSessionIdException:
-            pass
+
+    async def _confirm_leave(self: Self) -> None:
+        confirm_leave_btn = await self._wait.until(
+            EC.element_to_be_clickable(self._SELECTORS['confirm_leave_btn'])
+        )
+        await confirm_leave_btn.click()
 
 
 class GoogleMeetBot(ConferenceBot):
@@ -228,129 +529,160 @@ class GoogleMeetBot(ConferenceBot):
         'popup_ok_btn': (By.CSS_SELECTOR, 'button[jsname="EszDEe"]'),
         'leave_btn': (By.CSS_SELECTOR, 'button[jsname="CQylAd"]'),
         'chat_btn': (By.CSS_SELECTOR, 'div[jscontroller="eC6ahc"] button'),
-        'textarea': (By.ID, 'bfTqV')
+        'textarea': (By.ID, 'bfTqV'),
+        'participants_count': (By.CSS_SELECTOR, 'div.uGOf1d')
     }
 
-    _DELAY_SECONDS = 1
-    _TYPING_DELAY_SECONDS = 0.2
+    _REMOVED_TEXTS = ("You've been removed from the meeting",)
+    _ENDED_TEXTS = ('The call has ended', 'The meeting has ended')
+    # Shown on the join page once someone is in the meeting
+    _ROOM_OPENED_TEXTS = ('is in this call', 'are in this call')
+
+    _HUMANIZATION = MEET_HUMANIZATION
 
     def __init__(
-        self: Self, conference: Conference, browser_version: str
+        self: Self, conference: Conference, browser_version: str | None
     ) -> None:
         super().__init__(conference, browser_version)
 
-        self._driver = webdriver.Remote(
-            REMOTE_ADDRESS,
-            options=_configure_options(
-                self._conference.recording.filename, self._browser_version
-            )
-        )
+    async def stage(self: Self) -> None:
+        await self._open(self._conference.invite_link)
 
-        self._wait = WebDriverWait(self._driver, WAIT_DURATION_SECONDS)
-        self._long_wait = WebDriverWait(
-            self._driver, WAIT_LONG_DURATION_SECONDS
-        )
+        await self._turn_off_microphone_and_camera()
+        await self._continue_without_login()
+        await self._prepare_to_join()
+        self._staged = True
 
-        self._driver.get(self._conference.invite_link)
+    async def join_conference(self: Self) -> None:
+        if not self._staged:
+            await self.stage()
 
-    def join_conference(self: Self) -> None:
-        # Joining meeting
-        self._turn_off_microphone_and_camera()
-        self._continue_without_login()
-        self._prepare_to_join()
-        
-        # Closing security pop up
-        self._close_popup()
+        await self._ask_to_join()
 
-    def send_message(self: Self) -> None:
-        chat_btn = self._driver.find_element(*self._SELECTORS['chat_btn'])
-        chat_btn.click()
+        # Closing security pop up
+        await self._close_popup()
 
+    async def room_opened(self: Self) -> bool:
+        if self._driver is None:
+            return False
         try:
-            textarea = self._wait.until(
-                EC.visibility_of_element_located(self._SELECTORS['textarea'])
+            text = await self.driver.execute_script(
+                'return document.body ? document.body.innerText : ""'
             )
-        except TimeoutException as e:
+        except WebDriverException as e:
             log.exception(e)
-        else:
-            textarea.send_keys(self._conference.settings.disclaimer_message)
-            textarea.send_keys(Keys.RETURN)
-            chat_btn.click()
+            return False
+        return any(t in text for t in self._ROOM_OPENED_TEXTS)
 
+    async def send_message(self: Self) -> None:
+        with self._step(BotStep.CHAT_MESSAGE):
+            chat_btn = await self.driver.find_element(
+                *self._SELECTORS['chat_btn']
+            )
+            await chat_btn.click()
 
-    def leave_conference(self: Self) -> None:
-        leave_btn = self._driver.find_element(*self._SELECTORS['leave_btn'])
-        leave_btn.click()
+            textarea = await self._wait.until(
+                EC.visibility_of_element_located(self._SELECTORS['textarea'])
+            )
+            await textarea.send_keys(
+                self._conference.settings.disclaimer_message
+            )
+            await textarea.send_keys(Keys.RETURN)
+            await chat_btn.click()
 
-        self._driver.quit()
+    async def leave_conference(self: Self) -> None:
+        with self._step(BotStep.LEAVE):
+            leave_btn = await self.driver.find_element(
+                *self._SELECTORS['leave_btn']
+            )
+            await leave_btn.click()
 
-    def _turn_off_microphone_and_camera(self: Self) -> None:
-        try:
-            off_micro_btn = self._wait.until(
-                EC.presence_of_element_located(self._SELECTORS['off_micro_btn'])
+        await self.quit()
+
+    async def _turn_off_microphone_and_camera(self: Self) -> None:
+        with self._step(BotStep.PREPARE_INPUTS):
+            off_micro_btn = await self._wait.until(
+                EC.element_to_be_clickable(self._SELECTORS['off_micro_btn'])
             )
-        except TimeoutException as e:
-            log.exception(e)
-        else:
-            off_micro_btn.click()
+            await off_micro_btn.click()
         
-    def _continue_without_login(self: Self) -> None:
-        try:
-            btn = self._wait.until(
-                EC.presence_of_element_located(self._SELECTORS['without_account_btn'])
+    async def _continue_without_login(self: Self) -> None:
+        with self._step(BotStep.PREPARE_INPUTS):
+            btn = await self._wait.until(
+                EC.element_to_be_clickable(self._SELECTORS['without_account_btn'])
             )
-        except TimeoutException as e:
-            log.exception(e)
-        else:
-            btn.click()
+            await btn.click()
 
-    def _prepare_to_join(self: Self) -> None:
-        try:
-            input_ = self._wait.until(
-                EC.presence_of_element_located(self._SELECTORS['name_input'])
+    async def _prepare_to_join(self: Self) -> None:
+        with self._step(BotStep.NAME_INPUT):
+            input_ = await self._wait.until(
+                EC.element_to_be_clickable(self._SELECTORS['name_input'])
             )
-            micro_btn, camera_btn = self._driver.find_elements(
+            micro_btn, camera_btn = await self.driver.find_elements(
                 *self._SELECTORS['micro_and_camera_btns']
             )
-        except TimeoutException as e:
-            log.exception(e)
-        else:
-            self._input_name_and_prepare_inputs(input_, micro_btn, camera_btn)
+            await self._input_name_and_prepare_inputs(
+                input_, micro_btn, camera_btn
+            )
 
-    def _input_name_and_prepare_inputs(
+    async def _input_name_and_prepare_inputs(
         self: Self,
-        input_: WebElement,
-        micro_btn: WebElement,
-        camera_btn: WebElement
+        input_: AsyncWebElement,
+        micro_btn: AsyncWebElement,
+        camera_btn: AsyncWebElement
     ) -> None:
-        sleep(self._DELAY_SECONDS)
-        micro_btn.click()
+        for btn in (micro_btn, camera_btn):
+            await self._pause()
+            await self._mute(btn)
+
+        await self._pause()
+        await self._type(input_, self._participant_name)
+        await self._wait.until(
+            EC.text_to_be_present_in_element_value(
+                self._SELECTORS['name_input'], self._participant_name
+            )
+        )
 
-        sleep(self._DELAY_SECONDS)
-        camera_btn.click()
+    async def _ask_to_join(self: Self) -> None:
+        with self._step(BotStep.JOIN):
+            await self._pause()
+            input_ = await self.driver.find_element(
+                *self._SELECTORS['name_input']
+            )
+            await input_.send_keys(Keys.RETURN)
 
-        sleep(self._DELAY_SECONDS)
-        for letter in self._participant_name:
-            input_.send_keys(letter)
-            sleep(self._TYPING_DELAY_SECONDS)
+    async def _mute(self: Self, btn: AsyncWebElement) -> None:
+        muted = await btn.get_attribute(MUTED_ATTRIBUTE)
+        if muted == 'true':
+            return
 
-        sleep(self._DELAY_SECONDS)
-        input_.send_keys(Keys.RETURN)
+        await btn.click()
 
-    def _close_popup(self: Self) -> None:
-        try:
-            ok_btn = self._long_wait.until(
+        # Wait for the toggle to settle when it exposes its state
+        if muted is not None:
+            await self._wait.until(
+                EC.element_attribute_to_be(btn, MUTED_ATTRIBUTE, 'true')
+            )
+
+    async def _type(self: Self, input_: AsyncWebElement, text: str) -> None:
+        if not self._HUMANIZATION.typing_delay_seconds:
+            await input_.send_keys(text)
+            return
+
+        for letter in text:
+            await input_.send_keys(letter)
+            await asyncio.sleep(self._HUMANIZATION.typing_delay_seconds)
+
+    async def _pause(self: Self) -> None:
+        if self._HUMANIZATION.action_delay_seconds:
+            await asyncio.sleep(self._HUMANIZATION.action_delay_seconds)
+
+    async def _close_popup(self: Self) -> None:
+        # Security pop up shows up once host admitted the bot
+        with self._step(BotStep.ADMIT_WAIT):
+            ok_btn = await self._long_wait.until(
                 EC.presence_of_element_located(
                     self._SELECTORS['popup_ok_btn']
                 )
             )
-        except TimeoutException as e:
-            log.exception(e)
-        else:
-            ok_btn.click()
-
-    def __del__(self) -> None:
-        try:
-            self._driver.quit()
-        except InvalidSessionIdException:
-            pass
+            await ok_btn.click()
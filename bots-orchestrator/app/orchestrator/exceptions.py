@@ -8,3 +8,7 @@ class ConferenceAlreadyBeingRecordedError(Exception):
 
 class ConferenceIsNotBeingRecordedError(Exception):
     """Trying to stop recording of conference which is not being recorded."""
+
+
+class StagingCancelledError(Exception):
+    """Conference was stopped or deleted before its staged bot joined it."""
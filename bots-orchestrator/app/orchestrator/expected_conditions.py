@@ -0,0 +1,51 @@
+"""Async counterparts of `selenium.webdriver.support.expected_conditions`."""
+from app.orchestrator.webdriver import (
+    AsyncWebDriver, AsyncWebElement, Condition
+)
+
+Locator = tuple[str, str]
+
+
+def presence_of_element_located(
+    locator: Locator
+) -> Condition[AsyncWebElement]:
+    async def _predicate(driver: AsyncWebDriver) -> AsyncWebElement:
+        return await driver.find_element(*locator)
+    return _predicate
+
+
+def visibility_of_element_located(
+    locator: Locator
+) -> Condition[AsyncWebElement | None]:
+    async def _predicate(driver: AsyncWebDriver) -> AsyncWebElement | None:
+        element = await driver.find_element(*locator)
+        return element if await element.is_displayed() else None
+    return _predicate
+
+
+def element_to_be_clickable(
+    locator: Locator
+) -> Condition[AsyncWebElement | None]:
+    async def _predicate(driver: AsyncWebDriver) -> AsyncWebElement | None:
+        element = await driver.find_element(*locator)
+        if await element.is_displayed() and await element.is_enabled():
+            return element
+        return None
+    return _predicate
+
+
+def text_to_be_present_in_element_value(
+    locator: Locator, text: str
+) -> Condition[bool]:
+    async def _predicate(driver: AsyncWebDriver) -> bool:
+        element = await driver.find_element(*locator)
+        return text in (await element.get_property('value') or '')
+    return _predicate
+
+
+def element_attribute_to_be(
+    element: AsyncWebElement, attribute: str, value: str
+) -> Condition[bool]:
+    async def _predicate(driver: AsyncWebDriver) -> bool:
+        return await element.get_attribute(attribute) == value
+    return _predicate
@@ -0,0 +1,114 @@
+import logging
+from contextlib import contextmanager
+from enum import StrEnum
+from time import perf_counter
+from typing import Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from selenium.common.exceptions import TimeoutException
+
+log = logging.getLogger(__name__)
+
+
+class BotStep(StrEnum):
+    SESSION_CREATE = 'session_create'
+    PAGE_LOAD = 'page_load'
+    PREPARE_INPUTS = 'prepare_inputs'
+    NAME_INPUT = 'name_input'
+    JOIN = 'join'
+    ADMIT_WAIT = 'admit_wait'
+    AUDIO_JOIN = 'audio_join'
+    CHAT_MESSAGE = 'chat_message'
+    LEAVE = 'leave'
+
+
+class StepOutcome(StrEnum):
+    SUCCESS = 'success'
+    TIMEOUT = 'timeout'
+    ERROR = 'error'
+
+
+BOT_STEP_DURATION = Histogram(
+    'bot_step_duration_seconds',
+    'Duration of conference bot steps.',
+    ['platform', 'browser_version', 'step', 'outcome'],
+    buckets=(
+        0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200
+    )
+)
+
+ACTIVE_BOTS = Gauge(
+    'active_bots', 'Number of bots currently recording conferences.'
+)
+
+WAITING_CONFERENCES = Gauge(
+    'waiting_conferences', 'Number of conferences waiting for a free bot.'
+)
+
+QUEUE_REJECTIONS = Counter(
+    'queue_rejections_total',
+    'Conferences rejected after waiting too long for a free bot.'
+)
+
+STAGING_SLACK = Histogram(
+    'bot_staging_slack_seconds',
+    'Time staged bots were ready to join before the start time, negative '
+    'when staged late. Tells whether the lead time of a platform fits.',
+    ['platform'],
+    buckets=(-60, -30, -10, -5, 0, 5, 10, 30, 60, 120, 300)
+)
+
+STAGING_CANCELLATIONS = Counter(
+    'staging_cancellations_total',
+    'Staged bots dismissed before joining, as their conference was stopped '
+    'or deleted.',
+    ['platform']
+)
+
+BOT_EARLY_EXITS = Counter(
+    'bot_early_exits_total',
+    'Recordings finished before being stopped, by detected meeting state.',
+    ['platform', 'state']
+)
+
+OUTBOX_PENDING = Gauge(
+    'outbox_pending_transitions',
+    'Recording status transitions not yet written to the database.'
+)
+
+OUTBOX_FLUSH_FAILURES = Counter(
+    'outbox_flush_failures_total',
+    'Failed writes of batches of status transitions, retried later.'
+)
+
+OUTBOX_FLUSH_SIZE = Histogram(
+    'outbox_flush_size',
+    'Status transitions written to the database at once.',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+
+
+@contextmanager
+def timed_step(
+    platform: str, browser_version: str | None, step: BotStep
+) -> Iterator[None]:
+    """Time a bot step and record its outcome.
+
+    Timeouts are logged and suppressed like the bots always did, so the
+    flow goes on with the next step.
+    """
+    outcome = StepOutcome.SUCCESS
+    start = perf_counter()
+    try:
+        yield
+    except TimeoutException as e:
+        outcome = StepOutcome.TIMEOUT
+        log.exception(e)
+    except Exception:
+        outcome = StepOutcome.ERROR
+        raise
+    finally:
+        # Bots without a version get the default browser of Selenoid
+        BOT_STEP_DURATION.labels(
+            platform, browser_version or 'default', step, outcome
+        ).observe(perf_counter() - start)
@@ -1,74 +1,597 @@
-from threading import Thread
-from time import sleep
-from typing import Self
+import asyncio
+import logging
+import os
+import random
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from enum import StrEnum
+from pathlib import Path
+from threading import RLock
+from time import monotonic
+from typing import Callable, Iterable, Self
 
-from app.orchestrator.conference_bot import from_conference
+import httpx
+from opentelemetry import context as otel_context
+from selenium.common.exceptions import WebDriverException
+
+from app.orchestrator.conference_bot import (
+    ConferenceBot, MeetingState, from_conference
+)
 from app.orchestrator.exceptions import (
     ConferenceAlreadyBeingRecordedError,
-    ConferenceIsNotBeingRecordedError
+    ConferenceIsNotBeingRecordedError,
+    StagingCancelledError
+)
+from app.orchestrator.metrics import (
+    ACTIVE_BOTS,
+    BOT_EARLY_EXITS,
+    QUEUE_REJECTIONS,
+    STAGING_CANCELLATIONS,
+    STAGING_SLACK,
+    WAITING_CONFERENCES
+)
+from app.orchestrator.outbox import StatusOutbox
+from app.orchestrator.runtime import BotRuntime
+from app.orchestrator.webdriver import get_client
+from app.persistence.postgres import (
+    is_recording_scheduled,
+    update_conference_end_time,
+    update_recording_size
+)
+from app.schema import Conference, RecordingStatus, StatusTransition
+from app.tracing import TRACEPARENT_HEADER, extract_context, tracer
+
+LIVENESS_INTERVAL_SECONDS = float(os.getenv('LIVENESS_INTERVAL_SECONDS', 30))
+LIVENESS_MAX_CONCURRENT_PROBES = int(
+    os.getenv('LIVENESS_MAX_CONCURRENT_PROBES', 20)
+)
+
+# Conferences scheduled without an end time stop on their own
+AUTO_STOP_ALONE_GRACE_SECONDS = float(
+    os.getenv('AUTO_STOP_ALONE_GRACE_SECONDS', 120)
+)
+AUTO_STOP_INACTIVITY_SECONDS = float(
+    os.getenv('AUTO_STOP_INACTIVITY_SECONDS', 600)
+)
+MAX_RECORDING_SECONDS = float(os.getenv('MAX_RECORDING_SECONDS', 4 * 60 * 60))
+
+# Bots recording at once, selenoid's session limit. Conferences starting
+# when all are busy wait, and free bots go to the users running the fewest.
+MAX_BOTS = int(os.getenv('MAX_BOTS', 5))
+# Waiting conferences are rejected after this long, or once they end
+MAX_WAIT_SECONDS = float(os.getenv('MAX_WAIT_SECONDS', 10 * 60))
+
+# Staged bots, started ahead of their conference by the scheduler, check
+# this often whether the host opened the meeting or it was cancelled
+STAGING_POLL_SECONDS = float(os.getenv('STAGING_POLL_SECONDS', 10))
+
+# Videos are saved by selenoid once the session is closed
+VIDEO_URL = os.getenv('VIDEO_URL', 'http://selenoid:4444/video')
+VIDEO_SIZE_ATTEMPTS = int(os.getenv('VIDEO_SIZE_ATTEMPTS', 10))
+VIDEO_SIZE_RETRY_SECONDS = float(os.getenv('VIDEO_SIZE_RETRY_SECONDS', 6))
+# Audio recorded by bots of audio only conferences is written next to the
+# videos, where selenoid serves them from
+RECORDING_OUTPUT_DIR = Path(
+    os.getenv('RECORDING_OUTPUT_DIR', '/opt/selenoid/video')
 )
-from app.persistence.postgres import update_recording_status
-from app.schema import Conference, RecordingStatus
+
+log = logging.getLogger(__name__)
+
+# Bounds bursts of probes across all bots of the runtime
+_probes = asyncio.Semaphore(LIVENESS_MAX_CONCURRENT_PROBES)
+
+
+class StartOutcome(StrEnum):
+    STARTED = 'started'
+    WAITING = 'waiting'
 
 
-class Worker(Thread):
+@dataclass
+class _Waiting:
+    conference: Conference
+    since: float = field(default_factory=monotonic)
 
-    _SLEEP_DURATION_SECONDS = 30
 
-    def __init__(self: Self, conference: Conference) -> None:
-        super().__init__(daemon=True)
-        self._to_run = True
+class Worker:
+    def __init__(
+        self: Self,
+        conference: Conference,
+        runtime: BotRuntime,
+        outbox: StatusOutbox
+    ) -> None:
         self._conference = conference
+        self._runtime = runtime
+        self._outbox = outbox
+        self._stopped = asyncio.Event()
+        self._future: Future[None] | None = None
+        self._audio_saved = False
+        # The runtime loop does not share the context of the request.
+        # Conferences started in batches carry their own.
+        self._trace_context = (
+            extract_context({TRACEPARENT_HEADER: conference.trace_context})
+            if conference.trace_context else otel_context.get_current()
+        )
+
+    @property
+    def conference(self: Self) -> Conference:
+        return self._conference
+
+    @property
+    def finished(self: Self) -> bool:
+        return self._future is not None and self._future.done()
+
+    def start(self: Self, on_finished: Callable[[], None]) -> None:
+        self._future = self._runtime.submit(self.run())
+        self._future.add_done_callback(lambda _: on_finished())
 
     def stop(self: Self) -> None:
-        self._to_run = False
+        self._runtime.call_soon(self._stopped.set)
 
-    def run(self: Self) -> None:
-        bot = from_conference(self._conference)
+    async def run(self: Self) -> None:
+        with (
+            ACTIVE_BOTS.track_inprogress(),
+            tracer.start_as_current_span(
+                'record',
+                context=self._trace_context,
+                attributes={
+                    'conference.id': self._conference.id,
+                    'conference.platform': self._conference.platform
+                }
+            )
+        ):
+            bot = from_conference(self._conference)
+            try:
+                await self._record(bot)
+            except StagingCancelledError as e:
+                log.info(
+                    'Dismissed staged bot of conference with id %s: %s',
+                    self._conference.id, e
+                )
+                STAGING_CANCELLATIONS.labels(self._conference.platform).inc()
+                return
+            finally:
+                await bot.quit()
+            # Not awaited, so the worker finishes and its file can be recorded
+            # again meanwhile
+            self._runtime.submit(self._save_video_size())
 
-        bot.join_conference()
-        bot.send_message()
+    async def _record(self: Self, bot: ConferenceBot) -> None:
+        await bot.stage()
+        await self._wait_for_start(bot)
+        await bot.join_conference()
+        await bot.start_audio_capture()
+        await bot.send_message()
 
-        update_recording_status(
-            self._conference.id, RecordingStatus.IN_PROGRESS
+        await self._outbox.add(StatusTransition(
+            self._conference.recording.filename,
+            RecordingStatus.IN_PROGRESS,
+            datetime.now(timezone.utc)
+        ))
+
+        state, ended_at = await self._monitor(bot)
+        # Leaving may load another page, which drops the recorder
+        await self._save_audio(bot, flush=True)
+
+        if state.is_over:
+            log.info(
+                'Conference with id %s is over earlier than stopped: %s',
+                self._conference.id, state
+            )
+            BOT_EARLY_EXITS.labels(self._conference.platform, state).inc()
+        else:
+            await bot.leave_conference()
+
+        if state.is_over and state != MeetingState.SESSION_LOST:
+            await asyncio.to_thread(
+                update_conference_end_time,
+                self._conference.recording.filename,
+                ended_at
+            )
+
+        await self._outbox.add(StatusTransition(
+            self._conference.recording.filename,
+            RecordingStatus.FINISHED,
+            datetime.now(timezone.utc)
+        ))
+
+    async def _wait_for_start(self: Self, bot: ConferenceBot) -> None:
+        """Keep the staged bot until the conference starts.
+
+        Joins early once the host opens the meeting. Raises
+        StagingCancelledError if the conference is stopped or deleted
+        meanwhile.
+        """
+        STAGING_SLACK.labels(self._conference.platform).observe(
+            self._seconds_to_start()
         )
+        while (remaining := self._seconds_to_start()) > 0:
+            try:
+                await asyncio.wait_for(
+                    self._stopped.wait(), min(remaining, STAGING_POLL_SECONDS)
+                )
+            except asyncio.TimeoutError:
+                pass
+            else:
+                raise StagingCancelledError('stopped before the start time')
+
+            if not await asyncio.to_thread(
+                is_recording_scheduled, self._conference.recording.filename
+            ):
+                raise StagingCancelledError('no longer scheduled')
+            if await bot.room_opened():
+                return
+
+    def _seconds_to_start(self: Self) -> float:
+        return (
+            self._conference.start_time - datetime.now(timezone.utc)
+        ).total_seconds()
+
+    async def _save_audio(
+        self: Self, bot: ConferenceBot, flush: bool = False
+    ) -> None:
+        """Append audio recorded by the bot to the recording's file."""
+        if not bot.capture.audio_only:
+            return
 
-        while self._to_run:
-            sleep(self._SLEEP_DURATION_SECONDS)
+        try:
+            audio = await bot.collect_audio(flush)
+        except WebDriverException as e:
+            log.exception(e)
+            return
+        if audio:
+            await asyncio.to_thread(self._write_audio, audio)
 
-        bot.leave_conference()
+    def _write_audio(self: Self, audio: bytes) -> None:
+        path = RECORDING_OUTPUT_DIR / self._conference.recording.filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A file left by an earlier attempt is overwritten
+        with path.open('ab' if self._audio_saved else 'wb') as file:
+            file.write(audio)
+        self._audio_saved = True
 
-        update_recording_status(
-            self._conference.id, RecordingStatus.FINISHED
+    async def _save_video_size(self: Self) -> None:
+        """Wait for the video to be saved and store its size."""
+        url = f'{VIDEO_URL}/{self._conference.recording.filename}'
+        for _ in range(VIDEO_SIZE_ATTEMPTS):
+            await asyncio.sleep(VIDEO_SIZE_RETRY_SECONDS)
+            try:
+                response = await get_client().head(url)
+            except httpx.HTTPError as e:
+                log.exception(e)
+                continue
+            if response.is_success and 'Content-Length' in response.headers:
+                await asyncio.to_thread(
+                    update_recording_size,
+                    self._conference.recording.filename,
+                    int(response.headers['Content-Length'])
+                )
+                return
+
+        log.warning(
+            'Video %s of conference with id %s was not found',
+            self._conference.recording.filename, self._conference.id
         )
 
+    async def _monitor(
+        self: Self, bot: ConferenceBot
+    ) -> tuple[MeetingState, datetime]:
+        """Wait for stop while periodically probing the bot's meeting.
+
+        The first probe is delayed randomly within the interval, so probes
+        of bots started together are spread evenly over time.
+
+        Returns the state the bot left the meeting in and the time the
+        meeting is considered to have ended at.
+        """
+        joined_at = datetime.now(timezone.utc)
+        alone_since: datetime | None = None
+
+        delay = random.uniform(0, LIVENESS_INTERVAL_SECONDS)
+        while True:
+            try:
+                await asyncio.wait_for(self._stopped.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                return MeetingState.IN_MEETING, datetime.now(timezone.utc)
+
+            async with _probes:
+                liveness = await bot.check_liveness()
+
+            now = datetime.now(timezone.utc)
+            if liveness.state.is_over:
+                return liveness.state, now
+
+            await self._save_audio(bot)
+
+            if self._conference.end_time is not None:
+                delay = LIVENESS_INTERVAL_SECONDS
+                continue
+
+            # Only the bot itself is left
+            if liveness.participants is not None and (
+                liveness.participants <= 1
+            ):
+                alone_since = alone_since or now
+            else:
+                alone_since = None
+
+            if alone_since is not None and (
+                now - alone_since
+            ).total_seconds() >= AUTO_STOP_ALONE_GRACE_SECONDS:
+                return MeetingState.ALONE, alone_since
+
+            # Unknown while the page has no audio or video to monitor
+            if liveness.idle_seconds is not None and (
+                liveness.idle_seconds >= AUTO_STOP_INACTIVITY_SECONDS
+            ):
+                return MeetingState.INACTIVE, now - timedelta(
+                    seconds=liveness.idle_seconds
+                )
+
+            if (now - joined_at).total_seconds() >= MAX_RECORDING_SECONDS:
+                return MeetingState.MAX_DURATION, now
+
+            delay = LIVENESS_INTERVAL_SECONDS
+
 
 class BotsOrchestrator:
     def __init__(self: Self) -> None:
-        self._workers: dict[int, Worker] = {}
-    
-    def start_recording(self: Self, conference: Conference) -> None:
-        if conference.id in self._workers:
+        self._runtime = BotRuntime()
+        self._outbox = StatusOutbox()
+        self._runtime.submit(self._outbox.run())
+        # Keyed by recording file, which outlives the conference starting
+        # its bot when conferences share it
+        self._workers: dict[str, Worker] = {}
+        # Recording files of the conferences which started bots
+        self._filenames: dict[int, str] = {}
+        # Conferences waiting for a free bot, in order of arrival per user
+        self._waiting: dict[int, deque[_Waiting]] = {}
+        self._waiting_ids: set[int] = set()
+        # Workers finish on the runtime thread, requests come from others.
+        # Reentrant, as a worker may finish before its callback is added.
+        self._lock = RLock()
+
+    def start_recording(self: Self, conference: Conference) -> StartOutcome:
+        with self._lock:
+            self._prune()
+            return self._start_or_wait(conference)
+
+    def start_recordings(
+        self: Self, conferences: Iterable[Conference]
+    ) -> list[StartOutcome | ConferenceAlreadyBeingRecordedError]:
+        """Start recordings of many conferences, in order.
+
+        Returns the outcome of each conference, or the error starting it.
+        Bots of the started ones join their conferences concurrently on
+        the runtime.
+        """
+        outcomes: list[StartOutcome | ConferenceAlreadyBeingRecordedError]
+        outcomes = []
+        with self._lock:
+            self._prune()
+            for conference in conferences:
+                try:
+                    outcomes.append(self._start_or_wait(conference))
+                except ConferenceAlreadyBeingRecordedError as e:
+                    outcomes.append(e)
+        return outcomes
+
+    def stop_recording(self: Self, conference_id: int) -> None:
+        """Stop the recording started by the conference.
+
+        A conference still waiting for a bot no longer waits.
+        """
+        with self._lock:
+            self._prune()
+            if self._stop_waiting(lambda c: c.id == conference_id):
+                return
+            if conference_id not in self._filenames:
+                raise ConferenceIsNotBeingRecordedError(
+                    f'There is no conference with id {conference_id} '
+                    'being recorded.'
+                )
+            self._stop(self._filenames[conference_id])
+
+    def stop_recordings(
+        self: Self, filenames: Iterable[str]
+    ) -> list[ConferenceIsNotBeingRecordedError | None]:
+        """Stop many recordings by their files, in order.
+
+        Any conference sharing a file may have started its bot, so they
+        are not stopped by conference. Conferences waiting for a bot to
+        record the file no longer wait. Returns None for each stopped
+        recording, or the error stopping it.
+        """
+        errors: list[ConferenceIsNotBeingRecordedError | None] = []
+        with self._lock:
+            self._prune()
+            for filename in filenames:
+                try:
+                    self._stop(filename)
+                except ConferenceIsNotBeingRecordedError as e:
+                    errors.append(e)
+                else:
+                    errors.append(None)
+        return errors
+
+    def _start_or_wait(self: Self, conference: Conference) -> StartOutcome:
+        if conference.id in self._waiting_ids:
+            return StartOutcome.WAITING
+
+        if conference.id in self._filenames:
             raise ConferenceAlreadyBeingRecordedError(
                 f'Conference with id {conference.id} is '
                 'already being recorded.'
             )
 
-        worker = Worker(conference)
-        self._workers[conference.id] = worker
-        worker.start()
+        filename = conference.recording.filename
+        if filename in self._workers:
+            raise ConferenceAlreadyBeingRecordedError(
+                f'Recording {filename} of conference with id '
+                f'{conference.id} is already being recorded by '
+                'conference with id '
+                f'{self._workers[filename].conference.id}.'
+            )
 
-    def stop_recording(self: Self, conference_id: int) -> None:
-        if conference_id not in self._workers:
+        if len(self._workers) < MAX_BOTS and not self._waiting_ids:
+            self._start(conference)
+            return StartOutcome.STARTED
+
+        log.info(
+            'No free bot for conference with id %s of user %s, '
+            '%s conferences waiting',
+            conference.id, conference.user_id, len(self._waiting_ids)
+        )
+        self._waiting.setdefault(conference.user_id, deque()).append(
+            _Waiting(conference)
+        )
+        self._waiting_ids.add(conference.id)
+        WAITING_CONFERENCES.inc()
+        self._runtime.call_later(
+            self._max_wait_seconds(conference),
+            self._expire, conference
+        )
+        return StartOutcome.WAITING
+
+    def _stop(self: Self, filename: str) -> None:
+        waited = self._stop_waiting(
+            lambda c: c.recording.filename == filename
+        )
+        if filename not in self._workers:
+            if waited:
+                return
             raise ConferenceIsNotBeingRecordedError(
-                f'There is no conference with id {conference_id} '
-                'being recorded.'
+                f'There is no recording {filename} being recorded.'
             )
 
-        worker = self._workers[conference_id]
+        worker = self._workers.pop(filename)
         worker.stop()
 
-        del self._workers[conference_id]
+        del self._filenames[worker.conference.id]
+
+    def _start(self: Self, conference: Conference) -> None:
+        worker = Worker(conference, self._runtime, self._outbox)
+        self._workers[conference.recording.filename] = worker
+        self._filenames[conference.id] = conference.recording.filename
+        worker.start(on_finished=self._on_worker_finished)
+
+    def _on_worker_finished(self: Self) -> None:
+        with self._lock:
+            self._prune()
+            self._dispatch()
+
+    def _dispatch(self: Self) -> None:
+        """Give free bots to waiting conferences, fairly across users.
+
+        Each free bot goes to the user with the fewest bots running, ties
+        broken by the longest waiting conference, so a user scheduling many
+        conferences at once does not starve the others.
+        """
+        while self._waiting and len(self._workers) < MAX_BOTS:
+            running: dict[int, int] = {}
+            for worker in self._workers.values():
+                user_id = worker.conference.user_id
+                running[user_id] = running.get(user_id, 0) + 1
+
+            user_id = min(
+                self._waiting,
+                key=lambda u: (running.get(u, 0), self._waiting[u][0].since)
+            )
+            queue = self._waiting[user_id]
+            conference = queue.popleft().conference
+            if not queue:
+                del self._waiting[user_id]
+            self._waiting_ids.discard(conference.id)
+            WAITING_CONFERENCES.dec()
+
+            # The meeting may have got a bot of another conference meanwhile
+            if conference.recording.filename in self._workers:
+                continue
+            self._start(conference)
+
+    def _expire(self: Self, conference: Conference) -> None:
+        """Reject the conference if it still waits for a bot."""
+        with self._lock:
+            if conference.id not in self._waiting_ids:
+                return
+            self._unqueue(lambda c: c.id == conference.id)
+
+        log.warning(
+            'Rejected conference with id %s of user %s, no bot got free',
+            conference.id, conference.user_id
+        )
+        QUEUE_REJECTIONS.inc()
+        self._reject(
+            conference,
+            'All recording bots stayed busy while the conference waited'
+        )
+
+    def _unqueue(
+        self: Self, matches: Callable[[Conference], bool]
+    ) -> list[Conference]:
+        """Remove waiting conferences which match, returning them."""
+        if not self._waiting_ids:
+            return []
+
+        unqueued = []
+        for user_id, queue in list(self._waiting.items()):
+            waiting = [w for w in queue if matches(w.conference)]
+            if not waiting:
+                continue
+            for w in waiting:
+                queue.remove(w)
+                self._waiting_ids.discard(w.conference.id)
+                unqueued.append(w.conference)
+            if not queue:
+                del self._waiting[user_id]
+        WAITING_CONFERENCES.dec(len(unqueued))
+        return unqueued
+
+    def _stop_waiting(
+        self: Self, matches: Callable[[Conference], bool]
+    ) -> bool:
+        """Stop the matching conferences from waiting for a bot.
+
+        Nothing was recorded for them, so their recordings are rejected.
+        Returns whether any conference waited.
+        """
+        unqueued = self._unqueue(matches)
+        for conference in unqueued:
+            log.info(
+                'Conference with id %s of user %s stopped while waiting '
+                'for a bot', conference.id, conference.user_id
+            )
+            self._reject(
+                conference, 'The conference was stopped before a bot got free'
+            )
+        return bool(unqueued)
+
+    def _reject(self: Self, conference: Conference, reason: str) -> None:
+        self._runtime.submit(self._outbox.add(StatusTransition(
+            conference.recording.filename,
+            RecordingStatus.REJECTED,
+            datetime.now(timezone.utc),
+            reason
+        )))
+
+    @staticmethod
+    def _max_wait_seconds(conference: Conference) -> float:
+        if conference.end_time is None:
+            return MAX_WAIT_SECONDS
+        return max(0, min(
+            MAX_WAIT_SECONDS,
+            (conference.end_time - datetime.now(timezone.utc)).total_seconds()
+        ))
+
+    def _prune(self: Self) -> None:
+        """Forget workers which finished on their own."""
+        for filename, worker in list(self._workers.items()):
+            if worker.finished:
+                del self._workers[filename]
+                del self._filenames[worker.conference.id]
 
     def __del__(self: Self) -> None:
         for worker in self._workers.values():
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Self
+
+from psycopg2.errors import Error
+
+from app.orchestrator.metrics import (
+    OUTBOX_FLUSH_FAILURES,
+    OUTBOX_FLUSH_SIZE,
+    OUTBOX_PENDING
+)
+from app.persistence.postgres import update_recording_statuses
+from app.schema import RecordingStatus, StatusTransition
+
+# Kept on a volume, transitions outlive restarts of the orchestrator
+OUTBOX_PATH = Path(
+    os.getenv('OUTBOX_PATH', '/var/lib/orchestrator/outbox.sqlite3')
+)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 1000))
+# Transitions added meanwhile are written together with the first one
+OUTBOX_FLUSH_DELAY_SECONDS = float(
+    os.getenv('OUTBOX_FLUSH_DELAY_SECONDS', 0.05)
+)
+# Failed writes are retried with the delay doubling up to the maximum
+OUTBOX_RETRY_SECONDS = float(os.getenv('OUTBOX_RETRY_SECONDS', 1))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', 60))
+
+log = logging.getLogger(__name__)
+
+
+class StatusOutbox:
+    """Recording status transitions on local disk until written to the
+    database.
+
+    Bots add transitions without waiting for the database. A single
+    flusher writes them in batches, one transaction each, and keeps
+    retrying while the database fails, so a transition is only dropped
+    once it is written.
+    """
+
+    def __init__(self: Self, path: Path = OUTBOX_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Used from the threads of the runtime, one at a time
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        # Added transitions survive a crash of the host too
+        self._db.execute('PRAGMA synchronous = FULL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS transitions ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'filename TEXT NOT NULL, '
+            'status TEXT NOT NULL, '
+            'occurred_at TEXT NOT NULL, '
+            'rejection_reason TEXT)'
+        )
+        self._lock = Lock()
+        self._added = asyncio.Event()
+        # Transitions waiting to be stored, with futures of the bots
+        self._adding: list[tuple[StatusTransition, asyncio.Future[None]]] = []
+        self._storing: asyncio.Task[None] | None = None
+        OUTBOX_PENDING.set(self._count())
+
+    async def add(self: Self, transition: StatusTransition) -> None:
+        """Store the transition for the flusher.
+
+        Transitions added while others are stored are stored together
+        after them, in one local transaction.
+        """
+        stored = asyncio.get_running_loop().create_future()
+        self._adding.append((transition, stored))
+        if self._storing is None:
+            self._storing = asyncio.create_task(self._store())
+        await stored
+
+    async def _store(self: Self) -> None:
+        try:
+            while self._adding:
+                adding, self._adding = self._adding, []
+                try:
+                    await asyncio.to_thread(
+                        self._insert, [transition for transition, _ in adding]
+                    )
+                except sqlite3.Error as e:
+                    for _, stored in adding:
+                        if not stored.done():
+                            stored.set_exception(e)
+                    continue
+                # Bots stopped meanwhile no longer wait
+                for _, stored in adding:
+                    if not stored.done():
+                        stored.set_result(None)
+                OUTBOX_PENDING.inc(len(adding))
+                self._added.set()
+        finally:
+            self._storing = None
+
+    async def run(self: Self) -> None:
+        """Flush transitions forever, those left by an earlier run first.
+
+        Runs on the bot runtime, which must run one flusher only.
+        """
+        failures = 0
+        while True:
+            try:
+                flushed = await self._flush()
+            except Exception as e:
+                # Bots keep adding transitions, so the flusher must not end
+                failures += 1
+                delay = min(
+                    OUTBOX_RETRY_SECONDS * 2 ** (failures - 1),
+                    OUTBOX_RETRY_MAX_SECONDS
+                )
+                if isinstance(e, Error):
+                    log.warning(
+                        'Failed to write status transitions, retrying in '
+                        '%.0fs: %s', delay, e
+                    )
+                else:
+                    log.exception(e)
+                OUTBOX_FLUSH_FAILURES.inc()
+                await asyncio.sleep(delay)
+                continue
+
+            failures = 0
+            if not flushed:
+                await self._added.wait()
+                self._added.clear()
+                await asyncio.sleep(OUTBOX_FLUSH_DELAY_SECONDS)
+
+    async def _flush(self: Self) -> int:
+        """Write a batch of transitions, returning how many there were."""
+        rows = await asyncio.to_thread(self._read)
+        if not rows:
+            return 0
+
+        await asyncio.to_thread(
+            update_recording_statuses, [transition for _, transition in rows]
+        )
+        OUTBOX_FLUSH_SIZE.observe(len(rows))
+        await asyncio.to_thread(self._delete, rows[-1][0])
+        OUTBOX_PENDING.dec(len(rows))
+        return len(rows)
+
+    def _insert(self: Self, transitions: list[StatusTransition]) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT INTO transitions '
+                '(filename, status, occurred_at, rejection_reason) '
+                'VALUES (?, ?, ?, ?)',
+                [
+                    (
+                        t.filename, t.status, t.occurred_at.isoformat(),
+                        t.rejection_reason
+                    )
+                    for t in transitions
+                ]
+            )
+
+    def _read(self: Self) -> list[tuple[int, StatusTransition]]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT id, filename, status, occurred_at, '
+                'rejection_reason FROM transitions ORDER BY id LIMIT ?',
+                (OUTBOX_BATCH_SIZE,)
+            ).fetchall()
+        return [
+            (row_id, StatusTransition(
+                filename,
+                RecordingStatus(status),
+                datetime.fromisoformat(occurred_at),
+                rejection_reason
+            ))
+            for row_id, filename, status, occurred_at, rejection_reason
+            in rows
+        ]
+
+    def _delete(self: Self, last_id: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                'DELETE FROM transitions WHERE id <= ?', (last_id,)
+            )
+
+    def _count(self: Self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM transitions'
+            ).fetchone()[0]
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Thread
+from typing import Any, Callable, Coroutine, Self, TypeVar
+
+# Threads for blocking calls (e.g. database) made by bots
+BLOCKING_THREADS = int(os.getenv('BOTS_BLOCKING_THREADS', 4))
+
+T = TypeVar('T')
+
+log = logging.getLogger(__name__)
+
+
+class BotRuntime:
+    """Event loop running every bot on one background thread."""
+
+    def __init__(self: Self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(ThreadPoolExecutor(
+            BLOCKING_THREADS, thread_name_prefix='bots-blocking'
+        ))
+        self._thread = Thread(
+            target=self._loop.run_forever, name='bots-loop', daemon=True
+        )
+        self._thread.start()
+
+    def submit(self: Self, coro: Coroutine[Any, Any, T]) -> Future[T]:
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        future.add_done_callback(self._log_exception)
+        return future
+
+    def call_soon(self: Self, callback: Callable[..., Any], *args: Any) -> None:
+        self._loop.call_soon_threadsafe(callback, *args)
+
+    def call_later(
+        self: Self, delay: float, callback: Callable[..., Any], *args: Any
+    ) -> None:
+        self._loop.call_soon_threadsafe(
+            self._loop.call_later, delay, callback, *args
+        )
+
+    @staticmethod
+    def _log_exception(future: Future[Any]) -> None:
+        if not future.cancelled() and future.exception():
+            log.exception(future.exception())
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import re
+from typing import Any, Awaitable, Callable, Self, TypeVar
+
+import httpx
+from opentelemetry.trace import SpanKind
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException
+)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.options import ArgOptions
+
+from app.tracing import tracer
+
+ELEMENT_KEY = 'element-6066-11e4-a52e-4f735466cecf'
+
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('WEBDRIVER_TIMEOUT_SECONDS', 60))
+NEW_SESSION_TIMEOUT_SECONDS = float(
+    os.getenv('WEBDRIVER_NEW_SESSION_TIMEOUT_SECONDS', 300)
+)
+MAX_CONNECTIONS = int(os.getenv('WEBDRIVER_MAX_CONNECTIONS', 200))
+
+POLL_FREQUENCY_SECONDS = 0.5
+
+# Element ids are left out of span names
+_ELEMENT_PATH = re.compile(r'/element/[^/]+')
+
+_ERRORS: dict[str, type[WebDriverException]] = {
+    'no such element': NoSuchElementException,
+    'stale element reference': StaleElementReferenceException,
+    'invalid session id': InvalidSessionIdException,
+    'timeout': TimeoutException
+}
+
+T = TypeVar('T')
+
+Condition = Callable[['AsyncWebDriver'], Awaitable[T]]
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return HTTP client shared by all sessions of the event loop."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT_SECONDS, pool=None),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS)
+        )
+    return _client
+
+
+def _raise_for_error(response: httpx.Response) -> Any:
+    try:
+        value = response.json()['value']
+    except (ValueError, KeyError, TypeError):
+        # Proxies in front of the browser answer with their own pages
+        raise WebDriverException(
+            f'Unexpected response {response.status_code}: '
+            f'{response.text[:200]}'
+        )
+    if response.is_error:
+        error = _ERRORS.get(value.get('error'), WebDriverException)
+        raise error(value.get('message'))
+    return value
+
+
+class AsyncWebElement:
+    def __init__(self: Self, driver: 'AsyncWebDriver', id_: str) -> None:
+        self._driver = driver
+        self.id = id_
+
+    async def click(self: Self) -> None:
+        await self._request('POST', '/click', {})
+
+    async def send_keys(self: Self, text: str) -> None:
+        await self._request('POST', '/value', {'text': text})
+
+    async def get_attribute(self: Self, name: str) -> str | None:
+        return await self._request('GET', f'/attribute/{name}')
+
+    async def get_property(self: Self, name: str) -> Any:
+        return await self._request('GET', f'/property/{name}')
+
+    async def is_displayed(self: Self) -> bool:
+        return await self._request('GET', '/displayed')
+
+    async def is_enabled(self: Self) -> bool:
+        return await self._request('GET', '/enabled')
+
+    def to_json(self: Self) -> dict[str, str]:
+        return {ELEMENT_KEY: self.id}
+
+    async def _request(
+        self: Self, method: str, path: str, json: Any = None
+    ) -> Any:
+        return await self._driver.request(
+            method, f'/element/{self.id}{path}', json
+        )
+
+
+class AsyncWebDriver:
+    """Minimal W3C WebDriver client running on asyncio.
+
+    Covers the commands conference bots need, so thousands of sessions can
+    be driven from a single event loop instead of a thread per session.
+    """
+
+    def __init__(
+        self: Self,
+        remote_address: str,
+        session_id: str,
+        capabilities: dict[str, Any],
+        client: httpx.AsyncClient
+    ) -> None:
+        self._url = f'{remote_address}/session/{session_id}'
+        self.session_id = session_id
+        self.capabilities = capabilities
+        self._client = client
+
+    @classmethod
+    async def create(
+        # Annotated by the returned Self, mypy rejects annotating both
+        cls,
+        remote_address: str,
+        options: ArgOptions,
+        client: httpx.AsyncClient | None = None
+    ) -> Self:
+        client = client or get_client()
+        with tracer.start_as_current_span(
+            'webdriver POST /session', kind=SpanKind.CLIENT
+        ):
+            response = await client.post(
+                f'{remote_address}/session',
+                json={'capabilities': {
+                    'firstMatch': [{}],
+                    'alwaysMatch': options.to_capabilities()
+                }},
+                timeout=NEW_SESSION_TIMEOUT_SECONDS
+            )
+            value = _raise_for_error(response)
+        return cls(
+            remote_address, value['sessionId'], value['capabilities'], client
+        )
+
+    async def request(
+        self: Self, method: str, path: str = '', json: Any = None
+    ) -> Any:
+        with tracer.start_as_current_span(
+            f'webdriver {method} {_ELEMENT_PATH.sub("/element/{id}", path)}',
+            kind=SpanKind.CLIENT
+        ):
+            response = await self._client.request(
+                method, f'{self._url}{path}', json=json
+            )
+            return _raise_for_error(response)
+
+    async def get(self: Self, url: str) -> None:
+        await self.request('POST', '/url', {'url': url})
+
+    async def find_element(
+        self: Self, by: str, value: str
+    ) -> AsyncWebElement:
+        element = await self.request(
+            'POST', '/element', self._locator(by, value)
+        )
+        return AsyncWebElement(self, element[ELEMENT_KEY])
+
+    async def find_elements(
+        self: Self, by: str, value: str
+    ) -> list[AsyncWebElement]:
+        elements = await self.request(
+            'POST', '/elements', self._locator(by, value)
+        )
+        return [AsyncWebElement(self, e[ELEMENT_KEY]) for e in elements]
+
+    async def execute_script(self: Self, script: str, *args: Any) -> Any:
+        return await self.request(
+            'POST', '/execute/sync', self._script(script, args)
+        )
+
+    async def execute_async_script(
+        self: Self, script: str, *args: Any
+    ) -> Any:
+        """Run script which passes its result to the callback it gets as
+        the last argument."""
+        return await self.request(
+            'POST', '/execute/async', self._script(script, args)
+        )
+
+    async def quit(self: Self) -> None:
+        await self.request('DELETE')
+
+    @staticmethod
+    def _script(script: str, args: tuple[Any, ...]) -> dict[str, Any]:
+        return {
+            'script': script,
+            'args': [
+                a.to_json() if isinstance(a, AsyncWebElement) else a
+                for a in args
+            ]
+        }
+
+    @staticmethod
+    def _locator(by: str, value: str) -> dict[str, str]:
+        # W3C dropped the id and name strategies, Selenium maps them to CSS
+        match by:
+            case By.ID:
+                return {'using': By.CSS_SELECTOR, 'value': f'[id="{value}"]'}
+            case By.NAME:
+                return {
+                    'using': By.CSS_SELECTOR, 'value': f'[name="{value}"]'
+                }
+            case _:
+                return {'using': by, 'value': value}
+
+
+class AsyncWebDriverWait:
+    def __init__(
+        self: Self,
+        driver: AsyncWebDriver,
+        timeout: float,
+        poll_frequency: float = POLL_FREQUENCY_SECONDS
+    ) -> None:
+        self._driver = driver
+        self._timeout = timeout
+        self._poll_frequency = poll_frequency
+
+    async def until(self: Self, condition: Condition[T | None]) -> T:
+        """Wait for the condition to give a truthy value and return it."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._timeout
+        while True:
+            try:
+                value = await condition(self._driver)
+            except (NoSuchElementException, StaleElementReferenceException):
+                value = None
+
+            if value:
+                # Narrowed by truthiness, which mypy does not see for T
+                return value  # type: ignore[return-value]
+
+            if loop.time() > deadline:
+                raise TimeoutException(
+                    f'Condition not met in {self._timeout} seconds.'
+                )
+            await asyncio.sleep(self._poll_frequency)
@@ -1,14 +1,23 @@
 import logging
 import os
+from datetime import datetime
 from functools import wraps
-from typing import Callable, TypeVar, ParamSpec
+from typing import Any, Callable, Concatenate, Iterable, TypeVar, ParamSpec
 
 from psycopg2 import connect
 from psycopg2.extensions import connection
 from psycopg2.errors import Error
-from pypika import Table, PostgreSQLQuery as Query
+from pypika import (
+    Table, PostgreSQLQuery as Query, CustomFunction, functions as fn
+)
+from pypika.terms import Array, Term
 
-from app.schema import RecordingStatus
+from common.query_stats import (
+    InstrumentedConnection, connect_options
+)
+
+from app.schema import RecordingStatus, StatusTransition
+from app.tracing import tracer
 
 POSTGRES_DB_CONFIG = {
     'host': os.getenv('POSTGRES_HOST'),
@@ -21,50 +30,197 @@ POSTGRES_DB_CONFIG = {
 T = TypeVar('T')
 P = ParamSpec('P')
 
-FuncToDecorate = Callable[[connection, P.args, P.kwargs], T]
+FuncToDecorate = Callable[Concatenate[connection, P], T]
 
 log = logging.getLogger(__name__)
 
 recordings = Table('recordings')
+conferences = Table('conferences')
+
+_unnest = CustomFunction('unnest', ['array'])
 
 
 def pg_connection(
-    autocommit: bool = False
-) -> Callable[[FuncToDecorate], Callable[P, T]]:
-    def fn_wrapper(fn: FuncToDecorate) -> Callable[P, T]:
+    autocommit: bool = False, statement_timeout_ms: int | None = None
+) -> Callable[[FuncToDecorate[P, T]], Callable[P, T]]:
+    """Run function with a connection of its own.
+
+    Statements are recorded in `query_stats`. The statement timeout
+    defaults to STATEMENT_TIMEOUT_MS.
+    """
+    def fn_wrapper(fn: FuncToDecorate[P, T]) -> Callable[P, T]:
         @wraps(fn)
         def args_wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-            conn = connect(**POSTGRES_DB_CONFIG)
-            conn.autocommit = autocommit
-            try:
-                res = fn(conn, *args, **kwargs)
-            except Error as e:
-                log.exception(e)
-                if not autocommit:
-                    conn.rollback()
-                raise e
-            else:
-                if not autocommit:
-                    conn.commit()
-            finally:
-                conn.close()
-            return res
+            with tracer.start_as_current_span(
+                f'db {fn.__name__}', attributes={'db.system': 'postgresql'}
+            ):
+                conn = connect(
+                    **POSTGRES_DB_CONFIG,
+                    **connect_options(statement_timeout_ms),
+                    connection_factory=InstrumentedConnection
+                )
+                conn.function = fn.__name__
+                conn.autocommit = autocommit
+                try:
+                    res = fn(conn, *args, **kwargs)
+                except Error as e:
+                    log.exception(e)
+                    if not autocommit:
+                        conn.rollback()
+                    raise e
+                else:
+                    if not autocommit:
+                        conn.commit()
+                finally:
+                    conn.close()
+                return res
         return args_wrapper
-    return fn_wrapper
+    # mypy 1.3 tells the named parameter of fn_wrapper from the positional
+    # one of the declared callable
+    return fn_wrapper  # type: ignore[return-value]
 
 
 @pg_connection()
-def update_recording_status(
+def update_recording_statuses(
     conn: connection,
-    conference_id: int,
-    status: RecordingStatus
+    transitions: Iterable[StatusTransition]
 ) -> None:
+    """Apply status transitions of many recordings in one statement.
+
+    Transitions are taken in order. A recording gets its latest status,
+    while its start and end are stamped with the times its IN_PROGRESS
+    and FINISHED transitions happened, so merging them loses no recorded
+    time. Errors are raised, so none of the transitions is lost.
+    """
+    merged: dict[str, dict[str, Any]] = {}
+    for transition in transitions:
+        item = merged.setdefault(transition.filename, {
+            'started_at': None, 'finished_at': None
+        })
+        item['status'] = transition.status
+        item['rejection_reason'] = transition.rejection_reason
+        if transition.status == RecordingStatus.IN_PROGRESS:
+            item['started_at'] = transition.occurred_at
+        elif transition.status == RecordingStatus.FINISHED:
+            item['finished_at'] = transition.occurred_at
+    if not merged:
+        return
+
+    def column(name: str, type_: str) -> Term:
+        return _unnest(fn.Cast(
+            Array(*(item[name] for item in merged.values())), type_
+        )).as_(name)
+
+    updates = Query.select(
+        _unnest(fn.Cast(Array(*merged), 'VARCHAR[]')).as_('filename'),
+        column('status', 'recording_status[]'),
+        column('rejection_reason', 'VARCHAR[]'),
+        column('started_at', 'TIMESTAMPTZ[]'),
+        column('finished_at', 'TIMESTAMPTZ[]')
+    )
+
+    with conn.cursor() as cur:
+        cur.execute(Query
+            .update(recordings)
+            .from_(updates)
+            .set(recordings.status, updates.status)
+            .set(
+                recordings.rejection_reason,
+                fn.Coalesce(
+                    updates.rejection_reason, recordings.rejection_reason
+                )
+            )
+            # Stamped by recordings_status_times when not given
+            .set(
+                recordings.started_at,
+                fn.Coalesce(updates.started_at, recordings.started_at)
+            )
+            .set(
+                recordings.finished_at,
+                fn.Coalesce(updates.finished_at, recordings.finished_at)
+            )
+            # Every conference sharing the recording file
+            .where(recordings.filename == updates.filename)
+            # Sharing conferences waited for the same bot, rejected only
+            # while still waiting
+            .where(
+                (updates.status != RecordingStatus.REJECTED)
+                | (recordings.status == RecordingStatus.SCHEDULED)
+            )
+            .get_sql()
+        )
+
+
+@pg_connection()
+def update_recording_size(
+    conn: connection,
+    filename: str,
+    size_bytes: int
+) -> None:
+    # Every conference sharing the recording file counts it
     try:
         with conn.cursor() as cur:
             cur.execute(Query
                 .update(recordings)
-                .set(recordings.status, status)
-                .where(recordings.conference_id == conference_id).get_sql()
+                .set(recordings.size_bytes, size_bytes)
+                .where(recordings.filename == filename)
+                .get_sql()
+            )
+    except Error as e:
+        log.exception(e)
+
+
+@pg_connection()
+def update_conference_end_time(
+    conn: connection,
+    filename: str,
+    end_time: datetime
+) -> None:
+    # Conferences sharing the recording file ended with it, unless they were
+    # already scheduled to end earlier
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Query
+                .update(conferences)
+                .set(conferences.end_time, end_time)
+                .where(conferences.id.isin(Query
+                    .from_(recordings)
+                    .select(recordings.conference_id)
+                    .where(recordings.filename == filename)
+                ))
+                .where(
+                    conferences.end_time.isnull()
+                    | (conferences.end_time > end_time)
+                )
+                .where(conferences.start_time < end_time)
+                .get_sql()
+            )
+    except Error as e:
+        log.exception(e)
+
+
+@pg_connection()
+def is_recording_scheduled(
+    conn: connection,
+    filename: str
+) -> bool:
+    """Whether any conference sharing the recording file still waits for
+    its bot to join.
+
+    False once all of them are deleted or rejected. A failed check counts
+    as scheduled, so it does not cancel recordings.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Query
+                .from_(recordings)
+                .select(recordings.conference_id)
+                .where(recordings.filename == filename)
+                .where(recordings.status == RecordingStatus.SCHEDULED)
+                .limit(1)
+                .get_sql()
             )
+            return cur.fetchone() is not None
     except Error as e:
         log.exception(e)
+        return True
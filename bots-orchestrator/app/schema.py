@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import StrEnum
-from typing import Type, Self, Container
+from typing import Type, Self, Container, NamedTuple
 
 from pydantic import BaseModel
 
@@ -10,10 +10,18 @@ class ConferencingPlatform(StrEnum):
     MEET = 'google_meet'
 
 
+class CaptureProfile(StrEnum):
+    FULL_HD = 'full_hd'
+    HD = 'hd'
+    SD = 'sd'
+    AUDIO_ONLY = 'audio_only'
+
+
 class RecordingStatus(StrEnum):
     SCHEDULED = 'scheduled'
     IN_PROGRESS = 'in_progress'
     FINISHED = 'finished'
+    REJECTED = 'rejected'
 
 
 class Model(BaseModel):
@@ -44,6 +52,7 @@ class Recording(Model):
 class Settings(Model):
     participant_name: str
     disclaimer_message: str
+    capture_profile: CaptureProfile = CaptureProfile.FULL_HD
 
 
 class Conference(Model):
@@ -56,3 +65,15 @@ class Conference(Model):
     platform: ConferencingPlatform
     settings: Settings
     recording: Recording
+    # W3C traceparent, sent with conferences started in batches only
+    trace_context: str | None = None
+
+
+class StatusTransition(NamedTuple):
+    # Applies to every conference sharing the recording file
+    filename: str
+    status: RecordingStatus
+    # When the bot made it, not when it is written
+    occurred_at: datetime
+    # Set for REJECTED only
+    rejection_reason: str | None = None
@@ -0,0 +1,115 @@
+"""Tracing of recordings across the services.
+
+Spans are exported in batches from a background thread, either to an
+OpenTelemetry collector (endpoint from OTEL_EXPORTER_OTLP_ENDPOINT) or as
+JSON lines to a file. Context travels between services in W3C
+`traceparent` headers. Configured with environment variables:
+
+    TRACING_EXPORTER=otlp|file|none
+    TRACING_FILE=traces.jsonl
+    TRACING_SAMPLE_RATIO=1.0
+"""
+import os
+from typing import Mapping, Self
+
+from opentelemetry import context as otel_context, propagate, trace
+from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+    OTLPSpanExporter
+)
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none')
+TRACING_FILE = os.getenv('TRACING_FILE', 'traces.jsonl')
+TRACING_SAMPLE_RATIO = float(os.getenv('TRACING_SAMPLE_RATIO', 1.0))
+
+TRACEPARENT_HEADER = 'traceparent'
+
+# Records nothing until `setup_tracing` installs a provider
+tracer = trace.get_tracer('app')
+
+
+def setup_tracing(service_name: str) -> None:
+    if TRACING_EXPORTER == 'none':
+        return
+
+    exporter: SpanExporter
+    if TRACING_EXPORTER == 'file':
+        exporter = ConsoleSpanExporter(
+            out=open(TRACING_FILE, 'a'),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep
+        )
+    else:
+        exporter = OTLPSpanExporter()
+
+    provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: service_name}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO))
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def inject_headers() -> dict[str, str]:
+    """Return headers carrying the current trace context."""
+    headers: dict[str, str] = {}
+    propagate.inject(headers)
+    return headers
+
+
+def extract_context(
+    headers: Mapping[str, str] | None
+) -> otel_context.Context | None:
+    return propagate.extract(headers) if headers else None
+
+
+class TracingMiddleware:
+    """Runs every HTTP request in a span continuing the caller's trace."""
+
+    def __init__(self: Self, app: ASGIApp) -> None:
+        self._app = app
+
+    async def __call__(
+        self: Self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope['type'] != 'http':
+            await self._app(scope, receive, send)
+            return
+
+        parent = extract_context(Headers(scope=scope))
+        with tracer.start_as_current_span(
+            f'{scope["method"]} {scope["path"]}',
+            context=parent,
+            kind=trace.SpanKind.SERVER,
+            attributes={'http.method': scope['method']}
+        ) as span:
+            async def send_traced(message: Message) -> None:
+                if message['type'] == 'http.response.start':
+                    span.set_attribute(
+                        'http.status_code', message['status']
+                    )
+                await send(message)
+
+            await self._app(scope, receive, send_traced)
+            span.update_name(f'{scope["method"]} {route_name(scope)}')
+
+
+def route_name(scope: Scope) -> str:
+    """Return path template of the route which handled the request."""
+    # Keeps names from growing with every id in paths
+    if 'endpoint' not in scope:
+        return 'unmatched'
+    if 'app_root_path' in scope:
+        # Mounted apps get the rest of the path
+        mount = scope['root_path'].removeprefix(scope['app_root_path'])
+        return f'{mount}/{{path}}'
+    path = scope['path']
+    for name, value in scope.get('path_params', {}).items():
+        path = path.replace(f'/{value}', f'/{{{name}}}')
+    return path
@@ -0,0 +1,159 @@
+"""Time to start and stop recordings of many conferences over HTTP.
+
+Serves the orchestrator API with uvicorn in this process and calls it the
+way the scheduler's orchestrator_client does: a request per conference as
+before, a request per conference over one kept open connection, and
+batches. Bots are not started, so only the API and the bookkeeping of
+the orchestrator are measured:
+
+    python -m benchmarks.batch_start --conferences 1000
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from time import perf_counter, sleep
+
+os.environ.setdefault('MAX_BOTS', '100000')
+os.environ.setdefault(
+    'OUTBOX_PATH', os.path.join(tempfile.mkdtemp(), 'outbox.sqlite3')
+)
+
+import httpx
+import uvicorn
+
+from app.orchestrator import orchestrator
+from app.schema import Conference, ConferencingPlatform, Recording, Settings
+from main import app
+
+PORT = 7999
+API_URL = f'http://127.0.0.1:{PORT}'
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+
+def make_conferences(first_id: int, count: int) -> list[Conference]:
+    start_time = datetime.now(timezone.utc) + timedelta(minutes=2)
+    return [
+        Conference(
+            id=id_,
+            user_id=id_ % 100,
+            title='Weekly planning meeting',
+            invite_link=f'https://us04web.zoom.us/j/{id_}?pwd=benchmark',
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1),
+            platform=ConferencingPlatform.ZOOM,
+            settings=Settings(
+                participant_name='Recorder',
+                disclaimer_message='This meeting is being recorded.'
+            ),
+            recording=Recording(filename=f'benchmark-{id_}.mp4')
+        )
+        for id_ in range(first_id, first_id + count)
+    ]
+
+
+def serve() -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(
+        app, port=PORT, log_level='warning', access_log=False
+    ))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        sleep(0.01)
+    return server
+
+
+def start_each_new_connection(conferences: list[Conference]) -> None:
+    # What orchestrator_client did before batches
+    for conference in conferences:
+        httpx.post(
+            f'{API_URL}/recording/start',
+            json=json.loads(conference.json(exclude={'trace_context'}))
+        ).raise_for_status()
+
+
+def start_each(client: httpx.Client, conferences: list[Conference]) -> None:
+    for conference in conferences:
+        client.post(
+            '/recording/start',
+            content=conference.json(exclude={'trace_context'}),
+            headers=JSON_HEADERS
+        ).raise_for_status()
+
+
+def start_batches(
+    client: httpx.Client, conferences: list[Conference], batch_size: int
+) -> None:
+    for start in range(0, len(conferences), batch_size):
+        batch = conferences[start:start + batch_size]
+        client.post(
+            '/recording/start/batch',
+            content=f'[{",".join(c.json() for c in batch)}]',
+            headers=JSON_HEADERS
+        ).raise_for_status()
+
+
+def stop_each(client: httpx.Client, conferences: list[Conference]) -> None:
+    for conference in conferences:
+        client.post(
+            f'/recording/{conference.id}/stop'
+        ).raise_for_status()
+
+
+def stop_batches(
+    client: httpx.Client, conferences: list[Conference], batch_size: int
+) -> None:
+    for start in range(0, len(conferences), batch_size):
+        client.post(
+            '/recording/stop/batch',
+            json=[
+                c.recording.filename
+                for c in conferences[start:start + batch_size]
+            ]
+        ).raise_for_status()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conferences', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    # Bots are not started, only the bookkeeping of the orchestrator
+    setattr(orchestrator.Worker, 'start', lambda self, on_finished: None)
+    serve()
+    client = httpx.Client(base_url=API_URL)
+    count, batch_size = args.conferences, args.batch_size
+
+    runs = [
+        ('request per start', start_each_new_connection,
+         lambda c: stop_each(client, c)),
+        ('request per start, kept connection',
+         lambda c: start_each(client, c), lambda c: stop_each(client, c)),
+        (f'batches of {batch_size}',
+         lambda c: start_batches(client, c, batch_size),
+         lambda c: stop_batches(client, c, batch_size)),
+        (f'one batch of {count}',
+         lambda c: start_batches(client, c, count),
+         lambda c: stop_batches(client, c, count))
+    ]
+    for index, (name, start, stop) in enumerate(runs):
+        conferences = make_conferences(index * count, count)
+        started_at = perf_counter()
+        start(conferences)
+        start_seconds = perf_counter() - started_at
+
+        started_at = perf_counter()
+        stop(conferences)
+        stop_seconds = perf_counter() - started_at
+        print(
+            f'{name:<36} {count} starts {start_seconds * 1000:7.0f} ms, '
+            f'stops {stop_seconds * 1000:7.0f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Thread count and memory of the orchestrator with many simulated bots.
+
+Bots talk to an in-process fake WebDriver endpoint, so no browsers are
+needed. The previous thread-per-recording model is approximated by idle
+threads for comparison:
+
+    python -m benchmarks.bot_runtime --bots 1000
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from time import monotonic, sleep
+from typing import Any, Iterable
+
+os.environ.setdefault('REMOTE_ADDRESS', 'http://webdriver.test')
+os.environ.setdefault('BROWSER_NAME', 'chrome')
+os.environ.setdefault('ENABLE_VIDEO', 'False')
+os.environ.setdefault('ENABLE_VNC', 'False')
+os.environ.setdefault('SESSION_TIMEOUT', '1h')
+os.environ.setdefault('VIDEO_FRAME_RATE', '30')
+# Every bot records at once instead of waiting for a free one
+os.environ.setdefault('MAX_BOTS', '100000')
+os.environ.setdefault(
+    'OUTBOX_PATH', os.path.join(tempfile.mkdtemp(), 'outbox.sqlite3')
+)
+
+import httpx
+
+from app.orchestrator import orchestrator, outbox, webdriver
+from app.orchestrator.webdriver import ELEMENT_KEY
+from app.schema import (
+    Conference, ConferencingPlatform, Recording, Settings, StatusTransition
+)
+
+WEBDRIVER_LATENCY_SECONDS = 0.005
+
+_ids = itertools.count()
+_joined = 0
+
+
+async def fake_webdriver(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(WEBDRIVER_LATENCY_SECONDS)
+    path = request.url.path
+    value: Any
+    if request.method == 'POST' and path == '/session':
+        value = {'sessionId': str(next(_ids)), 'capabilities': {}}
+    elif path.endswith('/elements'):
+        value = [{ELEMENT_KEY: str(next(_ids))} for _ in range(2)]
+    elif path.endswith('/element'):
+        value = {ELEMENT_KEY: str(next(_ids))}
+    elif path.endswith(('/displayed', '/enabled')):
+        value = True
+    else:
+        value = None
+    return httpx.Response(200, json={'value': value})
+
+
+def fake_update_recording_statuses(
+    transitions: Iterable[StatusTransition]
+) -> None:
+    global _joined
+    _joined += sum(t.status == 'in_progress' for t in transitions)
+
+
+def make_conference(id_: int) -> Conference:
+    return Conference(
+        id=id_,
+        user_id=1,
+        title='Benchmark',
+        invite_link=f'https://us04web.zoom.us/j/{id_}?pwd=benchmark',
+        start_time=datetime.now(timezone.utc),
+        platform=ConferencingPlatform.ZOOM,
+        settings=Settings(participant_name='Bot', disclaimer_message='Hi'),
+        recording=Recording(filename=f'benchmark-{id_}.mp4')
+    )
+
+
+def rss_mib() -> float:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def measure_async(bots: int) -> None:
+    webdriver._client = httpx.AsyncClient(
+        transport=httpx.MockTransport(fake_webdriver)
+    )
+    outbox.update_recording_statuses = fake_update_recording_statuses
+
+    rss_before, threads_before = rss_mib(), threading.active_count()
+    bots_orchestrator = orchestrator.BotsOrchestrator()
+
+    start = monotonic()
+    for id_ in range(bots):
+        bots_orchestrator.start_recording(make_conference(id_))
+    while _joined < bots:
+        sleep(0.1)
+    elapsed = monotonic() - start
+
+    print(
+        f'asyncio runtime: {bots} bots joined in {elapsed:.1f}s, '
+        f'threads {threads_before} -> {threading.active_count()}, '
+        f'RSS +{rss_mib() - rss_before:.1f} MiB'
+    )
+
+    for id_ in range(bots):
+        bots_orchestrator.stop_recording(id_)
+
+
+def measure_threads(bots: int) -> None:
+    stop = threading.Event()
+    rss_before, threads_before = rss_mib(), threading.active_count()
+
+    threads = [
+        threading.Thread(target=stop.wait, daemon=True) for _ in range(bots)
+    ]
+    for thread in threads:
+        thread.start()
+
+    print(
+        f'thread per bot:  {bots} idle threads, '
+        f'threads {threads_before} -> {threading.active_count()}, '
+        f'RSS +{rss_mib() - rss_before:.1f} MiB'
+    )
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, default=1000)
+    args = parser.parse_args()
+
+    measure_threads(args.bots)
+    measure_async(args.bots)
+
+
+if __name__ == '__main__':
+    main()
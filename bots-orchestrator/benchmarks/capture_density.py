@@ -0,0 +1,130 @@
+"""Recordings one host fits with each capture profile.
+
+Joins `--bots` GoogleMeetBots with every profile to meetings of the fake
+conferencing platform and measures CPU of the host while they record. Run
+from the bots-orchestrator directory on the host running Selenoid, with the
+usual orchestrator environment (REMOTE_ADDRESS, BROWSER_NAME, ENABLE_VIDEO,
+...) and the fake platform running:
+
+    python -m benchmarks.capture_density --bots 4 --seconds 60
+
+FAKE_PLATFORM_URL is the fake platform address as seen from this machine,
+INVITE_HOST as seen from the browser (e.g. http://fake-platform:8080 when
+using Selenoid). CPU is read from /proc/stat, so only Linux hosts work.
+"""
+import argparse
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import httpx
+
+from app.orchestrator.capture import CAPTURES
+from app.orchestrator.conference_bot import GoogleMeetBot
+from app.schema import (
+    CaptureProfile, Conference, ConferencingPlatform, Recording, Settings
+)
+
+FAKE_PLATFORM_URL = os.getenv('FAKE_PLATFORM_URL', 'http://localhost:8080')
+INVITE_HOST = os.getenv('INVITE_HOST', FAKE_PLATFORM_URL)
+
+
+def read_cpu() -> tuple[int, int]:
+    """Return busy and total jiffies of all CPUs of the host."""
+    with open('/proc/stat') as stat:
+        times = [int(t) for t in stat.readline().split()[1:]]
+    # idle and iowait
+    idle = times[3] + times[4]
+    return sum(times) - idle, sum(times)
+
+
+async def busy_cores(seconds: float) -> float:
+    busy, total = read_cpu()
+    await asyncio.sleep(seconds)
+    busy_after, total_after = read_cpu()
+    return (
+        (busy_after - busy) / (total_after - total) * (os.cpu_count() or 1)
+    )
+
+
+def make_conference(profile: CaptureProfile, index: int) -> Conference:
+    meeting = uuid.uuid4().hex[:12]
+    return Conference(
+        id=index,
+        user_id=1,
+        title='Density benchmark',
+        invite_link=f'{INVITE_HOST}/meet/density-{meeting}',
+        start_time=datetime.now(),
+        platform=ConferencingPlatform.MEET,
+        settings=Settings(
+            participant_name=f'Density {index}',
+            disclaimer_message='This meeting is being recorded.',
+            capture_profile=profile
+        ),
+        recording=Recording(filename=f'density-{profile}-{meeting}.mp4')
+    )
+
+
+async def measure(
+    profile: CaptureProfile, bots: int, seconds: float
+) -> float:
+    """Return CPU cores a recording of the profile takes."""
+    idle = await busy_cores(seconds / 4)
+    conferences = [make_conference(profile, index) for index in range(bots)]
+    meeting_bots = [
+        GoogleMeetBot(conference, os.getenv('MEET_BROWSER_VERSION'))
+        for conference in conferences
+    ]
+    try:
+        await asyncio.gather(*(bot.join_conference() for bot in meeting_bots))
+        await asyncio.gather(
+            *(bot.start_audio_capture() for bot in meeting_bots)
+        )
+        busy = await busy_cores(seconds)
+        for bot in meeting_bots:
+            await bot.collect_audio(flush=True)
+    finally:
+        await asyncio.gather(*(bot.quit() for bot in meeting_bots))
+    return max(busy - idle, 0) / bots
+
+
+async def benchmark(bots: int, seconds: float, utilization: float) -> None:
+    cores = os.cpu_count() or 1
+    print(
+        f'{bots} bots per profile for {seconds:.0f}s, {cores} cores at '
+        f'{utilization:.0%} utilization'
+    )
+    for profile, capture in CAPTURES.items():
+        per_recording = await measure(profile, bots, seconds)
+        fits = (
+            int(cores * utilization / per_recording)
+            if per_recording else float('inf')
+        )
+        print(
+            f'{profile:>10} ({capture.screen_resolution}, '
+            f'{capture.frame_rate or "no"} fps): '
+            f'{per_recording:.2f} cores per recording, {fits} per host'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument(
+        '--utilization', type=float, default=0.8,
+        help='share of the host CPU recordings may take'
+    )
+    args = parser.parse_args()
+
+    httpx.put(
+        f'{FAKE_PLATFORM_URL}/api/config',
+        json={'admit_delay_seconds': 0, 'failure_rate': 0}
+    ).raise_for_status()
+
+    asyncio.run(benchmark(args.bots, args.seconds, args.utilization))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Measure GoogleMeetBot join time against the fake conferencing platform.
+
+Run from the bots-orchestrator directory with the usual orchestrator
+environment (REMOTE_ADDRESS, BROWSER_NAME, ENABLE_VIDEO, ...) pointing to
+Selenoid or a local chromedriver, and the fake platform running:
+
+    python -m benchmarks.meet_join --runs 5
+
+FAKE_PLATFORM_URL is the fake platform address as seen from this machine,
+INVITE_HOST as seen from the browser (e.g. http://fake-platform:8080 when
+using Selenoid).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import uuid
+from datetime import datetime
+from time import perf_counter
+
+import httpx
+
+from app.orchestrator.conference_bot import (
+    HUMANIZATION_PROFILES, GoogleMeetBot
+)
+from app.schema import Conference, ConferencingPlatform, Recording, Settings
+
+FAKE_PLATFORM_URL = os.getenv('FAKE_PLATFORM_URL', 'http://localhost:8080')
+INVITE_HOST = os.getenv('INVITE_HOST', FAKE_PLATFORM_URL)
+
+
+def make_conference(invite_link: str, run: int) -> Conference:
+    return Conference(
+        id=run,
+        user_id=1,
+        title='Benchmark',
+        invite_link=invite_link,
+        start_time=datetime.now(),
+        platform=ConferencingPlatform.MEET,
+        settings=Settings(
+            participant_name='Benchmark participant with a long name',
+            disclaimer_message='This meeting is being recorded.'
+        ),
+        recording=Recording(filename=f'benchmark-{run}.mp4')
+    )
+
+
+async def measure_join(run: int) -> float:
+    invite_link = f'{INVITE_HOST}/meet/benchmark-{uuid.uuid4().hex[:12]}'
+    bot = GoogleMeetBot(
+        make_conference(invite_link, run), os.getenv('MEET_BROWSER_VERSION')
+    )
+    start = perf_counter()
+    await bot.join_conference()
+    elapsed = perf_counter() - start
+    await bot.leave_conference()
+    return elapsed
+
+
+async def benchmark(runs: int, admit_delay: float) -> None:
+    for name, profile in HUMANIZATION_PROFILES.items():
+        GoogleMeetBot._HUMANIZATION = profile
+        timings = [await measure_join(run) for run in range(runs)]
+        print(
+            f'{name:>6}: median {statistics.median(timings):.2f}s, '
+            f'min {min(timings):.2f}s, max {max(timings):.2f}s '
+            f'(admit delay {admit_delay:.2f}s)'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--admit-delay', type=float, default=1)
+    args = parser.parse_args()
+
+    httpx.put(
+        f'{FAKE_PLATFORM_URL}/api/config',
+        json={'admit_delay_seconds': args.admit_delay, 'failure_rate': 0}
+    ).raise_for_status()
+
+    asyncio.run(benchmark(args.runs, args.admit_delay))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Writing status transitions of many recordings ending at once.
+
+Compares a connect-update-commit cycle per transition, as bots wrote them
+before, to adding them to the status outbox, which writes them in
+batches. Needs the database given by the POSTGRES_* variables to be a
+scratch database with create_tables.sql applied. Run from the
+bots-orchestrator directory:
+
+    python -m benchmarks.status_outbox --recordings 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+from datetime import datetime, timezone
+from time import perf_counter
+
+os.environ.setdefault(
+    'OUTBOX_PATH', os.path.join(tempfile.mkdtemp(), 'outbox.sqlite3')
+)
+
+from psycopg2 import connect
+
+from app.orchestrator.outbox import StatusOutbox
+from app.persistence import postgres as db
+from app.schema import RecordingStatus, StatusTransition
+
+FIRST_ID = 1_000_000
+
+LOAD = """
+INSERT INTO users (id, login, password) VALUES (%(id)s, 'outbox', '')
+ON CONFLICT DO NOTHING;
+
+-- Recordings of earlier runs are deleted with their conferences
+DELETE FROM conferences WHERE user_id = %(id)s;
+
+INSERT INTO conferences
+  (id, user_id, title, invite_link, start_time, platform)
+SELECT i, %(id)s, 'Outbox benchmark', 'https://us04web.zoom.us/j/' || i,
+  NOW() + interval '1 day', 'zoom'
+FROM generate_series(%(id)s, %(id)s + %(recordings)s - 1) i;
+
+INSERT INTO recordings
+  (conference_id, conference_start_time, filename, status)
+SELECT id, start_time, 'outbox-' || id || '.mp4', 'scheduled'
+FROM conferences
+WHERE user_id = %(id)s;
+"""
+
+
+def load(recordings: int) -> None:
+    conn = connect(**db.POSTGRES_DB_CONFIG)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute('SELECT create_conference_partitions(NOW()::date, 2)')
+        cur.execute(LOAD, {'id': FIRST_ID, 'recordings': recordings})
+    conn.close()
+
+
+def transitions(
+    recordings: int, status: RecordingStatus
+) -> list[StatusTransition]:
+    occurred_at = datetime.now(timezone.utc)
+    return [
+        StatusTransition(f'outbox-{conference_id}.mp4', status, occurred_at)
+        for conference_id in range(FIRST_ID, FIRST_ID + recordings)
+    ]
+
+
+def measure_serial(recordings: int) -> None:
+    start = perf_counter()
+    for transition in transitions(recordings, RecordingStatus.IN_PROGRESS):
+        db.update_recording_statuses([transition])
+    elapsed = perf_counter() - start
+    print(
+        f'serial: {recordings} transitions written in {elapsed:.2f}s, '
+        f'each blocking its bot {elapsed / recordings * 1000:.1f} ms'
+    )
+
+
+async def measure_outbox(recordings: int) -> None:
+    outbox = StatusOutbox()
+    flusher = asyncio.create_task(outbox.run())
+
+    async def add(transition: StatusTransition) -> float:
+        start = perf_counter()
+        await outbox.add(transition)
+        return (perf_counter() - start) * 1000
+
+    start = perf_counter()
+    waits = await asyncio.gather(*(
+        add(transition)
+        for transition in transitions(recordings, RecordingStatus.FINISHED)
+    ))
+    while await asyncio.to_thread(outbox._count):
+        await asyncio.sleep(0.01)
+    elapsed = perf_counter() - start
+    flusher.cancel()
+
+    p95 = statistics.quantiles(waits, n=20)[-1]
+    print(
+        f'outbox: {recordings} transitions written in {elapsed:.2f}s, '
+        f'adding blocked bots median {statistics.median(waits):.1f} ms, '
+        f'p95 {p95:.1f} ms'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recordings', type=int, default=500)
+    args = parser.parse_args()
+
+    load(args.recordings)
+    measure_serial(args.recordings)
+    asyncio.run(measure_outbox(args.recordings))
+
+
+if __name__ == '__main__':
+    main()
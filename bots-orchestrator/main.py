@@ -1,22 +1,28 @@
 import logging
+from typing import Annotated
 
-from fastapi import FastAPI
+from fastapi import Body, FastAPI
 
+from common.internal import InternalServer
+
+from app.log_config import setup_logging
 from app.orchestrator import BotsOrchestrator
 from app.orchestrator.exceptions import (
     ConferenceIsNotBeingRecordedError,
     ConferenceAlreadyBeingRecordedError
 )
 from app.schema import Conference
+from app.tracing import TracingMiddleware, setup_tracing
 
-logging.basicConfig(
-    format='[%(asctime)s]:%(levelname)s:%(name)s:%(module)s:%(message)s',
-    level=logging.INFO
-)
+setup_logging()
+setup_tracing('bots-orchestrator')
 log = logging.getLogger(__name__)
 
 app = FastAPI(title='Bots Orchestration API')
+app.add_middleware(TracingMiddleware)
 orchestrator = BotsOrchestrator()
+# Metrics and query statistics, on a port of their own
+internal_server = InternalServer()
 
 
 @app.get('/')
@@ -24,14 +30,60 @@ def root() -> dict[str, str]:
     return {'status': 'up'}
 
 
+@app.on_event('startup')
+async def start_internal_server() -> None:
+    internal_server.start()
+
+
+@app.on_event('shutdown')
+async def stop_internal_server() -> None:
+    await internal_server.stop()
+
+
 @app.post('/recording/start')
 def start_conference_recording(conference: Conference) -> dict[str, str]:
     try:
-        orchestrator.start_recording(conference)
+        outcome = orchestrator.start_recording(conference)
     except ConferenceAlreadyBeingRecordedError as e:
         log.exception(e)
         return {'status': 'already being recorded'}
-    return {'status': 'started'}
+    return {'status': outcome}
+
+
+@app.post('/recording/start/batch')
+def start_conference_recordings(
+    conferences: list[Conference]
+) -> list[dict[str, int | str]]:
+    """Start recordings of many conferences, results in the same order."""
+    results: list[dict[str, int | str]] = []
+    for conference, outcome in zip(
+        conferences, orchestrator.start_recordings(conferences)
+    ):
+        if isinstance(outcome, ConferenceAlreadyBeingRecordedError):
+            log.warning('%s: %s', conference.id, outcome)
+            status = 'already being recorded'
+        else:
+            status = outcome
+        results.append({'conference_id': conference.id, 'status': status})
+    return results
+
+
+@app.post('/recording/stop/batch')
+def stop_conference_recordings(
+    filenames: Annotated[list[str], Body()]
+) -> list[dict[str, str]]:
+    """Stop many recordings by their files, results in the same order."""
+    results = []
+    for filename, error in zip(
+        filenames, orchestrator.stop_recordings(filenames)
+    ):
+        if error:
+            log.warning('%s: %s', filename, error)
+        results.append({
+            'filename': filename,
+            'status': 'is not being recorded' if error else 'stopped'
+        })
+    return results
 
 
 @app.post('/recording/{conference_id}/stop')
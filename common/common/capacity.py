@@ -0,0 +1,64 @@
+import os
+from datetime import datetime, timedelta
+from enum import StrEnum
+from typing import Iterable
+
+# Bots the orchestrator runs at once, its MAX_BOTS
+BOT_CAPACITY = int(os.getenv('BOT_CAPACITY', 5))
+
+
+class CapacityPolicy(StrEnum):
+    WARN = 'warn'
+    REJECT = 'reject'
+
+
+# What to do with conferences which would need more bots than there are
+CAPACITY_POLICY = CapacityPolicy(os.getenv('CAPACITY_POLICY', 'warn'))
+
+
+class CapacityExceededError(Exception):
+    """Scheduling conference would need more bots than the fleet has."""
+
+
+def capacity_message(peak: int) -> str:
+    return (
+        f'Up to {peak} recordings are planned at once during this '
+        f'conference, more than the {BOT_CAPACITY} bots available'
+    )
+
+
+def peaks(
+    periods: Iterable[tuple[datetime, datetime]],
+    start: datetime,
+    end: datetime,
+    step: timedelta
+) -> list[tuple[datetime, datetime, int]]:
+    """Return most of `periods` going on at once in every step from start.
+
+    Periods ending when others start do not overlap them.
+    """
+    events = []
+    for period_start, period_end in periods:
+        period_start = max(period_start, start)
+        period_end = min(period_end, end)
+        if period_start < period_end:
+            events += [(period_start, 1), (period_end, -1)]
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    buckets = []
+    overlap = i = 0
+    bucket_start = start
+    while bucket_start < end:
+        bucket_end = min(bucket_start + step, end)
+        # Periods going on when the bucket starts
+        while i < len(events) and events[i][0] <= bucket_start:
+            overlap += events[i][1]
+            i += 1
+        most = overlap
+        while i < len(events) and events[i][0] < bucket_end:
+            overlap += events[i][1]
+            most = max(most, overlap)
+            i += 1
+        buckets.append((bucket_start, bucket_end, most))
+        bucket_start = bucket_end
+    return buckets
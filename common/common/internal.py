@@ -0,0 +1,84 @@
+"""Endpoints for operators, served apart from the API of a service.
+
+They are bound to INTERNAL_PORT, which is reachable by other containers
+but not published, since they expose what the service does with the
+database:
+
+    /metrics          Prometheus metrics
+    /debug/queries    statements costing the most, see `query_stats`
+
+Served on the event loop of the service, next to its API server.
+"""
+import asyncio
+import os
+from typing import Callable, Self
+
+import uvicorn
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from common.query_stats import QueryOrder, query_stats
+
+INTERNAL_HOST = os.getenv('INTERNAL_HOST', '0.0.0.0')
+INTERNAL_PORT = int(os.getenv('INTERNAL_PORT', 9000))
+
+
+class _Server(uvicorn.Server):
+    def install_signal_handlers(self: Self) -> None:
+        # Signals are handled by the API server, which stops this one
+        pass
+
+
+class InternalServer:
+    """Server of the operator endpoints.
+
+    Started and stopped with the API, `collect_metrics` updates metrics
+    known only on the event loop before they are scraped.
+    """
+
+    def __init__(
+        self: Self,
+        collect_metrics: Callable[[], None] | None = None,
+        host: str = INTERNAL_HOST,
+        port: int = INTERNAL_PORT
+    ) -> None:
+        self._collect_metrics = collect_metrics
+        self._server = _Server(uvicorn.Config(
+            Starlette(routes=[
+                Route('/metrics', self._metrics),
+                Route('/debug/queries', self._query_report)
+            ]),
+            host=host,
+            port=port,
+            lifespan='off',
+            log_level='warning',
+            access_log=False
+        ))
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self: Self) -> None:
+        self._task = asyncio.create_task(self._server.serve())
+
+    async def stop(self: Self) -> None:
+        if self._task is None:
+            return
+        self._server.should_exit = True
+        await self._task
+
+    async def _metrics(self: Self, request: Request) -> Response:
+        if self._collect_metrics is not None:
+            self._collect_metrics()
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+    async def _query_report(self: Self, request: Request) -> Response:
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            order_by = QueryOrder(
+                request.query_params.get('order_by', QueryOrder.TOTAL)
+            )
+        except ValueError as e:
+            return PlainTextResponse(str(e), status_code=422)
+        return PlainTextResponse(query_stats.report(limit, order_by))
@@ -0,0 +1,269 @@
+"""Statistics of the statements run by persistence functions.
+
+Statements are timed as they run and grouped by function and fingerprint,
+the statement with its literals replaced by `?`. Statements slower than
+SLOW_QUERY_MS are logged with their plan, at most once per fingerprint in
+SLOW_QUERY_LOG_INTERVAL_SECONDS. Configured with environment variables:
+
+    SLOW_QUERY_MS=200
+    SLOW_QUERY_LOG_INTERVAL_SECONDS=300
+    QUERY_STATS_MAX_FINGERPRINTS=1000
+    STATEMENT_TIMEOUT_MS=0
+"""
+import logging
+import os
+import re
+from math import ceil
+from collections import deque
+from dataclasses import dataclass, field
+from enum import StrEnum
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Any, Iterator, Self
+
+from psycopg2.errors import Error
+from psycopg2.extensions import connection, cursor
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_LOG_INTERVAL_SECONDS = float(
+    os.getenv('SLOW_QUERY_LOG_INTERVAL_SECONDS', 300)
+)
+QUERY_STATS_MAX_FINGERPRINTS = int(
+    os.getenv('QUERY_STATS_MAX_FINGERPRINTS', 1000)
+)
+# Zero disables the timeout
+STATEMENT_TIMEOUT_MS = int(os.getenv('STATEMENT_TIMEOUT_MS', 0))
+
+# Recent durations kept per fingerprint for percentiles
+SAMPLES_PER_FINGERPRINT = 256
+
+_EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'with')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+_SPACES = re.compile(r'\s+')
+
+log = logging.getLogger(__name__)
+
+
+def fingerprint(statement: str) -> str:
+    """Return statement with literals replaced, the same for any values."""
+    statement = _LITERALS.sub('?', statement)
+    statement = _LISTS.sub('(?, ...)', statement)
+    return _SPACES.sub(' ', statement).strip()
+
+
+def connect_options(statement_timeout_ms: int | None) -> dict[str, str]:
+    """Return `connect` arguments setting the statement timeout.
+
+    Set on connecting, it costs no extra round trip. None stands for the
+    STATEMENT_TIMEOUT_MS default.
+    """
+    if statement_timeout_ms is None:
+        statement_timeout_ms = STATEMENT_TIMEOUT_MS
+    if not statement_timeout_ms:
+        return {}
+    return {'options': f'-c statement_timeout={statement_timeout_ms}'}
+
+
+class QueryOrder(StrEnum):
+    TOTAL = 'total'
+    P95 = 'p95'
+    MAX = 'max'
+    CALLS = 'calls'
+
+
+@dataclass
+class QueryStats:
+    function: str
+    fingerprint: str
+    calls: int = 0
+    errors: int = 0
+    slow_calls: int = 0
+    total_seconds: float = 0
+    max_seconds: float = 0
+    samples: deque[float] = field(
+        default_factory=lambda: deque(maxlen=SAMPLES_PER_FINGERPRINT)
+    )
+    logged_at: float | None = None
+
+    @property
+    def p95_seconds(self: Self) -> float:
+        """95th percentile of the recent calls."""
+        samples = sorted(self.samples)
+        return samples[ceil(0.95 * len(samples)) - 1] if samples else 0
+
+
+class QueryStatsRegistry:
+    def __init__(
+        self: Self, max_fingerprints: int = QUERY_STATS_MAX_FINGERPRINTS
+    ) -> None:
+        self._max_fingerprints = max_fingerprints
+        self._stats: dict[tuple[str, str], QueryStats] = {}
+        self._lock = Lock()
+
+    def record(
+        self: Self,
+        function: str,
+        statement: str,
+        seconds: float,
+        failed: bool = False
+    ) -> QueryStats | None:
+        """Record a call, returning its stats if it is due to be logged."""
+        key = (function, fingerprint(statement))
+        slow = seconds * 1000 >= SLOW_QUERY_MS
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self._max_fingerprints:
+                    # Keeps the statements costing the most
+                    del self._stats[min(
+                        self._stats,
+                        key=lambda k: self._stats[k].total_seconds
+                    )]
+                stats = self._stats[key] = QueryStats(*key)
+
+            stats.calls += 1
+            stats.errors += int(failed)
+            stats.slow_calls += int(slow)
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.samples.append(seconds)
+
+            now = monotonic()
+            if not slow or (
+                stats.logged_at is not None
+                and now - stats.logged_at < SLOW_QUERY_LOG_INTERVAL_SECONDS
+            ):
+                return None
+            stats.logged_at = now
+            return stats
+
+    def top(
+        self: Self, limit: int = 20, order_by: QueryOrder = QueryOrder.TOTAL
+    ) -> list[QueryStats]:
+        keys = {
+            QueryOrder.TOTAL: lambda s: s.total_seconds,
+            QueryOrder.P95: lambda s: s.p95_seconds,
+            QueryOrder.MAX: lambda s: s.max_seconds,
+            QueryOrder.CALLS: lambda s: s.calls
+        }
+        with self._lock:
+            stats = list(self._stats.values())
+        return sorted(stats, key=keys[order_by], reverse=True)[:limit]
+
+    def report(
+        self: Self, limit: int = 20, order_by: QueryOrder = QueryOrder.TOTAL
+    ) -> str:
+        """Return table of the statements costing the most."""
+        lines = [
+            f'{"total ms":>12} {"calls":>8} {"errors":>6} {"slow":>6} '
+            f'{"p95 ms":>9} {"max ms":>9}  function: statement'
+        ]
+        for s in self.top(limit, order_by):
+            lines.append(
+                f'{s.total_seconds * 1000:12.1f} {s.calls:8} {s.errors:6} '
+                f'{s.slow_calls:6} {s.p95_seconds * 1000:9.1f} '
+                f'{s.max_seconds * 1000:9.1f}  {s.function}: {s.fingerprint}'
+            )
+        return '\n'.join(lines)
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+class InstrumentedConnection(connection):
+    """Connection timing statements of its cursors.
+
+    Passed to `connect` as `connection_factory`, with `function` set to the
+    persistence function the connection is opened for.
+    """
+
+    function = 'unknown'
+
+    def cursor(self: Self, *args: Any, **kwargs: Any) -> Any:
+        return InstrumentedCursor(super().cursor(*args, **kwargs), self)
+
+
+class InstrumentedCursor:
+    """Proxy to a cursor of any factory, timing `execute` calls."""
+
+    def __init__(
+        self: Self, cur: cursor, conn: InstrumentedConnection
+    ) -> None:
+        self._cursor = cur
+        self._connection = conn
+
+    def __getattr__(self: Self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __enter__(self: Self) -> Self:
+        return self
+
+    def __exit__(self: Self, *exc_info: Any) -> None:
+        self._cursor.close()
+
+    def __iter__(self: Self) -> Iterator[Any]:
+        return iter(self._cursor)
+
+    def execute(self: Self, query: Any, vars: Any = None) -> None:
+        start = perf_counter()
+        failed = True
+        try:
+            self._cursor.execute(query, vars)
+            failed = False
+        finally:
+            # The statement as sent, with the arguments bound
+            statement = (self._cursor.query or b'').decode()
+            stats = query_stats.record(
+                self._connection.function,
+                statement,
+                perf_counter() - start,
+                failed
+            )
+            if stats is not None:
+                self._log_slow(stats, statement, failed)
+
+    def _log_slow(
+        self: Self, stats: QueryStats, statement: str, failed: bool
+    ) -> None:
+        # Explaining after an error would fail in the aborted transaction
+        plan = None if failed else _explain(self._connection, statement)
+        log.warning(
+            'Slow query in %s, %d slow calls of %d, max %.1f ms: %s',
+            stats.function, stats.slow_calls, stats.calls,
+            stats.max_seconds * 1000, stats.fingerprint,
+            extra={'plan': plan}
+        )
+
+
+def _explain(conn: connection, statement: str) -> str | None:
+    if not statement.lstrip().lower().startswith(_EXPLAINABLE):
+        return None
+
+    # Keeps the transaction of the function usable if EXPLAIN fails
+    savepoint = not conn.autocommit
+    cur = cursor(conn)
+    try:
+        if savepoint:
+            cur.execute('SAVEPOINT query_stats_explain')
+        try:
+            cur.execute(f'EXPLAIN {statement}')
+            plan = '\n'.join(row[0] for row in cur.fetchall())
+        except Error as e:
+            log.exception(e)
+            if savepoint:
+                cur.execute('ROLLBACK TO SAVEPOINT query_stats_explain')
+            return None
+        if savepoint:
+            cur.execute('RELEASE SAVEPOINT query_stats_explain')
+        return plan
+    except Error as e:
+        log.exception(e)
+        return None
+    finally:
+        cur.close()
+
+
+query_stats = QueryStatsRegistry()
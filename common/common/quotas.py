@@ -0,0 +1,52 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+# Enforced by the backend when conferences are scheduled, and by the
+# scheduler when it creates occurrences of series
+MAX_CONCURRENT_RECORDINGS = int(os.getenv('MAX_CONCURRENT_RECORDINGS', 5))
+MONTHLY_RECORDING_HOURS = int(os.getenv('MONTHLY_RECORDING_HOURS', 100))
+# Conferences without an end time are stopped by the orchestrator after as
+# long at most, so they are planned to last that long
+MAX_RECORDING_SECONDS = float(os.getenv('MAX_RECORDING_SECONDS', 4 * 60 * 60))
+
+
+class QuotaExceededError(Exception):
+    """Scheduling conference would exceed a quota of its owner."""
+
+
+def planned_end(start_time: datetime, end_time: datetime | None) -> datetime:
+    if end_time is not None:
+        return end_time
+    return start_time + timedelta(seconds=MAX_RECORDING_SECONDS)
+
+
+def month_bounds(time: datetime) -> tuple[datetime, datetime]:
+    """Return start and end of the UTC month of `time`."""
+    start = time.astimezone(timezone.utc).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def max_overlap(
+    periods: Iterable[tuple[datetime, datetime]],
+    start: datetime,
+    end: datetime
+) -> int:
+    """Return most of `periods` going on at once between start and end."""
+    events = []
+    for period_start, period_end in periods:
+        period_start = max(period_start, start)
+        period_end = min(period_end, end)
+        if period_start < period_end:
+            events += [(period_start, 1), (period_end, -1)]
+
+    # Periods ending when others start do not overlap them
+    events.sort(key=lambda event: (event[0], event[1]))
+    overlap = most = 0
+    for _, change in events:
+        overlap += change
+        most = max(most, overlap)
+    return most
@@ -0,0 +1,284 @@
+"""Checks made before a recording is scheduled.
+
+The backend makes them for conferences users schedule, the scheduler for
+occurrences of series it creates, both within the transaction inserting
+the recording. Conferences without an end time are planned to last
+MAX_RECORDING_SECONDS.
+"""
+from datetime import datetime, timedelta
+
+from psycopg2.extensions import connection
+from pypika import (
+    Criterion, CustomFunction, Interval, Table, PostgreSQLQuery as Query
+)
+from pypika import functions as fn
+from pypika.enums import Comparator
+from pypika.terms import BasicCriterion
+
+from common.capacity import (
+    BOT_CAPACITY,
+    CAPACITY_POLICY,
+    CapacityExceededError,
+    CapacityPolicy,
+    capacity_message
+)
+from common.quotas import (
+    MAX_CONCURRENT_RECORDINGS,
+    MAX_RECORDING_SECONDS,
+    MONTHLY_RECORDING_HOURS,
+    QuotaExceededError,
+    max_overlap,
+    month_bounds,
+    planned_end
+)
+
+users = Table('users')
+conferences = Table('conferences')
+conference_settings = Table('conference_settings')
+recordings = Table('recordings')
+user_usage = Table('user_usage')
+
+# Values of the recording_status type a bot still has to record
+_ACTIVE_STATUSES = ['scheduled', 'in_progress']
+
+_planned_period = CustomFunction(
+    'planned_period', ['start_time', 'end_time', 'max_duration']
+)
+_scheduled_period = CustomFunction(
+    'scheduled_period', ['start_time', 'end_time']
+)
+_tstzrange = CustomFunction('tstzrange', ['lower', 'upper'])
+_advisory_xact_lock = CustomFunction('pg_advisory_xact_lock', ['key'])
+
+# Serializes capacity checks of recordings scheduled at once
+CAPACITY_LOCK_KEY = 4404
+
+
+class _RangeComparator(Comparator):
+    overlaps = '&&'
+
+
+def find_shared_recording_filename(
+    conn: connection,
+    invite_link: str,
+    capture_profile: str,
+    start_time: datetime,
+    end_time: datetime | None
+) -> str | None:
+    """Find a not yet finished recording of the same meeting.
+
+    Conferences with the same invite link and capture profile whose
+    planned periods overlap are recorded by a single bot into a single
+    file, so conferences without an end time only share with conferences
+    starting meanwhile.
+    """
+    with conn.cursor() as cur:
+        cur.execute(Query
+            .from_(recordings)
+            .inner_join(conferences)
+            .on(_conference_of(recordings))
+            .inner_join(conference_settings)
+            .on(_conference_of(conference_settings))
+            .select(recordings.filename)
+            .where(conferences.invite_link == invite_link)
+            .where(conference_settings.capture_profile == capture_profile)
+            .where(recordings.status.isin(_ACTIVE_STATUSES))
+            .where(BasicCriterion(
+                _RangeComparator.overlaps,
+                _planned_period(
+                    conferences.start_time,
+                    conferences.end_time,
+                    _max_duration()
+                ),
+                _planned_period(start_time, end_time, _max_duration())
+            ))
+            .orderby(conferences.start_time)
+            .limit(1).get_sql()
+        )
+
+        item = cur.fetchone()
+        return item[0] if item else None
+
+
+def check_quotas(
+    conn: connection,
+    user_id: int,
+    start_time: datetime,
+    end_time: datetime | None,
+    shared_filename: str | None
+) -> None:
+    """Raise QuotaExceededError if the user may not have the recording.
+
+    Locks the user, so recordings scheduled for them at once are checked
+    one by one. A recording into `shared_filename` needs no extra bot.
+    """
+    with conn.cursor() as cur:
+        cur.execute(Query
+            .from_(users)
+            .select(
+                users.max_concurrent_recordings, users.monthly_recording_hours
+            )
+            .where(users.id == user_id)
+            .for_update().get_sql()
+        )
+        max_concurrent, monthly_hours = cur.fetchone()
+        max_concurrent = max_concurrent or MAX_CONCURRENT_RECORDINGS
+        monthly_hours = monthly_hours or MONTHLY_RECORDING_HOURS
+
+        start = start_time
+        end = planned_end(start, end_time)
+
+        cur.execute(Query
+            .from_(conferences)
+            .inner_join(recordings)
+            .on(_conference_of(recordings))
+            .select(
+                recordings.filename,
+                fn.Min(conferences.start_time),
+                fn.Max(_planned_end(conferences))
+            )
+            .where(conferences.user_id == user_id)
+            .where(recordings.status.isin(_ACTIVE_STATUSES))
+            .where(conferences.start_time < end)
+            .where(_planned_end(conferences) > start)
+            .groupby(recordings.filename).get_sql()
+        )
+        # One bot records the conferences sharing a file
+        periods = [
+            (period_start, period_end)
+            for filename, period_start, period_end in cur.fetchall()
+            if filename != shared_filename
+        ]
+        if max_overlap(periods, start, end) + 1 > max_concurrent:
+            raise QuotaExceededError(
+                f'At most {max_concurrent} recordings may go on at once'
+            )
+
+        month_start, month_end = month_bounds(start)
+        cur.execute(Query
+            .from_(conferences)
+            .inner_join(recordings)
+            .on(_conference_of(recordings))
+            .select(conferences.start_time, conferences.end_time)
+            .where(conferences.user_id == user_id)
+            .where(recordings.status.isin(_ACTIVE_STATUSES))
+            .where(conferences.start_time >= month_start)
+            .where(conferences.start_time < month_end).get_sql()
+        )
+        planned_seconds = sum(
+            (planned_end(*period) - period[0]).total_seconds()
+            for period in cur.fetchall()
+        )
+        cur.execute(Query
+            .from_(user_usage)
+            .select(fn.Coalesce(fn.Sum(user_usage.recorded_seconds), 0))
+            .where(user_usage.user_id == user_id)
+            .where(user_usage.month == month_start.date())
+            .where(user_usage.status == 'finished').get_sql()
+        )
+        recorded_seconds = int(cur.fetchone()[0])
+        if (
+            recorded_seconds + planned_seconds + (end - start).total_seconds()
+            > monthly_hours * 3600
+        ):
+            raise QuotaExceededError(
+                f'At most {monthly_hours} hours may be recorded in '
+                f'{month_start:%B %Y}'
+            )
+
+
+def check_capacity(
+    conn: connection,
+    start_time: datetime,
+    end_time: datetime | None,
+    shared_filename: str | None
+) -> str | None:
+    """Compare bots needed during the recording with the fleet's capacity.
+
+    Returns a warning if more would be needed, or raises
+    CapacityExceededError if CAPACITY_POLICY rejects such recordings.
+    """
+    with conn.cursor() as cur:
+        if CAPACITY_POLICY == CapacityPolicy.REJECT:
+            cur.execute(Query
+                .select(_advisory_xact_lock(CAPACITY_LOCK_KEY)).get_sql()
+            )
+
+    start = start_time
+    end = planned_end(start, end_time)
+    periods = [
+        (period_start, period_end)
+        for filename, period_start, period_end
+        in get_recording_periods(conn, start, end)
+        if filename != shared_filename
+    ]
+    peak = max_overlap(periods, start, end) + 1
+    if peak <= BOT_CAPACITY:
+        return None
+    if CAPACITY_POLICY == CapacityPolicy.REJECT:
+        raise CapacityExceededError(capacity_message(peak))
+    return capacity_message(peak)
+
+
+def get_recording_periods(
+    conn: connection, start: datetime, end: datetime
+) -> list[tuple[str, datetime, datetime]]:
+    """Select periods of active recordings overlapping start to end.
+
+    Conferences sharing a recording are recorded by one bot over the
+    period of them all. Found with the GiST index on scheduled periods.
+    """
+    planned = _planned_period(
+        conferences.start_time, conferences.end_time, _max_duration()
+    )
+    with conn.cursor() as cur:
+        cur.execute(Query
+            .from_(conferences)
+            .inner_join(recordings)
+            .on(_conference_of(recordings))
+            .select(
+                recordings.filename,
+                fn.Min(conferences.start_time),
+                fn.Max(fn.Function('upper', planned))
+            )
+            .where(_scheduled_overlaps(start, end))
+            .where(BasicCriterion(
+                _RangeComparator.overlaps, planned, _tstzrange(start, end)
+            ))
+            .where(recordings.status.isin(_ACTIVE_STATUSES))
+            # Lets the planner skip later partitions of both tables
+            .where(conferences.start_time < end)
+            .where(recordings.conference_start_time < end)
+            .groupby(recordings.filename).get_sql()
+        )
+        return cur.fetchall()
+
+
+def _planned_end(table: Table) -> Criterion:
+    return fn.Coalesce(table.end_time, table.start_time + _max_duration())
+
+
+def _max_duration() -> Interval:
+    """Duration conferences without an end time are planned to last."""
+    return Interval(seconds=int(MAX_RECORDING_SECONDS))
+
+
+def _scheduled_overlaps(start: datetime, end: datetime) -> Criterion:
+    """Whether planned periods may overlap start to end.
+
+    Narrows candidates with the index on scheduled periods, which unlike
+    planned ones do not depend on MAX_RECORDING_SECONDS.
+    """
+    return BasicCriterion(
+        _RangeComparator.overlaps,
+        _scheduled_period(conferences.start_time, conferences.end_time),
+        _tstzrange(start - timedelta(seconds=MAX_RECORDING_SECONDS), end)
+    )
+
+
+def _conference_of(table: Table) -> Criterion:
+    # Includes the partition key, so only the matching partition is joined
+    return (
+        (table.conference_id == conferences.id)
+        & (table.conference_start_time == conferences.start_time)
+    )
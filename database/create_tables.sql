@@ -1,7 +1,14 @@
+-- Fuzzy matching of conference titles, and GIN indexes leading with the
+-- owner of the conference
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
 CREATE TYPE "recording_status" AS ENUM (
   'scheduled',
   'in_progress',
-  'finished'
+  'finished',
+  -- Not recorded, see rejection_reason
+  'rejected'
 );
 
 CREATE TYPE "conferencing_platform" AS ENUM (
@@ -9,10 +16,25 @@ CREATE TYPE "conferencing_platform" AS ENUM (
   'google_meet'
 );
 
+-- How the bot captures a conference, see CAPTURES of the orchestrator
+CREATE TYPE "capture_profile" AS ENUM (
+  'full_hd',
+  'hd',
+  'sd',
+  -- Audio recorded by the browser, no video is encoded
+  'audio_only'
+);
+
 CREATE TABLE IF NOT EXISTS "users" (
   "id" INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
   "login" VARCHAR(50) UNIQUE NOT NULL,
-  "password" VARCHAR NOT NULL
+  "password" VARCHAR NOT NULL,
+  -- Bumped by triggers on every change of the user's conferences
+  "data_version" BIGINT NOT NULL DEFAULT 0,
+  -- Quotas checked when conferences are scheduled, NULL for the defaults
+  -- of the backend
+  "max_concurrent_recordings" INTEGER,
+  "monthly_recording_hours" INTEGER
 );
 
 CREATE TABLE IF NOT EXISTS "sessions" (
@@ -25,38 +47,647 @@ CREATE TABLE IF NOT EXISTS "sessions" (
       ON DELETE CASCADE
 );
 
-CREATE TABLE IF NOT EXISTS "conferences" (
+-- Swept in batches by the scheduler
+CREATE INDEX IF NOT EXISTS sessions_expires_at_idx ON sessions(expires_at);
+
+-- Recurring conferences, stored once. The scheduler materializes their
+-- occurrences as conferences a few days ahead, materialized_until is how far
+-- it got. Editing a series only replaces occurrences materialized so far.
+CREATE TABLE IF NOT EXISTS "conference_series" (
   "id" INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  "user_id" INTEGER NOT NULL,
+  "title" VARCHAR(255) NOT NULL,
+  "invite_link" VARCHAR NOT NULL,
+  "platform" conferencing_platform NOT NULL,
+  "participant_name" VARCHAR(100) NOT NULL,
+  "disclaimer_message" VARCHAR NOT NULL,
+  "capture_profile" capture_profile NOT NULL DEFAULT 'full_hd',
+  -- Start of the first occurrence, later ones start at the same local time
+  -- in time_zone
+  "start_time" TIMESTAMPTZ NOT NULL,
+  "duration" INTERVAL CHECK(duration > interval '0'),
+  "time_zone" VARCHAR NOT NULL DEFAULT 'UTC',
+  -- RFC 5545 recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO,WE,FR
+  "rrule" VARCHAR NOT NULL,
+  -- NULL once the rule has no more occurrences
+  "materialized_until" TIMESTAMPTZ,
+  CONSTRAINT conference_series_user_id_fk
+    FOREIGN KEY(user_id)
+        REFERENCES users(id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS conference_series_user_id_idx
+  ON conference_series(user_id);
+
+-- Series the scheduler has to materialize further
+CREATE INDEX IF NOT EXISTS conference_series_materialized_until_idx
+  ON conference_series(materialized_until);
+
+-- Conference data is partitioned by month of start_time, see
+-- create_conference_partitions. Settings and recordings carry the start time
+-- of their conference so they are partitioned and pruned along with it.
+CREATE TABLE IF NOT EXISTS "conferences" (
+  "id" INTEGER GENERATED BY DEFAULT AS IDENTITY,
   "user_id" integer NOT NULL,
   "title" VARCHAR(255) NOT NULL,
   "invite_link" VARCHAR NOT NULL,
-  "start_time" TIMESTAMPTZ NOT NULL CHECK(start_time > NOW() - interval '5 minutes'),
+  "start_time" TIMESTAMPTZ NOT NULL,
   "end_time" TIMESTAMPTZ CHECK(end_time > start_time),
   "platform" conferencing_platform NOT NULL,
+  -- W3C traceparent of the request which scheduled the conference
+  "trace_context" VARCHAR,
+  -- Set for occurrences of a series, past ones outlive it
+  "series_id" INTEGER,
+  -- Title and disclaimer message, kept up to date by triggers
+  "search_vector" TSVECTOR,
+  PRIMARY KEY ("id", "start_time"),
   CONSTRAINT conferences_user_id_fk
     FOREIGN KEY(user_id)
         REFERENCES users(id)
-        ON DELETE CASCADE
-);
+        ON DELETE CASCADE,
+  CONSTRAINT conferences_series_id_fk
+    FOREIGN KEY(series_id)
+        REFERENCES conference_series(id)
+        ON DELETE SET NULL
+) PARTITION BY RANGE ("start_time");
+
+-- Only new conferences must not start in the past, a CHECK would also
+-- reject updates of end_time once the conference has started
+CREATE OR REPLACE FUNCTION check_conference_start_time() RETURNS trigger AS $$
+BEGIN
+  IF NEW.start_time <= NOW() - interval '5 minutes' THEN
+    RAISE EXCEPTION 'start_time % is in the past', NEW.start_time
+      USING ERRCODE = 'check_violation';
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER conferences_start_time_check
+  BEFORE INSERT ON conferences
+  FOR EACH ROW EXECUTE FUNCTION check_conference_start_time();
+
+-- Time a conference is planned to be recorded in. Conferences without an end
+-- time are stopped by the orchestrator after max_duration, which the services
+-- pass from MAX_RECORDING_SECONDS.
+CREATE OR REPLACE FUNCTION planned_period(
+  start_time TIMESTAMPTZ, end_time TIMESTAMPTZ, max_duration INTERVAL
+) RETURNS TSTZRANGE AS $$
+  SELECT tstzrange(
+    start_time, COALESCE(end_time, start_time + max_duration)
+  );
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Time a conference is scheduled for, only its start if it has no end time.
+-- Unlike planned periods it does not depend on the maximum duration, so it is
+-- indexed: a planned period overlaps a period only if the scheduled one
+-- overlaps the period extended back by the maximum duration.
+CREATE OR REPLACE FUNCTION scheduled_period(
+  start_time TIMESTAMPTZ, end_time TIMESTAMPTZ
+) RETURNS TSTZRANGE AS $$
+  SELECT tstzrange(start_time, COALESCE(end_time, start_time), '[]');
+$$ LANGUAGE sql IMMUTABLE;
 
 CREATE TABLE IF NOT EXISTS "conference_settings" (
-  "id" INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  "id" INTEGER GENERATED BY DEFAULT AS IDENTITY,
   "conference_id" integer NOT NULL,
+  "conference_start_time" TIMESTAMPTZ NOT NULL,
   "participant_name" VARCHAR(100) NOT NULL,
   "disclaimer_message" VARCHAR NOT NULL,
+  "capture_profile" capture_profile NOT NULL DEFAULT 'full_hd',
+  PRIMARY KEY ("id", "conference_start_time"),
   CONSTRAINT conference_settings_conference_id_fk
-    FOREIGN KEY(conference_id)
-        REFERENCES conferences(id)
+    FOREIGN KEY(conference_id, conference_start_time)
+        REFERENCES conferences(id, start_time)
         ON DELETE CASCADE
-);
+        ON UPDATE CASCADE
+) PARTITION BY RANGE ("conference_start_time");
 
 CREATE TABLE IF NOT EXISTS "recordings" (
-  "id" INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+  "id" INTEGER GENERATED BY DEFAULT AS IDENTITY,
   "conference_id" integer NOT NULL,
-  "filename" VARCHAR UNIQUE NOT NULL,
+  "conference_start_time" TIMESTAMPTZ NOT NULL,
+  "filename" VARCHAR NOT NULL,
   "status" recording_status NOT NULL,
+  -- Stamped by recordings_status_times when the status changes
+  "started_at" TIMESTAMPTZ,
+  "finished_at" TIMESTAMPTZ,
+  -- Size of the video file, set by the orchestrator once it is saved
+  "size_bytes" BIGINT,
+  "rejection_reason" VARCHAR,
+  PRIMARY KEY ("id", "conference_start_time"),
   CONSTRAINT recordings_conference_id_fk
-    FOREIGN KEY(conference_id)
-        REFERENCES conferences(id)
+    FOREIGN KEY(conference_id, conference_start_time)
+        REFERENCES conferences(id, start_time)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+) PARTITION BY RANGE ("conference_start_time");
+
+-- Rows outside of the created partitions, e.g. conferences scheduled further
+-- ahead than the scheduler creates partitions
+CREATE TABLE IF NOT EXISTS conferences_default
+  PARTITION OF conferences DEFAULT;
+CREATE TABLE IF NOT EXISTS conference_settings_default
+  PARTITION OF conference_settings DEFAULT;
+CREATE TABLE IF NOT EXISTS recordings_default
+  PARTITION OF recordings DEFAULT;
+
+
+-- Recordings of the same meeting share one file
+CREATE INDEX IF NOT EXISTS recordings_filename_idx ON recordings(filename);
+
+-- Recordings the scheduler polls, a small part of all recordings
+CREATE INDEX IF NOT EXISTS recordings_active_idx
+  ON recordings(status) WHERE status IN ('scheduled', 'in_progress');
+
+CREATE INDEX IF NOT EXISTS recordings_conference_idx
+  ON recordings(conference_id, conference_start_time);
+
+CREATE INDEX IF NOT EXISTS conference_settings_conference_idx
+  ON conference_settings(conference_id, conference_start_time);
+
+CREATE INDEX IF NOT EXISTS conferences_invite_link_idx
+  ON conferences(invite_link);
+
+CREATE INDEX IF NOT EXISTS conferences_start_time_idx
+  ON conferences(start_time);
+
+CREATE INDEX IF NOT EXISTS conferences_user_id_idx
+  ON conferences(user_id, start_time);
+
+CREATE INDEX IF NOT EXISTS conferences_scheduled_period_idx
+  ON conferences USING gist (scheduled_period(start_time, end_time));
+
+-- An occurrence is materialized once however often the scheduler runs
+CREATE UNIQUE INDEX IF NOT EXISTS conferences_series_occurrence_idx
+  ON conferences(series_id, start_time);
+
+-- Search of a user's conferences, see search_conferences of the backend
+CREATE INDEX IF NOT EXISTS conferences_search_idx
+  ON conferences USING gin (user_id, search_vector);
+
+CREATE INDEX IF NOT EXISTS conferences_title_trgm_idx
+  ON conferences USING gin (user_id, title gin_trgm_ops);
+
+
+-- Conferences past the retention period, one row each without indexes
+-- besides the owner's
+CREATE TABLE IF NOT EXISTS "conference_archive" (
+  "id" INTEGER NOT NULL,
+  "user_id" INTEGER NOT NULL,
+  "title" VARCHAR(255) NOT NULL,
+  "invite_link" VARCHAR NOT NULL,
+  "start_time" TIMESTAMPTZ NOT NULL,
+  "end_time" TIMESTAMPTZ,
+  "platform" conferencing_platform NOT NULL,
+  "participant_name" VARCHAR(100),
+  "disclaimer_message" VARCHAR,
+  "filename" VARCHAR,
+  "status" recording_status,
+  CONSTRAINT conference_archive_user_id_fk
+    FOREIGN KEY(user_id)
+        REFERENCES users(id)
         ON DELETE CASCADE
 );
+
+CREATE INDEX IF NOT EXISTS conference_archive_user_id_idx
+  ON conference_archive(user_id, start_time);
+
+
+-- Usage of every user by UTC month of the conference start, as partitions
+-- are, kept up to date by triggers on recordings and conferences. Rows of
+-- archived months are dropped along with their partitions.
+-- reconcile_user_usage fixes drift from changes the triggers do not see.
+CREATE TABLE IF NOT EXISTS "user_usage" (
+  -- No foreign key, usage of deleted conferences is subtracted while their
+  -- owner may be being deleted
+  "user_id" INTEGER NOT NULL,
+  "month" DATE NOT NULL,
+  "platform" conferencing_platform NOT NULL,
+  "status" recording_status NOT NULL,
+  "recordings" INTEGER NOT NULL DEFAULT 0,
+  "recorded_seconds" BIGINT NOT NULL DEFAULT 0,
+  "storage_bytes" BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY ("user_id", "month", "platform", "status")
+);
+
+
+-- Month partitions of conferences, settings and recordings are created
+-- together, `months` of them starting with the month of `since`. Future
+-- conferences which went to the default partitions meanwhile are moved to
+-- the new partitions.
+CREATE OR REPLACE FUNCTION create_conference_partitions(
+  since DATE, months INTEGER
+) RETURNS INTEGER AS $$
+DECLARE
+  month DATE;
+  lower TIMESTAMPTZ;
+  upper TIMESTAMPTZ;
+  suffix TEXT;
+  moving BOOLEAN;
+  created INTEGER := 0;
+BEGIN
+  FOR i IN 0 .. months - 1 LOOP
+    month := date_trunc('month', since) + make_interval(months => i);
+    lower := month::timestamp AT TIME ZONE 'UTC';
+    upper := (month + interval '1 month')::timestamp AT TIME ZONE 'UTC';
+    suffix := to_char(month, '"p"YYYYMM');
+
+    CONTINUE WHEN to_regclass('conferences_' || suffix) IS NOT NULL;
+
+    moving := EXISTS (
+      SELECT 1 FROM conferences_default
+      WHERE start_time >= lower AND start_time < upper
+    );
+    -- Moved conferences are inserted again, which they can only be before
+    -- they start
+    IF moving AND lower <= NOW() THEN
+      RAISE WARNING 'Conferences of % are in the default partition', month;
+      CONTINUE;
+    END IF;
+
+    IF moving THEN
+      CREATE TEMPORARY TABLE moved_conferences AS
+        SELECT * FROM conferences_default
+        WHERE start_time >= lower AND start_time < upper;
+      CREATE TEMPORARY TABLE moved_conference_settings AS
+        SELECT * FROM conference_settings_default
+        WHERE conference_start_time >= lower AND conference_start_time < upper;
+      CREATE TEMPORARY TABLE moved_recordings AS
+        SELECT * FROM recordings_default
+        WHERE conference_start_time >= lower AND conference_start_time < upper;
+      -- Cascades to settings and recordings
+      DELETE FROM conferences_default
+      WHERE start_time >= lower AND start_time < upper;
+    END IF;
+
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF conferences FOR VALUES FROM (%L) TO (%L)',
+      'conferences_' || suffix, lower, upper
+    );
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF conference_settings '
+      'FOR VALUES FROM (%L) TO (%L)',
+      'conference_settings_' || suffix, lower, upper
+    );
+    EXECUTE format(
+      'CREATE TABLE %I PARTITION OF recordings FOR VALUES FROM (%L) TO (%L)',
+      'recordings_' || suffix, lower, upper
+    );
+
+    IF moving THEN
+      INSERT INTO conferences SELECT * FROM moved_conferences;
+      INSERT INTO conference_settings SELECT * FROM moved_conference_settings;
+      INSERT INTO recordings SELECT * FROM moved_recordings;
+      DROP TABLE moved_conferences, moved_conference_settings,
+        moved_recordings;
+    END IF;
+    created := created + 1;
+  END LOOP;
+  RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drops month partitions which ended before `before`, copying their
+-- conferences to conference_archive first if `archive` is set, along with
+-- their usage. Rows of the default partitions that old are moved the same
+-- way.
+CREATE OR REPLACE FUNCTION archive_conference_partitions(
+  before TIMESTAMPTZ, archive BOOLEAN
+) RETURNS INTEGER AS $$
+DECLARE
+  suffix TEXT;
+  upper TIMESTAMPTZ;
+  archived INTEGER := 0;
+BEGIN
+  -- Before the partitions, whose usage rows are dropped with them, as the
+  -- usage of deleted rows is subtracted from the same months
+  IF archive THEN
+    INSERT INTO conference_archive
+    SELECT c.id, c.user_id, c.title, c.invite_link, c.start_time, c.end_time,
+      c.platform, s.participant_name, s.disclaimer_message, r.filename,
+      r.status
+    FROM conferences_default c
+    LEFT JOIN conference_settings_default s ON s.conference_id = c.id
+    LEFT JOIN recordings_default r ON r.conference_id = c.id
+    WHERE c.start_time < before;
+  END IF;
+  DELETE FROM conferences_default WHERE start_time < before;
+  -- The triggers leave usage rows of the months emptied above at zero
+  DELETE FROM user_usage
+  WHERE month < date_trunc('month', before AT TIME ZONE 'UTC')::date;
+
+  FOR suffix IN
+    SELECT substring(c.relname FROM '^conferences_(p\d{6})$')
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'conferences'::regclass
+      AND c.relname ~ '^conferences_p\d{6}$'
+    ORDER BY c.relname
+  LOOP
+    upper := (
+      to_date(substr(suffix, 2), 'YYYYMM') + interval '1 month'
+    )::timestamp AT TIME ZONE 'UTC';
+    EXIT WHEN upper > before;
+
+    IF archive THEN
+      EXECUTE format(
+        'INSERT INTO conference_archive '
+        'SELECT c.id, c.user_id, c.title, c.invite_link, c.start_time, '
+        '  c.end_time, c.platform, s.participant_name, s.disclaimer_message, '
+        '  r.filename, r.status '
+        'FROM %I c '
+        'LEFT JOIN %I s ON s.conference_id = c.id '
+        'LEFT JOIN %I r ON r.conference_id = c.id',
+        'conferences_' || suffix,
+        'conference_settings_' || suffix,
+        'recordings_' || suffix
+      );
+    END IF;
+
+    -- Dropping fires no triggers, cached pages are invalidated here
+    EXECUTE format(
+      'UPDATE users SET data_version = data_version + 1 '
+      'WHERE id IN (SELECT user_id FROM %I)',
+      'conferences_' || suffix
+    );
+
+    DELETE FROM user_usage
+    WHERE month = to_date(substr(suffix, 2), 'YYYYMM');
+
+    EXECUTE format(
+      'ALTER TABLE recordings DETACH PARTITION %I', 'recordings_' || suffix
+    );
+    EXECUTE format(
+      'ALTER TABLE conference_settings DETACH PARTITION %I',
+      'conference_settings_' || suffix
+    );
+    EXECUTE format(
+      'ALTER TABLE conferences DETACH PARTITION %I', 'conferences_' || suffix
+    );
+    EXECUTE format(
+      'DROP TABLE %I, %I, %I',
+      'recordings_' || suffix,
+      'conference_settings_' || suffix,
+      'conferences_' || suffix
+    );
+    archived := archived + 1;
+  END LOOP;
+
+  RETURN archived;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions for conferences starting up to 5 minutes in the past and for
+-- the next months, the scheduler keeps creating them
+SELECT create_conference_partitions(
+  (NOW() - interval '5 minutes')::date, 4
+);
+
+
+-- Any change of a conference or its recording, including status updates by
+-- the scheduler and the orchestrator, invalidates cached pages of its owner
+CREATE OR REPLACE FUNCTION bump_conference_data_version() RETURNS trigger AS $$
+BEGIN
+  UPDATE users SET data_version = data_version + 1
+  WHERE id = COALESCE(NEW.user_id, OLD.user_id);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bump_conference_child_data_version() RETURNS trigger AS $$
+BEGIN
+  UPDATE users SET data_version = data_version + 1
+  WHERE id = (
+    SELECT user_id FROM conferences
+    WHERE id = COALESCE(NEW.conference_id, OLD.conference_id)
+      AND start_time = COALESCE(
+        NEW.conference_start_time, OLD.conference_start_time
+      )
+  );
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER conferences_data_version
+  AFTER INSERT OR UPDATE OR DELETE ON conferences
+  FOR EACH ROW EXECUTE FUNCTION bump_conference_data_version();
+
+CREATE OR REPLACE TRIGGER conference_settings_data_version
+  AFTER INSERT OR UPDATE OR DELETE ON conference_settings
+  FOR EACH ROW EXECUTE FUNCTION bump_conference_child_data_version();
+
+CREATE OR REPLACE TRIGGER recordings_data_version
+  AFTER INSERT OR UPDATE OR DELETE ON recordings
+  FOR EACH ROW EXECUTE FUNCTION bump_conference_child_data_version();
+
+-- Titles weigh more than disclaimer messages in search results. English
+-- stemming finds "planning" for "plans".
+CREATE OR REPLACE FUNCTION conference_search_vector(
+  title VARCHAR, disclaimer_message VARCHAR
+) RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('english', title), 'A')
+    || setweight(
+      to_tsvector('english', COALESCE(disclaimer_message, '')), 'B'
+    );
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Conferences are inserted before their settings, which complete the vector
+CREATE OR REPLACE FUNCTION set_conference_search_vector() RETURNS trigger AS $$
+BEGIN
+  NEW.search_vector := conference_search_vector(NEW.title, (
+    SELECT disclaimer_message FROM conference_settings
+    WHERE conference_id = NEW.id AND conference_start_time = NEW.start_time
+  ));
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_conference_search_vector() RETURNS trigger AS $$
+BEGIN
+  UPDATE conferences
+  SET search_vector = conference_search_vector(title, NEW.disclaimer_message)
+  WHERE id = NEW.conference_id AND start_time = NEW.conference_start_time;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER conferences_search_vector
+  BEFORE INSERT OR UPDATE OF title ON conferences
+  FOR EACH ROW EXECUTE FUNCTION set_conference_search_vector();
+
+CREATE OR REPLACE TRIGGER conference_settings_search_vector
+  AFTER INSERT OR UPDATE OF disclaimer_message ON conference_settings
+  FOR EACH ROW EXECUTE FUNCTION update_conference_search_vector();
+
+-- Recording status changes are pushed to the backend, which streams them to
+-- the browsers of the conference owner
+CREATE OR REPLACE FUNCTION notify_recording_status() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('recording_status', json_build_object(
+    'user_id', (
+      SELECT user_id FROM conferences
+      WHERE id = NEW.conference_id AND start_time = NEW.conference_start_time
+    ),
+    'conference_id', NEW.conference_id,
+    'status', NEW.status
+  )::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER recordings_status_notify
+  AFTER UPDATE OF status ON recordings
+  FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+  EXECUTE FUNCTION notify_recording_status();
+
+
+-- Start and end of recording, from which the recorded time is counted
+CREATE OR REPLACE FUNCTION stamp_recording_status_times() RETURNS trigger AS $$
+BEGIN
+  IF NEW.status = 'in_progress' THEN
+    NEW.started_at := COALESCE(NEW.started_at, NOW());
+  ELSIF NEW.status = 'finished' THEN
+    NEW.finished_at := COALESCE(NEW.finished_at, NOW());
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER recordings_status_times
+  BEFORE UPDATE OF status ON recordings
+  FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+  EXECUTE FUNCTION stamp_recording_status_times();
+
+CREATE OR REPLACE FUNCTION recorded_seconds(r recordings) RETURNS BIGINT AS $$
+  SELECT COALESCE(
+    round(EXTRACT(EPOCH FROM r.finished_at - r.started_at))::bigint, 0
+  );
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Adds usage of recording `r`, times `sign`, to its owner's month. Does
+-- nothing once the conference is deleted, it subtracts its recordings
+-- itself.
+CREATE OR REPLACE FUNCTION add_recording_usage(
+  r recordings, sign INTEGER
+) RETURNS VOID AS $$
+DECLARE
+  conference conferences;
+BEGIN
+  SELECT * INTO conference FROM conferences
+  WHERE id = r.conference_id AND start_time = r.conference_start_time;
+  IF NOT FOUND THEN
+    RETURN;
+  END IF;
+
+  -- Serializes with reconcile_user_usage, which locks the same row
+  PERFORM 1 FROM users WHERE id = conference.user_id FOR NO KEY UPDATE;
+
+  INSERT INTO user_usage AS u (
+    user_id, month, platform, status, recordings, recorded_seconds,
+    storage_bytes
+  )
+  VALUES (
+    conference.user_id,
+    date_trunc('month', conference.start_time AT TIME ZONE 'UTC')::date,
+    conference.platform,
+    r.status,
+    sign,
+    sign * recorded_seconds(r),
+    sign * COALESCE(r.size_bytes, 0)
+  )
+  ON CONFLICT (user_id, month, platform, status) DO UPDATE SET
+    recordings = u.recordings + EXCLUDED.recordings,
+    recorded_seconds = u.recorded_seconds + EXCLUDED.recorded_seconds,
+    storage_bytes = u.storage_bytes + EXCLUDED.storage_bytes;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION track_recording_usage() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM add_recording_usage(OLD, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM add_recording_usage(NEW, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER recordings_usage
+  AFTER INSERT OR DELETE
+    OR UPDATE OF status, started_at, finished_at, size_bytes
+  ON recordings
+  FOR EACH ROW EXECUTE FUNCTION track_recording_usage();
+
+-- Recordings deleted in cascade no longer find their conference, so it
+-- subtracts them before it is deleted. Owner, platform and start time of
+-- conferences are not changed once created.
+CREATE OR REPLACE FUNCTION subtract_conference_usage() RETURNS trigger AS $$
+BEGIN
+  PERFORM add_recording_usage(r, -1)
+  FROM recordings r
+  WHERE r.conference_id = OLD.id AND r.conference_start_time = OLD.start_time;
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER conferences_usage
+  BEFORE DELETE ON conferences
+  FOR EACH ROW EXECUTE FUNCTION subtract_conference_usage();
+
+-- Recomputes usage of users with ids in the range from their recordings and
+-- fixes rows which drifted, returning how many did. Locks the users, so
+-- changes of their recordings wait for it and are not overwritten.
+CREATE OR REPLACE FUNCTION reconcile_user_usage(
+  first_user INTEGER, last_user INTEGER
+) RETURNS INTEGER AS $$
+DECLARE
+  fixed INTEGER;
+BEGIN
+  PERFORM 1 FROM users
+  WHERE id BETWEEN first_user AND last_user
+  ORDER BY id
+  FOR NO KEY UPDATE;
+
+  WITH actual AS (
+    SELECT c.user_id,
+      date_trunc('month', c.start_time AT TIME ZONE 'UTC')::date AS month,
+      c.platform, r.status, count(*)::integer AS recordings,
+      sum(recorded_seconds(r))::bigint AS recorded_seconds,
+      COALESCE(sum(r.size_bytes), 0)::bigint AS storage_bytes
+    FROM conferences c
+    JOIN recordings r
+      ON r.conference_id = c.id AND r.conference_start_time = c.start_time
+    WHERE c.user_id BETWEEN first_user AND last_user
+    GROUP BY 1, 2, 3, 4
+  ), updated AS (
+    INSERT INTO user_usage AS u SELECT * FROM actual
+    ON CONFLICT (user_id, month, platform, status) DO UPDATE SET
+      recordings = EXCLUDED.recordings,
+      recorded_seconds = EXCLUDED.recorded_seconds,
+      storage_bytes = EXCLUDED.storage_bytes
+    WHERE (u.recordings, u.recorded_seconds, u.storage_bytes)
+      <> (EXCLUDED.recordings, EXCLUDED.recorded_seconds,
+          EXCLUDED.storage_bytes)
+    RETURNING 1
+  ), deleted AS (
+    DELETE FROM user_usage u
+    WHERE u.user_id BETWEEN first_user AND last_user
+      AND NOT EXISTS (
+        SELECT 1 FROM actual a
+        WHERE (a.user_id, a.month, a.platform, a.status)
+          = (u.user_id, u.month, u.platform, u.status)
+      )
+    -- Rows left empty by deletes are not drift
+    RETURNING u.recordings <> 0 OR u.recorded_seconds <> 0
+      OR u.storage_bytes <> 0 AS drifted
+  )
+  SELECT (SELECT count(*) FROM updated)
+    + (SELECT count(*) FROM deleted WHERE drifted)
+  INTO fixed;
+  RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
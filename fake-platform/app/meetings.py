@@ -0,0 +1,79 @@
+import random
+from datetime import datetime
+from enum import StrEnum
+from threading import Lock
+from typing import Self
+
+from pydantic import BaseModel, Field
+
+
+class Platform(StrEnum):
+    ZOOM = 'zoom'
+    MEET = 'google_meet'
+
+
+class MeetingEventType(StrEnum):
+    OPENED = 'opened'
+    ASKED_TO_JOIN = 'asked_to_join'
+    JOINED = 'joined'
+    REFUSED = 'refused'
+    MESSAGE_SENT = 'message_sent'
+    LEFT = 'left'
+
+
+class PlatformConfig(BaseModel):
+    admit_delay_seconds: float = 1
+    ui_delay_ms: int = 200
+    failure_rate: float = Field(0, ge=0, le=1)
+    meeting_duration_seconds: float | None = None
+
+
+class MeetingEvent(BaseModel):
+    type: MeetingEventType
+    participant: str | None = None
+
+
+class Meeting(BaseModel):
+    id: str
+    platform: Platform
+    admit: bool
+    participant: str | None = None
+    events: dict[MeetingEventType, datetime] = {}
+
+
+class MeetingRegistry:
+    """In-memory state of every meeting opened on the fake platform."""
+
+    def __init__(self: Self, config: PlatformConfig) -> None:
+        self.config = config
+        self._meetings: dict[str, Meeting] = {}
+        self._lock = Lock()
+
+    def open(self: Self, meeting_id: str, platform: Platform) -> Meeting:
+        with self._lock:
+            meeting = Meeting(
+                id=meeting_id,
+                platform=platform,
+                admit=random.random() >= self.config.failure_rate
+            )
+            self._meetings[meeting_id] = meeting
+        self.record(meeting_id, MeetingEvent(type=MeetingEventType.OPENED))
+        return meeting
+
+    def record(self: Self, meeting_id: str, event: MeetingEvent) -> None:
+        with self._lock:
+            meeting = self._meetings[meeting_id]
+            meeting.events.setdefault(event.type, datetime.now().astimezone())
+            if event.participant:
+                meeting.participant = event.participant
+
+    def get(self: Self, meeting_id: str) -> Meeting | None:
+        return self._meetings.get(meeting_id)
+
+    def list(self: Self) -> list[Meeting]:
+        with self._lock:
+            return list(self._meetings.values())
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            self._meetings.clear()
@@ -0,0 +1,183 @@
+"""Drive N concurrent conferences through the system against the fake platform.
+
+Conferences are scheduled either through the backend API (exercising
+backend -> scheduler -> orchestrator -> Selenoid) or posted straight to
+the orchestrator. Bots then join meetings on the fake platform, which
+records when each of them was admitted:
+
+    python load_test.py --conferences 50 --via backend
+
+Bots must be configured to reach the fake platform, e.g. with
+ZOOM_URL_TEMPLATE=http://fake-platform:8080/wc/{}/join?pwd={} set for the
+orchestrator.
+"""
+import argparse
+import os
+import statistics
+import uuid
+from datetime import datetime
+from time import monotonic, sleep
+
+import httpx
+
+BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:8000')
+ORCHESTRATOR_URL = os.getenv('ORCHESTRATOR_URL', 'http://localhost:7000')
+FAKE_PLATFORM_URL = os.getenv('FAKE_PLATFORM_URL', 'http://localhost:8080')
+# Fake platform address as seen from the browsers
+INVITE_HOST = os.getenv('INVITE_HOST', 'http://fake-platform:8080')
+
+POLL_INTERVAL_SECONDS = 2
+ORCHESTRATOR_ID_OFFSET = 10 ** 9
+
+PLATFORMS = ('zoom', 'google_meet')
+
+
+def make_meeting(index: int, platform: str) -> tuple[str, str]:
+    """Return meeting id on the fake platform and invite link for it."""
+    if platform == 'zoom':
+        meeting_id = str(ORCHESTRATOR_ID_OFFSET + index)
+        return meeting_id, f'{INVITE_HOST}/j/{meeting_id}?pwd=load'
+    meeting_id = f'load-{uuid.uuid4().hex[:12]}'
+    return meeting_id, f'{INVITE_HOST}/meet/{meeting_id}'
+
+
+def make_conference(index: int, platform: str, invite_link: str) -> dict:
+    return {
+        'title': f'Load test #{index}',
+        'invite_link': invite_link,
+        'start_time': datetime.now().astimezone().isoformat(),
+        'platform': platform,
+        'settings': {
+            'participant_name': f'Load {index}',
+            'disclaimer_message': 'This meeting is being recorded.'
+        }
+    }
+
+
+class BackendDriver:
+    def __init__(self) -> None:
+        self._client = httpx.Client(base_url=BACKEND_URL)
+        user = {'login': f'load-{uuid.uuid4().hex[:8]}', 'password': 'load'}
+        self._client.post('/api/users/sign-up', json=user)
+        self._client.post('/api/users/sign-in', json=user)
+
+    def start(self, index: int, conference: dict) -> int:
+        response = self._client.post('/api/conferences', json=conference)
+        response.raise_for_status()
+        return response.json()['id']
+
+    def stop(self, conference_id: int) -> None:
+        self._client.post(f'/api/conferences/{conference_id}/recording/stop')
+
+
+class OrchestratorDriver:
+    def __init__(self) -> None:
+        self._client = httpx.Client(base_url=ORCHESTRATOR_URL, timeout=30)
+
+    def start(self, index: int, conference: dict) -> int:
+        conference_id = ORCHESTRATOR_ID_OFFSET + index
+        response = self._client.post('/recording/start', json={
+            'id': conference_id,
+            'user_id': 0,
+            'recording': {'filename': f'load-{uuid.uuid4().hex}.mp4'},
+            **conference
+        })
+        response.raise_for_status()
+        return conference_id
+
+    def stop(self, conference_id: int) -> None:
+        self._client.post(f'/recording/{conference_id}/stop')
+
+
+def percentile(values: list[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else float('nan')
+    return statistics.quantiles(values, n=100, method='inclusive')[p - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conferences', type=int, default=10)
+    parser.add_argument(
+        '--platform', choices=(*PLATFORMS, 'mixed'), default='mixed'
+    )
+    parser.add_argument(
+        '--via', choices=('backend', 'orchestrator'), default='backend'
+    )
+    parser.add_argument('--admit-delay', type=float, default=1)
+    parser.add_argument('--failure-rate', type=float, default=0)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    platform_client = httpx.Client(base_url=FAKE_PLATFORM_URL)
+    platform_client.put('/api/config', json={
+        'admit_delay_seconds': args.admit_delay,
+        'failure_rate': args.failure_rate
+    }).raise_for_status()
+    platform_client.delete('/api/meetings').raise_for_status()
+
+    driver: BackendDriver | OrchestratorDriver = (
+        BackendDriver() if args.via == 'backend' else OrchestratorDriver()
+    )
+
+    started_at: dict[str, datetime] = {}
+    conference_ids = []
+    for index in range(args.conferences):
+        platform = (
+            PLATFORMS[index % len(PLATFORMS)]
+            if args.platform == 'mixed' else args.platform
+        )
+        meeting_id, invite_link = make_meeting(index, platform)
+        conference = make_conference(index, platform, invite_link)
+        conference_ids.append(driver.start(index, conference))
+        started_at[meeting_id] = datetime.fromisoformat(
+            conference['start_time']
+        )
+
+    deadline = monotonic() + args.timeout
+    meetings: dict[str, dict] = {}
+    while monotonic() < deadline:
+        meetings = {
+            m['id']: m for m in platform_client.get('/api/meetings').json()
+            if m['id'] in started_at
+        }
+        done = [
+            m for m in meetings.values()
+            if {'joined', 'refused'} & m['events'].keys()
+        ]
+        if len(done) == len(started_at):
+            break
+        sleep(POLL_INTERVAL_SECONDS)
+
+    for conference_id in conference_ids:
+        driver.stop(conference_id)
+
+    joined_at = {
+        id_: datetime.fromisoformat(m['events']['joined'])
+        for id_, m in meetings.items() if 'joined' in m['events']
+    }
+    refused = sum('refused' in m['events'] for m in meetings.values())
+    latencies = sorted(
+        (joined_at[id_] - started_at[id_]).total_seconds()
+        for id_ in joined_at
+    )
+    failed = len(started_at) - len(joined_at) - refused
+
+    print(f'Conferences:        {len(started_at)} (via {args.via})')
+    print(f'Joined:             {len(joined_at)}')
+    print(f'Refused (injected): {refused}')
+    print(f'Failed:             {failed} ({failed / len(started_at):.1%})')
+    if latencies:
+        first, last = min(started_at.values()), max(joined_at.values())
+        window = (last - first).total_seconds()
+        print(
+            f'Join latency:       p50 {percentile(latencies, 50):.1f}s, '
+            f'p90 {percentile(latencies, 90):.1f}s, '
+            f'p99 {percentile(latencies, 99):.1f}s, '
+            f'max {latencies[-1]:.1f}s'
+        )
+        print(f'Throughput:         {len(latencies) / window * 60:.1f} joins/min')
+
+
+if __name__ == '__main__':
+    main()
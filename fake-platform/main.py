@@ -0,0 +1,77 @@
+import logging
+import os
+
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from fastapi.responses import HTMLResponse
+from fastapi.templating import Jinja2Templates
+
+from app.meetings import (
+    Meeting, MeetingEvent, MeetingRegistry, Platform, PlatformConfig
+)
+
+logging.basicConfig(
+    format='[%(asctime)s]:%(levelname)s:%(name)s:%(module)s:%(message)s',
+    level=logging.INFO
+)
+log = logging.getLogger(__name__)
+
+app = FastAPI(title='Fake Conferencing Platform')
+templates = Jinja2Templates(directory='templates')
+
+registry = MeetingRegistry(PlatformConfig(
+    admit_delay_seconds=float(os.getenv('ADMIT_DELAY_SECONDS', 1)),
+    ui_delay_ms=int(os.getenv('UI_DELAY_MS', 200)),
+    failure_rate=float(os.getenv('FAILURE_RATE', 0)),
+    meeting_duration_seconds=(
+        float(os.getenv('MEETING_DURATION_SECONDS', 0)) or None
+    )
+))
+
+
+@app.get('/meet/{meeting_id}', response_class=HTMLResponse)
+def meet(meeting_id: str, request: Request) -> Response:
+    meeting = registry.open(meeting_id, Platform.MEET)
+    return templates.TemplateResponse(
+        'meet.html',
+        {'request': request, 'meeting': meeting, 'config': registry.config}
+    )
+
+
+@app.get('/wc/{meeting_id}/join', response_class=HTMLResponse)
+def zoom(meeting_id: str, request: Request) -> Response:
+    meeting = registry.open(meeting_id, Platform.ZOOM)
+    return templates.TemplateResponse(
+        'zoom.html',
+        {'request': request, 'meeting': meeting, 'config': registry.config}
+    )
+
+
+@app.get('/api/config')
+def get_config() -> PlatformConfig:
+    return registry.config
+
+
+@app.put('/api/config')
+def update_config(config: PlatformConfig) -> PlatformConfig:
+    registry.config = config
+    return registry.config
+
+
+@app.get('/api/meetings')
+def get_meetings() -> list[Meeting]:
+    return registry.list()
+
+
+@app.delete('/api/meetings', status_code=status.HTTP_204_NO_CONTENT)
+def clear_meetings() -> None:
+    registry.clear()
+
+
+@app.post(
+    '/api/meetings/{meeting_id}/events',
+    status_code=status.HTTP_204_NO_CONTENT
+)
+def record_event(meeting_id: str, event: MeetingEvent) -> None:
+    if not registry.get(meeting_id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, 'Unknown meeting')
+    registry.record(meeting_id, event)
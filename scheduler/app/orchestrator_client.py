@@ -1,9 +1,9 @@
-import json
 import os
 
 import httpx
 
 from app.schema import Conference
+from app.tracing import inject_headers
 
 API_DOMAIN = os.getenv('BOTS_API_DOMAIN')
 API_PORT = os.getenv('BOTS_API_PORT')
@@ -11,15 +11,51 @@ API_PORT = os.getenv('BOTS_API_PORT')
 API_URL = f'http://{API_DOMAIN}:{API_PORT}'
 START_RECORDING_URI = '/recording/start'
 STOP_RECORDING_URI = '/recording/{}/stop'
+START_RECORDINGS_URI = '/recording/start/batch'
+STOP_RECORDINGS_URI = '/recording/stop/batch'
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Keeps connections to the orchestrator open between calls
+_client = httpx.Client(base_url=API_URL)
 
 
 def start_conference_recording(conference: Conference) -> httpx.Response:
-    url = f'{API_URL}{START_RECORDING_URI}'
-    response = httpx.post(url, json=json.loads(conference.json()))
+    response = _client.post(
+        START_RECORDING_URI,
+        content=conference.json(exclude={'trace_context'}),
+        headers={**JSON_HEADERS, **inject_headers()}
+    )
     return response
 
 
 def stop_conference_recording(conference_id: int) -> httpx.Response:
-    url = f'{API_URL}{STOP_RECORDING_URI.format(conference_id)}'
-    response = httpx.post(url)
+    response = _client.post(
+        STOP_RECORDING_URI.format(conference_id), headers=inject_headers()
+    )
+    return response
+
+
+def start_conference_recordings(
+    conferences: list[Conference]
+) -> httpx.Response:
+    """Start recordings of many conferences in one request.
+
+    Each conference carries its trace context, continued by its bot. The
+    response lists results in the same order.
+    """
+    response = _client.post(
+        START_RECORDINGS_URI,
+        # Joined from the JSON of each conference, not parsed back first
+        content=f'[{",".join(c.json() for c in conferences)}]',
+        headers={**JSON_HEADERS, **inject_headers()}
+    )
+    return response
+
+
+def stop_conference_recordings(filenames: list[str]) -> httpx.Response:
+    """Stop the recordings of many files in one request."""
+    response = _client.post(
+        STOP_RECORDINGS_URI, json=filenames, headers=inject_headers()
+    )
     return response
@@ -1,16 +1,40 @@
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from functools import wraps
-from typing import Callable, TypeVar, ParamSpec, Mapping, Any
+from typing import Callable, Concatenate, TypeVar, ParamSpec, Mapping, Any
 
 from psycopg2 import connect
 from psycopg2.extensions import connection
 from psycopg2.extras import RealDictCursor
 from psycopg2.errors import Error
-from pypika import Table, PostgreSQLQuery as Query
+from pypika import (
+    Criterion, CustomFunction, Interval, Table, PostgreSQLQuery as Query
+)
+from pypika.queries import QueryBuilder
+from pypika import functions as fn
 
-from app.schema import Settings, Recording, Conference, RecordingStatus
+from common.capacity import CapacityExceededError
+from common.query_stats import (
+    InstrumentedConnection, connect_options
+)
+from common.quotas import QuotaExceededError
+from common.scheduling import (
+    check_capacity, check_quotas, find_shared_recording_filename
+)
+
+from app.schema import (
+    Settings,
+    Recording,
+    Conference,
+    ConferencingPlatform,
+    Occurrence,
+    RecordingStatus,
+    Series
+)
+from app.recording import generate_recording_filename
+from app.recurrence import is_exhausted, occurrences
+from app.tracing import tracer
 
 POSTGRES_DB_CONFIG = {
     'host': os.getenv('POSTGRES_HOST'),
@@ -27,64 +51,119 @@ SMALL_DELTA_MINUTES = 1
 T = TypeVar('T')
 P = ParamSpec('P')
 
-FuncToDecorate = Callable[[connection, P.args, P.kwargs], T]
+FuncToDecorate = Callable[Concatenate[connection, P], T]
 
 log = logging.getLogger(__name__)
 
 users = Table('users')
+sessions = Table('sessions')
 conferences = Table('conferences')
 conference_settings = Table('conference_settings')
 recordings = Table('recordings')
+conference_series = Table('conference_series')
+
+_create_partitions = CustomFunction(
+    'create_conference_partitions', ['since', 'months']
+)
+_archive_partitions = CustomFunction(
+    'archive_conference_partitions', ['before', 'archive']
+)
+_reconcile_usage = CustomFunction(
+    'reconcile_user_usage', ['first_user', 'last_user']
+)
 
 
 def pg_connection(
-    autocommit: bool = False
-) -> Callable[[FuncToDecorate], Callable[P, T]]:
-    def fn_wrapper(fn: FuncToDecorate) -> Callable[P, T]:
+    autocommit: bool = False, statement_timeout_ms: int | None = None
+) -> Callable[[FuncToDecorate[P, T]], Callable[P, T]]:
+    """Run function with a connection of its own.
+
+    Statements are recorded in `query_stats`. The statement timeout
+    defaults to STATEMENT_TIMEOUT_MS.
+    """
+    def fn_wrapper(fn: FuncToDecorate[P, T]) -> Callable[P, T]:
         @wraps(fn)
         def args_wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
-            conn = connect(**POSTGRES_DB_CONFIG)
-            conn.autocommit = autocommit
-            try:
-                res = fn(conn, *args, **kwargs)
-            except Error as e:
-                log.exception(e)
-                if not autocommit:
-                    conn.rollback()
-                raise e
-            else:
-                if not autocommit:
-                    conn.commit()
-            finally:
-                conn.close()
-            return res
+            with tracer.start_as_current_span(
+                f'db {fn.__name__}', attributes={'db.system': 'postgresql'}
+            ):
+                conn = connect(
+                    **POSTGRES_DB_CONFIG,
+                    **connect_options(statement_timeout_ms),
+                    connection_factory=InstrumentedConnection
+                )
+                conn.function = fn.__name__
+                conn.autocommit = autocommit
+                try:
+                    res = fn(conn, *args, **kwargs)
+                except Error as e:
+                    log.exception(e)
+                    if not autocommit:
+                        conn.rollback()
+                    raise e
+                else:
+                    if not autocommit:
+                        conn.commit()
+                finally:
+                    conn.close()
+                return res
         return args_wrapper
-    return fn_wrapper
+    # mypy 1.3 tells the named parameter of fn_wrapper from the positional
+    # one of the declared callable
+    return fn_wrapper  # type: ignore[return-value]
 
 
 @pg_connection()
-def get_upcoming_conferences(conn: connection) -> list[Conference]:
-    now = datetime.now()
+def get_upcoming_conferences(
+    conn: connection,
+    staging_leads: Mapping[ConferencingPlatform, timedelta] = {}
+) -> list[Conference]:
+    """Select conferences whose bots are due to be started.
+
+    Bots are started `staging_leads` of their platform ahead, or
+    BIG_DELTA_MINUTES by default, to get to the join page before the
+    conference starts.
+    """
+    now = datetime.now(timezone.utc)
     start = now - timedelta(minutes=SMALL_DELTA_MINUTES)
-    stop = now + timedelta(minutes=BIG_DELTA_MINUTES)
+    leads = {
+        platform: staging_leads.get(
+            platform, timedelta(minutes=BIG_DELTA_MINUTES)
+        )
+        for platform in ConferencingPlatform
+    }
+    stop = now + max(leads.values())
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(Query
                 .from_(conferences)
                 .inner_join(conference_settings)
-                .on(conferences.id == conference_settings.conference_id)
+                .on(_conference_of(conference_settings))
                 .inner_join(recordings)
-                .on(conferences.id == recordings.conference_id)
+                .on(_conference_of(recordings))
                 .select(
                     conferences.id, conferences.user_id, conferences.title,
                     conferences.invite_link, conferences.start_time,
                     conferences.end_time, conferences.platform,
+                    conferences.trace_context,
                     conference_settings.participant_name,
                     conference_settings.disclaimer_message,
+                    conference_settings.capture_profile,
                     recordings.filename, recordings.status
                 )
+                .distinct_on(recordings.filename)
                 .where(recordings.status == RecordingStatus.SCHEDULED)
-                .where(conferences.start_time[start:stop]).get_sql()
+                .where(conferences.start_time.between(start, stop))
+                .where(Criterion.any([
+                    (conferences.platform == platform)
+                    & (conferences.start_time <= now + lead)
+                    for platform, lead in leads.items()
+                ]))
+                # Lets the planner skip partitions of every joined table
+                .where(conference_settings.conference_start_time.between(start, stop))
+                .where(recordings.conference_start_time.between(start, stop))
+                .orderby(recordings.filename)
+                .orderby(conferences.start_time, conferences.id).get_sql()
             )
 
             return [
@@ -97,11 +176,12 @@ def get_upcoming_conferences(conn: connection) -> list[Conference]:
             ]
     except Error as e:
         log.exception(e)
+        return []
 
 
 @pg_connection()
 def get_ending_conferences(conn: connection) -> list[Conference]:
-    now = datetime.now()
+    now = datetime.now(timezone.utc)
     start = now - timedelta(minutes=BIG_DELTA_MINUTES)
     stop = now + timedelta(minutes=SMALL_DELTA_MINUTES)
     try:
@@ -109,19 +189,27 @@ def get_ending_conferences(conn: connection) -> list[Conference]:
             cur.execute(Query
                 .from_(conferences)
                 .inner_join(conference_settings)
-                .on(conferences.id == conference_settings.conference_id)
+                .on(_conference_of(conference_settings))
                 .inner_join(recordings)
-                .on(conferences.id == recordings.conference_id)
+                .on(_conference_of(recordings))
                 .select(
                     conferences.id, conferences.user_id, conferences.title,
                     conferences.invite_link, conferences.start_time,
                     conferences.end_time, conferences.platform,
+                    conferences.trace_context,
                     conference_settings.participant_name,
                     conference_settings.disclaimer_message,
+                    conference_settings.capture_profile,
                     recordings.filename, recordings.status
                 )
+                .distinct_on(recordings.filename)
                 .where(recordings.status == RecordingStatus.IN_PROGRESS)
-                .where(conferences.end_time[start:stop]).get_sql()
+                .where(recordings.filename.isin(
+                    _ending_recordings_query(start, stop)
+                ))
+                .where(_started_before(stop, conference_settings, recordings))
+                .orderby(recordings.filename)
+                .orderby(conferences.start_time, conferences.id).get_sql()
             )
 
             return [
@@ -134,3 +222,330 @@ def get_ending_conferences(conn: connection) -> list[Conference]:
             ]
     except Error as e:
         log.exception(e)
+        return []
+
+
+def _ending_recordings_query(
+    start: datetime, stop: datetime
+) -> QueryBuilder:
+    """Select recordings whose last owning conference ends in the window.
+
+    A recording shared by several conferences keeps going until every one
+    of them has ended, so unbounded (NULL) end times hold it open. Sharing
+    conferences start before the others end, so those starting after the
+    window are left out.
+    """
+    return (Query
+        .from_(recordings)
+        .inner_join(conferences)
+        .on(_conference_of(recordings))
+        .select(recordings.filename)
+        .where(recordings.status == RecordingStatus.IN_PROGRESS)
+        .where(_started_before(stop, recordings))
+        .groupby(recordings.filename)
+        .having(fn.Count(conferences.end_time) == fn.Count(conferences.id))
+        .having(fn.Max(conferences.end_time).between(start, stop))
+    )
+
+
+def _conference_of(table: Table) -> Criterion:
+    # Includes the partition key, so only the matching partition is joined
+    return (
+        (table.conference_id == conferences.id)
+        & (table.conference_start_time == conferences.start_time)
+    )
+
+
+
+def _started_before(stop: datetime, *children: Table) -> Criterion:
+    # Lets the planner skip future partitions of every joined table
+    return Criterion.all([
+        conferences.start_time <= stop,
+        *(child.conference_start_time <= stop for child in children)
+    ])
+
+
+@pg_connection()
+def create_conference_partitions(conn: connection, months_ahead: int) -> int:
+    """Create missing month partitions, up to `months_ahead` from now."""
+    # Upcoming conferences may have started in the previous month
+    since = (
+        datetime.now(timezone.utc) - timedelta(minutes=SMALL_DELTA_MINUTES)
+    ).date()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Query
+                .select(_create_partitions(since, months_ahead + 1))
+                .get_sql()
+            )
+            return cur.fetchone()[0]
+    except Error as e:
+        log.exception(e)
+        return 0
+
+
+@pg_connection()
+def archive_conference_partitions(
+    conn: connection, retention_months: int, archive: bool
+) -> int:
+    """Drop partitions older than the retention period.
+
+    Their conferences are copied to the archive table first if `archive`
+    is set.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Query
+                .select(_archive_partitions(
+                    fn.Now() - Interval(months=retention_months), archive
+                ))
+                .get_sql()
+            )
+            return cur.fetchone()[0]
+    except Error as e:
+        log.exception(e)
+        return 0
+
+
+@pg_connection(autocommit=True)
+def sweep_expired_sessions(conn: connection, batch_size: int) -> int:
+    """Delete expired sessions in batches, each in its own transaction."""
+    swept = 0
+    try:
+        with conn.cursor() as cur:
+            while True:
+                cur.execute(Query
+                    .from_(sessions)
+                    .delete()
+                    .where(sessions.user_id.isin(Query
+                        .from_(sessions)
+                        .select(sessions.user_id)
+                        .where(sessions.expires_at < fn.Now())
+                        .limit(batch_size)
+                    )).get_sql()
+                )
+                swept += cur.rowcount
+                if cur.rowcount < batch_size:
+                    return swept
+    except Error as e:
+        log.exception(e)
+        return swept
+
+
+@pg_connection(autocommit=True)
+def reconcile_user_usage(conn: connection, batch_size: int) -> int:
+    """Fix drifted usage rows, `batch_size` users per transaction.
+
+    Returns how many rows were fixed.
+    """
+    fixed = 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute(Query.from_(users).select(fn.Max(users.id)).get_sql())
+            last_user = cur.fetchone()[0] or 0
+            for first in range(1, last_user + 1, batch_size):
+                cur.execute(Query
+                    .select(_reconcile_usage(first, first + batch_size - 1))
+                    .get_sql()
+                )
+                fixed += cur.fetchone()[0]
+            return fixed
+    except Error as e:
+        log.exception(e)
+        return fixed
+
+
+@pg_connection()
+def materialize_conference_series(
+    conn: connection, lookahead: timedelta, batch_size: int
+) -> int:
+    """Create conferences for occurrences of series up to `lookahead` ahead.
+
+    Series are materialized once less than half of `lookahead` of their
+    occurrences is left, `batch_size` series per transaction. Series being
+    edited are skipped until the next run. Returns how many conferences
+    were created.
+    """
+    now = datetime.now(timezone.utc)
+    # Upcoming conferences may have started a minute ago
+    since = now - timedelta(minutes=SMALL_DELTA_MINUTES)
+    until = now + lookahead
+    created = 0
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            while True:
+                cur.execute(Query
+                    .from_(conference_series)
+                    .select(conference_series.star)
+                    .where(
+                        conference_series.materialized_until
+                        < now + lookahead / 2
+                    )
+                    .orderby(conference_series.id)
+                    .limit(batch_size)
+                    .for_update(skip_locked=True).get_sql()
+                )
+                batch = [Series(**item) for item in cur.fetchall()]
+                for series in batch:
+                    created += _materialize_series(cur, series, since, until)
+                conn.commit()
+                if len(batch) < batch_size:
+                    return created
+    except Error as e:
+        log.exception(e)
+        return created
+
+
+def _materialize_series(
+    cur: RealDictCursor, series: Series, since: datetime, until: datetime
+) -> int:
+    rule = (series.rrule, series.start_time, series.time_zone)
+    try:
+        starts = list(occurrences(
+            *rule, max(series.materialized_until, since), until
+        ))
+        materialized_until = None if is_exhausted(*rule, until) else until
+    except (ValueError, KeyError) as e:
+        # The backend validates rules, this one was changed behind its back
+        log.warning('Series %s has an invalid rule: %s', series.id, e)
+        starts, materialized_until = [], None
+
+    created = 0
+    for start_time in starts:
+        occurrence = Occurrence(
+            series_id=series.id,
+            user_id=series.user_id,
+            title=series.title,
+            invite_link=series.invite_link,
+            start_time=start_time,
+            end_time=start_time + series.duration if series.duration else None,
+            platform=series.platform,
+            settings=Settings(
+                participant_name=series.participant_name,
+                disclaimer_message=series.disclaimer_message,
+                capture_profile=series.capture_profile
+            )
+        )
+        if _create_occurrence(cur, occurrence):
+            created += 1
+
+    cur.execute(Query
+        .update(conference_series)
+        .set(conference_series.materialized_until, materialized_until)
+        .where(conference_series.id == series.id).get_sql()
+    )
+    return created
+
+
+def _create_occurrence(cur: RealDictCursor, occurrence: Occurrence) -> bool:
+    """Create conference of occurrence unless it already exists.
+
+    Occurrences exceeding a quota of their owner, or the capacity of the
+    fleet if CAPACITY_POLICY rejects such conferences, are created
+    rejected, with the reason for the user to see.
+    """
+    cur.execute(Query
+        .into(conferences)
+        .columns(
+            conferences.series_id, conferences.user_id, conferences.title,
+            conferences.invite_link, conferences.start_time,
+            conferences.end_time, conferences.platform
+        )
+        .insert(
+            occurrence.series_id, occurrence.user_id, occurrence.title,
+            occurrence.invite_link, occurrence.start_time,
+            occurrence.end_time, occurrence.platform
+        )
+        .on_conflict(conferences.series_id, conferences.start_time)
+        .do_nothing()
+        .returning(conferences.id).get_sql()
+    )
+    item = cur.fetchone()
+    if not item:
+        return False
+    conference_id = item['id']
+
+    cur.execute(Query
+        .into(conference_settings)
+        .columns(
+            conference_settings.conference_id,
+            conference_settings.conference_start_time,
+            *occurrence.settings.dict().keys()
+        )
+        .insert(
+            conference_id,
+            occurrence.start_time,
+            *occurrence.settings.dict().values()
+        ).get_sql()
+    )
+
+    shared_filename = find_shared_recording_filename(
+        cur.connection,
+        occurrence.invite_link,
+        occurrence.settings.capture_profile,
+        occurrence.start_time,
+        occurrence.end_time
+    )
+    rejection_reason = _check_occurrence(
+        cur.connection, occurrence, shared_filename
+    )
+    if rejection_reason is None:
+        recording = Recording(
+            filename=shared_filename
+            or generate_recording_filename(occurrence, conference_id),
+            status=RecordingStatus.SCHEDULED
+        )
+    else:
+        # Not shared, status updates of the shared file would revive it
+        recording = Recording(
+            filename=generate_recording_filename(occurrence, conference_id),
+            status=RecordingStatus.REJECTED
+        )
+    cur.execute(Query
+        .into(recordings)
+        .columns(
+            recordings.conference_id,
+            recordings.conference_start_time,
+            recordings.rejection_reason,
+            *recording.dict().keys()
+        )
+        .insert(
+            conference_id,
+            occurrence.start_time,
+            rejection_reason,
+            *recording.dict().values()
+        ).get_sql()
+    )
+    return True
+
+
+def _check_occurrence(
+    conn: connection, occurrence: Occurrence, shared_filename: str | None
+) -> str | None:
+    """Check the occurrence as the backend checks conferences.
+
+    Returns why the occurrence is rejected, None if it is not.
+    """
+    try:
+        check_quotas(
+            conn,
+            occurrence.user_id,
+            occurrence.start_time,
+            occurrence.end_time,
+            shared_filename
+        )
+        capacity_warning = check_capacity(
+            conn, occurrence.start_time, occurrence.end_time, shared_filename
+        )
+    except (QuotaExceededError, CapacityExceededError) as e:
+        log.info(
+            'Rejected occurrence of series %s at %s: %s',
+            occurrence.series_id, occurrence.start_time, e
+        )
+        return str(e)
+    if capacity_warning is not None:
+        log.warning(
+            'Occurrence of series %s at %s: %s',
+            occurrence.series_id, occurrence.start_time, capacity_warning
+        )
+    return None
@@ -0,0 +1,48 @@
+from hashlib import md5
+from pathlib import PurePosixPath
+
+from app.schema import CaptureProfile, Occurrence
+
+ENCODING = 'utf-8'
+
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+# Audio is recorded by the browser, which only encodes WebM
+EXTENSIONS = {
+    CaptureProfile.FULL_HD: 'mp4',
+    CaptureProfile.HD: 'mp4',
+    CaptureProfile.SD: 'mp4',
+    CaptureProfile.AUDIO_ONLY: 'webm'
+}
+
+
+def generate_recording_filename(
+    occurrence: Occurrence,
+    conference_id: int
+) -> str:
+    """Name the recording after the meeting it captures.
+
+    Named as the backend names recordings of conferences it schedules, the
+    conference id keeps names of occurrences of a series unique.
+    """
+    filename = (
+        f'{occurrence.invite_link.strip()}-'
+        f'{occurrence.start_time.isoformat()}-{conference_id}'
+    ).encode(ENCODING)
+
+    extension = EXTENSIONS[occurrence.settings.capture_profile]
+    return shard_filename(f'{md5(filename).hexdigest()}.{extension}')
+
+
+def shard_filename(filename: str) -> str:
+    """Prefix `filename` with hash-derived directories, e.g. `ab/cd/abcd.mp4`.
+
+    Keeps the number of entries per directory bounded when storing
+    millions of recordings.
+    """
+    shards = [
+        filename[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_LEVELS)
+    ]
+    return str(PurePosixPath(*shards, filename))
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rrule, rruleset, rrulestr
+
+
+def occurrences(
+    rule: str,
+    start_time: datetime,
+    time_zone: str,
+    since: datetime,
+    until: datetime
+) -> Iterator[datetime]:
+    """Yield starts of occurrences from `since` up to `until`, in UTC.
+
+    Occurrences keep the local time of `start_time` in `time_zone`, so a
+    meeting at 9:00 stays at 9:00 across daylight saving time changes.
+    """
+    recurrence = _parse(rule, start_time, time_zone)
+    for occurrence in recurrence.xafter(since, inc=True):
+        if occurrence >= until:
+            return
+        yield occurrence.astimezone(timezone.utc)
+
+
+def is_exhausted(
+    rule: str, start_time: datetime, time_zone: str, after: datetime
+) -> bool:
+    """Whether the rule has no occurrences starting from `after`."""
+    recurrence = _parse(rule, start_time, time_zone)
+    return recurrence.after(after, inc=True) is None
+
+
+def _parse(
+    rule: str, start_time: datetime, time_zone: str
+) -> rrule | rruleset:
+    return rrulestr(
+        rule, dtstart=start_time.astimezone(ZoneInfo(time_zone))
+    )
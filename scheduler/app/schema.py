@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import StrEnum
 from typing import Self, Type, Container
 
@@ -10,10 +10,18 @@ class ConferencingPlatform(StrEnum):
     MEET = 'google_meet'
 
 
+class CaptureProfile(StrEnum):
+    FULL_HD = 'full_hd'
+    HD = 'hd'
+    SD = 'sd'
+    AUDIO_ONLY = 'audio_only'
+
+
 class RecordingStatus(StrEnum):
     SCHEDULED = 'scheduled'
     IN_PROGRESS = 'in_progress'
     FINISHED = 'finished'
+    REJECTED = 'rejected'
 
 
 class Model(BaseModel):
@@ -39,6 +47,7 @@ class Model(BaseModel):
 class Settings(Model):
     participant_name: str
     disclaimer_message: str
+    capture_profile: CaptureProfile = CaptureProfile.FULL_HD
 
 
 class Recording(Model):
@@ -56,3 +65,32 @@ class Conference(Model):
     platform: ConferencingPlatform
     settings: Settings
     recording: Recording
+    # Not sent to the orchestrator, travels in the traceparent header
+    trace_context: str | None = None
+
+
+class Series(Model):
+    id: int
+    user_id: int
+    title: str
+    invite_link: str
+    platform: ConferencingPlatform
+    participant_name: str
+    disclaimer_message: str
+    capture_profile: CaptureProfile
+    start_time: datetime
+    duration: timedelta | None = None
+    time_zone: str
+    rrule: str
+    materialized_until: datetime
+
+
+class Occurrence(Model):
+    series_id: int
+    user_id: int
+    title: str
+    invite_link: str
+    start_time: datetime
+    end_time: datetime | None = None
+    platform: ConferencingPlatform
+    settings: Settings
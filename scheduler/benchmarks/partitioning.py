@@ -0,0 +1,160 @@
+"""Latency of the scheduler polls and the history page query at scale.
+
+Fills the database given by the POSTGRES_* variables, which must be a
+scratch database with create_tables.sql applied, with conferences spread
+evenly over `--months` months up to a week ahead. Run from the scheduler
+directory:
+
+    python -m benchmarks.partitioning --conferences 50000000
+
+Loading runs with triggers and foreign key checks disabled and can be
+skipped with `--no-load` on later runs.
+"""
+import argparse
+import logging
+import statistics
+from time import perf_counter
+from typing import Callable
+
+from psycopg2 import connect
+
+from app.postgres import (
+    POSTGRES_DB_CONFIG,
+    get_ending_conferences,
+    get_upcoming_conferences
+)
+
+USERS = 100_000
+BATCH_SIZE = 1_000_000
+TOKEN = 'benchmark'
+
+LOAD_BATCH = """
+INSERT INTO conferences
+  (id, user_id, title, invite_link, start_time, end_time, platform)
+SELECT i, 1 + i %% %(users)s, 'Conference ' || i,
+  'https://us04web.zoom.us/j/' || i, start_time,
+  start_time + interval '1 hour', 'zoom'
+FROM (
+  SELECT i, NOW() + interval '7 days'
+    - (%(months)s * interval '1 month' + interval '7 days')
+    * (i::float / %(conferences)s) AS start_time
+  FROM generate_series(%(first)s, %(last)s) i
+) AS c;
+
+INSERT INTO conference_settings
+  (id, conference_id, conference_start_time, participant_name,
+   disclaimer_message)
+SELECT id, id, start_time, 'Recorder', 'This meeting is being recorded.'
+FROM conferences
+WHERE id BETWEEN %(first)s AND %(last)s;
+
+INSERT INTO recordings
+  (id, conference_id, conference_start_time, filename, status)
+SELECT id, id, start_time, id || '.mp4',
+  CASE
+    WHEN end_time < NOW() THEN 'finished'
+    WHEN start_time < NOW() THEN 'in_progress'
+    ELSE 'scheduled'
+  END::recording_status
+FROM conferences
+WHERE id BETWEEN %(first)s AND %(last)s;
+"""
+
+# The query of the history page, as built by the backend
+HISTORY_QUERY = """
+SELECT c.id, c.user_id, c.title, c.invite_link, c.start_time, c.end_time,
+  c.platform, s.participant_name, s.disclaimer_message, r.filename, r.status
+FROM conferences c
+JOIN conference_settings s
+  ON s.conference_id = c.id AND s.conference_start_time = c.start_time
+JOIN recordings r
+  ON r.conference_id = c.id AND r.conference_start_time = c.start_time
+JOIN sessions ON c.user_id = sessions.user_id
+WHERE sessions.token = %s AND sessions.expires_at > NOW()
+  AND r.status = 'finished'
+ORDER BY c.start_time
+"""
+
+
+def load(conferences: int, months: int) -> None:
+    conn = connect(**POSTGRES_DB_CONFIG)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute('SET session_replication_role = replica')
+        cur.execute(
+            'SELECT create_conference_partitions('
+            "(NOW() - %s * interval '1 month')::date, %s)",
+            (months, months + 2)
+        )
+        cur.execute(
+            "INSERT INTO users (id, login, password) "
+            "SELECT i, 'user' || i, '' FROM generate_series(1, %s) i",
+            (USERS,)
+        )
+        cur.execute(
+            'INSERT INTO sessions (user_id, token, expires_at) '
+            "VALUES (1, %s, NOW() + interval '1 day')",
+            (TOKEN,)
+        )
+        for first in range(1, conferences + 1, BATCH_SIZE):
+            last = min(first + BATCH_SIZE - 1, conferences)
+            start = perf_counter()
+            cur.execute(LOAD_BATCH, {
+                'users': USERS,
+                'months': months,
+                'conferences': conferences,
+                'first': first,
+                'last': last
+            })
+            print(
+                f'Loaded {last} conferences '
+                f'({perf_counter() - start:.1f} s per batch)'
+            )
+        cur.execute('VACUUM ANALYZE')
+    conn.close()
+
+
+def measure(name: str, query: Callable[[], object], runs: int) -> None:
+    query()
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        query()
+        timings.append((perf_counter() - start) * 1000)
+    print(
+        f'{name:<26} median {statistics.median(timings):8.1f} ms, '
+        f'max {max(timings):8.1f} ms'
+    )
+
+
+def get_history() -> list:
+    conn = connect(**POSTGRES_DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(HISTORY_QUERY, (TOKEN,))
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conferences', type=int, default=50_000_000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--no-load', dest='load', action='store_false')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.load:
+        load(args.conferences, args.months)
+
+    measure('upcoming conferences poll', get_upcoming_conferences, args.runs)
+    measure('ending conferences poll', get_ending_conferences, args.runs)
+    measure(
+        f'history page ({len(get_history())} rows)', get_history, args.runs
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,110 @@
 import logging
+import os
 from threading import Thread, current_thread
+from datetime import timedelta
 from time import sleep
+from typing import Iterator
 
-from app.postgres import get_upcoming_conferences, get_ending_conferences
+import httpx
+
+from common.query_stats import query_stats
+
+from app.log_config import get_sampled_logger, setup_logging
+from app.postgres import (
+    archive_conference_partitions,
+    create_conference_partitions,
+    get_ending_conferences,
+    get_upcoming_conferences,
+    materialize_conference_series,
+    reconcile_user_usage,
+    sweep_expired_sessions
+)
 from app.orchestrator_client import (
-    start_conference_recording,
-    stop_conference_recording
+    start_conference_recordings,
+    stop_conference_recordings
 )
+from app.schema import Conference, ConferencingPlatform
+from app.tracing import setup_tracing, tracer
 
 SLEEP_TIME_SECONDS = 60
+QUERY_REPORT_INTERVAL_SECONDS = float(
+    os.getenv('QUERY_REPORT_INTERVAL_SECONDS', 60 * 60)
+)
 
-logging.basicConfig(
-    format='[%(asctime)s]:%(levelname)s:%(name)s:%(module)s:%(message)s',
-    level=logging.INFO
+MAINTENANCE_INTERVAL_SECONDS = float(
+    os.getenv('MAINTENANCE_INTERVAL_SECONDS', 60 * 60)
+)
+# Every partition adds to planning of queries not limited by start time
+PARTITIONS_AHEAD_MONTHS = int(os.getenv('PARTITIONS_AHEAD_MONTHS', 3))
+CONFERENCE_RETENTION_MONTHS = int(
+    os.getenv('CONFERENCE_RETENTION_MONTHS', 24)
 )
+# Dropped conferences are kept in conference_archive unless disabled
+ARCHIVE_CONFERENCES = os.getenv('ARCHIVE_CONFERENCES', 'on') == 'on'
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv('SESSION_SWEEP_BATCH_SIZE', 1000))
+
+# Usage summaries are kept by triggers, reconciling only fixes drift
+USAGE_RECONCILE_INTERVAL_SECONDS = float(
+    os.getenv('USAGE_RECONCILE_INTERVAL_SECONDS', 24 * 60 * 60)
+)
+USAGE_RECONCILE_BATCH_SIZE = int(
+    os.getenv('USAGE_RECONCILE_BATCH_SIZE', 1000)
+)
+
+# Bots are started at least this long ahead, to open the join page and
+# fill it in before the conference starts
+STAGING_LEADS = {
+    ConferencingPlatform.ZOOM: timedelta(
+        seconds=float(os.getenv('ZOOM_STAGING_LEAD_SECONDS', 120))
+    ),
+    ConferencingPlatform.MEET: timedelta(
+        seconds=float(os.getenv('MEET_STAGING_LEAD_SECONDS', 120))
+    )
+}
+
+# Occurrences of series are created as conferences this far ahead
+SERIES_LOOKAHEAD = timedelta(days=float(os.getenv('SERIES_LOOKAHEAD_DAYS', 7)))
+SERIES_MATERIALIZE_BATCH_SIZE = int(
+    os.getenv('SERIES_MATERIALIZE_BATCH_SIZE', 100)
+)
+
+# Conferences started or stopped by one request to the orchestrator
+ORCHESTRATOR_BATCH_SIZE = int(os.getenv('ORCHESTRATOR_BATCH_SIZE', 200))
+
+setup_logging()
+setup_tracing('scheduler')
 log = logging.getLogger(__name__)
+# Busy polls log a line per conference
+poll_log = get_sampled_logger(f'{__name__}.poll')
 
 
 def monitor_upcoming_conferences() -> None:
     t_name = current_thread().name
-    log.info(f'{t_name}: started monitoring upcoming confs')
+    log.info('%s: started monitoring upcoming confs', t_name)
     while True:
         try:
-            conferences = get_upcoming_conferences()
+            # Before polling, so occurrences starting soon are not missed
+            created = materialize_conference_series(
+                SERIES_LOOKAHEAD, SERIES_MATERIALIZE_BATCH_SIZE
+            )
+            if created:
+                log.info('%s: materialized %s occurrences', t_name, created)
+        except Exception as e:
+            log.exception(e)
 
-            for conference in conferences:
-                log.info(conference)
-                response = start_conference_recording(conference)
-                log.info(
-                    f'{t_name}: Response: {response.status_code},'
-                    f' {response.json()}'
-                )
+        try:
+            # Conferences due before the next poll are started now
+            conferences = get_upcoming_conferences({
+                platform: lead + timedelta(seconds=SLEEP_TIME_SECONDS)
+                for platform, lead in STAGING_LEADS.items()
+            })
+
+            for batch in _batches(conferences):
+                with tracer.start_as_current_span(
+                    'start_recordings', attributes={'conferences': len(batch)}
+                ):
+                    response = start_conference_recordings(batch)
+                _log_results(t_name, 'Started', batch, response)
 
             sleep(SLEEP_TIME_SECONDS)
         except Exception as e:
@@ -39,30 +113,105 @@ def monitor_upcoming_conferences() -> None:
 
 def monitor_ending_conferences() -> None:
     t_name = current_thread().name
-    log.info(f'{t_name}: started monitoring ending confs')
+    log.info('%s: started monitoring ending confs', t_name)
     while True:
         try:
             conferences = get_ending_conferences()
 
-            for conference in conferences:
-                log.info(f'{t_name}: {conference}')
-                response = stop_conference_recording(conference.id)
-                log.info(
-                    f'{t_name}: Response: {response.status_code},'
-                    f' {response.json()}'
-                )
+            for batch in _batches(conferences):
+                with tracer.start_as_current_span(
+                    'stop_recordings', attributes={'conferences': len(batch)}
+                ):
+                    # The conference which started a shared recording's bot
+                    # may be gone, so bots are stopped by file
+                    response = stop_conference_recordings(
+                        [conference.recording.filename for conference in batch]
+                    )
+                _log_results(t_name, 'Stopped', batch, response)
 
             sleep(SLEEP_TIME_SECONDS)
         except Exception as e:
             log.exception(e)
 
 
+def maintain_database() -> None:
+    t_name = current_thread().name
+    log.info('%s: started database maintenance', t_name)
+    while True:
+        try:
+            created = create_conference_partitions(PARTITIONS_AHEAD_MONTHS)
+            archived = archive_conference_partitions(
+                CONFERENCE_RETENTION_MONTHS, ARCHIVE_CONFERENCES
+            )
+            swept = sweep_expired_sessions(SESSION_SWEEP_BATCH_SIZE)
+            log.info(
+                '%s: created %s and archived %s partitions, '
+                'swept %s sessions',
+                t_name, created, archived, swept
+            )
+        except Exception as e:
+            log.exception(e)
+
+        sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+
+def reconcile_usage() -> None:
+    t_name = current_thread().name
+    log.info('%s: started usage reconciliation', t_name)
+    while True:
+        sleep(USAGE_RECONCILE_INTERVAL_SECONDS)
+        try:
+            fixed = reconcile_user_usage(USAGE_RECONCILE_BATCH_SIZE)
+            if fixed:
+                log.warning('%s: fixed %s drifted usage rows', t_name, fixed)
+        except Exception as e:
+            log.exception(e)
+
+
+def report_queries() -> None:
+    # The scheduler serves no HTTP, so the report goes to the log
+    while True:
+        sleep(QUERY_REPORT_INTERVAL_SECONDS)
+        log.info('Queries costing the most:\n%s', query_stats.report())
+
+
+def _batches(conferences: list[Conference]) -> Iterator[list[Conference]]:
+    for start in range(0, len(conferences), ORCHESTRATOR_BATCH_SIZE):
+        yield conferences[start:start + ORCHESTRATOR_BATCH_SIZE]
+
+
+def _log_results(
+    t_name: str,
+    action: str,
+    conferences: list[Conference],
+    response: httpx.Response
+) -> None:
+    if not response.is_success:
+        log.warning(
+            '%s: Request for %s conferences failed: %s, %s',
+            t_name, len(conferences), response.status_code, response.text
+        )
+        return
+    for conference, result in zip(conferences, response.json()):
+        poll_log.debug('%s: %s', t_name, conference)
+        poll_log.info(
+            '%s: %s conference with id %s: %s',
+            t_name, action, conference.id, result['status']
+        )
+
+
 def main() -> None:
     t1 = Thread(target=monitor_upcoming_conferences, args=[])
     t2 = Thread(target=monitor_ending_conferences, args=[])
+    t3 = Thread(target=report_queries, daemon=True)
+    t4 = Thread(target=maintain_database, daemon=True)
+    t5 = Thread(target=reconcile_usage, daemon=True)
 
     t1.start()
     t2.start()
+    t3.start()
+    t4.start()
+    t5.start()
 
     t1.join()
     t2.join()